@@ -14,18 +14,28 @@ pac_dash  = st.Page("pages/1_Paciente_Dashboard.py",  title="Paciente Dashboard"
 car_hoy   = st.Page("pages/2_Carmen_Hoy.py",          title="Carmen Hoy",        icon="📅")
 car_pac   = st.Page("pages/3_Carmen_Pacientes.py",    title="Carmen Pacientes",  icon="📚")
 car_citas = st.Page("pages/4_Carmen_Citas.py",        title="Carmen Citas",      icon="🗓️")
+car_perf  = st.Page("pages/5_Carmen_Rendimiento.py",  title="Rendimiento",       icon="⏱️")
 
 role = st.session_state["role"]
 
 if role == "paciente":
     nav = st.navigation([pac_dash])           # ← solo ve su dashboard
 elif role == "admin":
-    nav = st.navigation({"Carmen": [car_hoy, car_pac, car_citas]})  # ← solo páginas de Carmen
+    # panel de rendimiento oculto: aparece al entrar con ?perf=1 (y queda durante la sesión)
+    if st.query_params.get("perf") == "1":
+        st.session_state["ver_rendimiento"] = True
+    paginas = [car_hoy, car_pac, car_citas] + ([car_perf] if st.session_state.get("ver_rendimiento") else [])
+    nav = st.navigation({"Carmen": paginas})  # ← solo páginas de Carmen
 else:
     nav = st.navigation([home])   # ← solo login
 
-from modules.core import setup_db_safe
+from modules.core import setup_db_safe, sincronizar_drive_async, escuchar_avisos
+from modules.metricas import medir, publicar
+publicar()  # /metrics en el servidor lateral (si SIDE_HTTP_PORT está configurado)
 setup_db_safe()
-nav.run()
+sincronizar_drive_async()
+escuchar_avisos()  # LISTEN cache_invalidada: versiones de caché entre réplicas
+with medir("rerun", nav.title):
+    nav.run()
 
 
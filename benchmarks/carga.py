@@ -0,0 +1,294 @@
+# benchmarks/carga.py
+"""
+Generador de carga: N sesiones de Streamlit concurrentes (AppTest) contra la app real.
+
+Cada sesión es un hilo con su propio AppTest (su session_state), pero todas comparten el
+proceso: la conexión única a Postgres, el pool de bcrypt, las cachés y el cliente de Drive,
+igual que en el servidor. Así se ve cuántas pacientes simultáneas aguanta el diseño antes de
+que un sábado de agenda llena se degrade.
+
+Guiones:
+  paciente  login (formulario) → dashboard → agendador (elige día y horario) → confirmar cita
+            → galería de fotos (cambia de fecha, "Cargar más")
+  carmen    Carmen Hoy → Carmen Pacientes: buscar, seleccionar paciente, guardar una medición
+            (entra con session_state role=admin, sin pasar por el formulario de login)
+
+Corre contra los dobles locales de benchmarks/ (Postgres sembrado, Drive y WhatsApp falsos).
+Reporta por paso p50/p95/p99 del rerun, errores (excepción en la app o timeout) y avisos
+(st.error de negocio, p.ej. "Ese horario ya fue tomado"), más throughput y los histogramas de
+modules.metricas (reruns por página, consultas, espera del pool de bcrypt).
+
+Uso:
+    python benchmarks/carga.py --pacientes 20 --carmen 1 --duracion 60 --salida carga.json
+    python benchmarks/carga.py --sin-sembrar --pacientes 50 --pausa-ms 500
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from time import monotonic, perf_counter, sleep
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+from benchmarks import semilla  # noqa: E402
+from benchmarks.fakes import FakeDrive, FakeWhatsApp  # noqa: E402
+from benchmarks.suite import _pct, _commit  # noqa: E402
+
+
+class Registro:
+    """Latencias y resultados por paso, compartido entre hilos."""
+
+    def __init__(self):
+        self.ms: dict[str, list[float]] = defaultdict(list)
+        self.errores: dict[str, int] = defaultdict(int)
+        self.avisos: dict[str, int] = defaultdict(int)
+        self.ejemplos: dict[str, str] = {}
+        self.sesiones = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def anotar(self, paso: str, ms: float, error: str | None = None, aviso: bool = False):
+        with self._lock:
+            self.ms[paso].append(ms)
+            if error:
+                self.errores[paso] += 1
+                self.ejemplos.setdefault(paso, error[:300])
+            if aviso:
+                self.avisos[paso] += 1
+
+    def resumen(self) -> dict:
+        with self._lock:
+            res = {}
+            for paso, xs in sorted(self.ms.items()):
+                res[paso] = {
+                    "n": len(xs),
+                    "p50_ms": round(_pct(xs, 0.50), 1),
+                    "p95_ms": round(_pct(xs, 0.95), 1),
+                    "p99_ms": round(_pct(xs, 0.99), 1),
+                    "max_ms": round(max(xs), 1),
+                    "errores": self.errores[paso],
+                    "tasa_error": round(self.errores[paso] / len(xs), 4),
+                    "avisos": self.avisos[paso],
+                    "ejemplo_error": self.ejemplos.get(paso),
+                }
+            return res
+
+
+class Sesion:
+    """Un navegador: un AppTest y los pasos del guion, cada uno cronometrado."""
+
+    def __init__(self, script: Path, reg: Registro, args, **estado):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(str(script), default_timeout=args.timeout)
+        for k, v in estado.items():
+            self.at.session_state[k] = v
+        self.reg, self.args = reg, args
+
+    def paso(self, nombre: str, accion=None) -> bool:
+        """Aplica `accion(at)` (llenar widgets, click) y corre el rerun. False si hubo error."""
+        error = None
+        t0 = perf_counter()
+        try:
+            if accion is not None:
+                accion(self.at)
+            self.at.run()
+            if len(self.at.exception):
+                error = self.at.exception[0].message
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        ms = (perf_counter() - t0) * 1000
+        self.reg.anotar(nombre, ms, error, aviso=not error and len(self.at.error) > 0)
+        if self.args.pausa_ms:
+            sleep(random.uniform(0, self.args.pausa_ms) / 1000)  # la persona lee / piensa
+        return error is None
+
+    def widget(self, tipo: str, etiqueta: str | None = None, key: str | None = None):
+        for w in getattr(self.at, tipo):
+            if (key is not None and w.key == key) or (etiqueta is not None and w.label == etiqueta):
+                return w
+        raise LookupError(f"No está el {tipo} {key or etiqueta!r} en la página.")
+
+
+# --------- guiones ---------
+def guion_paciente(pid: int, reg: Registro, args, rnd: random.Random):
+    s = Sesion(RAIZ / "app.py", reg, args)
+    if not s.paso("login_pantalla"):
+        return
+
+    def _login(at):
+        s.widget("text_input", key="pac_tel_login").input(f"55{pid:08d}")
+        s.widget("text_input", key="pac_pw_login").input(semilla.PASSWORD)
+        s.widget("button", "Entrar").click()
+    if not s.paso("login", _login) or "paciente" not in s.at.session_state:
+        return
+
+    # agendador: un día con horarios a 30-60 días (la semilla los deja libres)
+    hoy = date.today()
+    dias = [hoy + timedelta(days=d) for d in range(30, 61) if (hoy + timedelta(days=d)).weekday() != 6]
+    fecha = rnd.choice(dias)
+    if not s.paso("agendador_dia", lambda at: s.widget("date_input", "Día (a partir del tercer día)").set_value(fecha)):
+        return
+    try:
+        horario = s.widget("selectbox", "Horario")
+    except LookupError:
+        horario = None
+    if horario is not None and horario.options:
+        def _agendar(at):
+            horario.set_value(rnd.choice(horario.options))
+            s.widget("button", "Confirmar cita").click()
+        s.paso("agendar", _agendar)
+
+    # galería de fotos
+    try:
+        sel = s.widget("selectbox", key=f"pac_fotos_fecha_{pid}")
+        if len(sel.options) > 1:
+            s.paso("fotos_fecha", lambda at: sel.set_value(rnd.choice(sel.options[1:])))
+        s.paso("fotos_cargar_mas", lambda at: s.widget("button", key=f"pac_fotos_pag_{pid}_btn").click())
+    except LookupError:
+        pass
+
+
+def guion_carmen(reg: Registro, args, rnd: random.Random):
+    hoy = Sesion(RAIZ / "app.py", reg, args, role="admin")
+    hoy.paso("carmen_hoy")
+
+    s = Sesion(RAIZ / "pages" / "3_Carmen_Pacientes.py", reg, args, role="admin")
+    if not s.paso("carmen_pacientes"):
+        return
+
+    def _buscar(at):
+        s.widget("text_input", "Buscar por nombre").input(rnd.choice(semilla._APELLIDOS))
+        s.widget("button", "Buscar").click()
+    if not s.paso("carmen_buscar", _buscar):
+        return
+    try:
+        sel = s.widget("selectbox", "Selecciona paciente")
+    except LookupError:
+        return
+    if len(sel.options) > 1:
+        s.paso("carmen_seleccionar", lambda at: sel.set_value(rnd.choice(sel.options)))
+
+    def _medicion(at):
+        s.widget("number_input", "Peso (kg)").set_value(round(rnd.uniform(55, 110), 1))
+        s.widget("number_input", "% Grasa").set_value(round(rnd.uniform(15, 38), 1))
+        s.widget("button", "Guardar/Actualizar medición").click()
+    s.paso("carmen_guardar_medicion", _medicion)
+
+
+def _trabajador(tipo: str, n: int, reg: Registro, args, fin: float, pids: list[int]):
+    rnd = random.Random(args.semilla * 1000 + n)
+    i = 0
+    while monotonic() < fin and (not args.sesiones or i < args.sesiones):
+        if tipo == "paciente":
+            guion_paciente(pids[(n + i * args.pacientes) % len(pids)], reg, args, rnd)
+        else:
+            guion_carmen(reg, args, rnd)
+        reg.sesiones[tipo] += 1
+        i += 1
+
+
+def _hist_metricas() -> dict:
+    from modules import metricas
+    res = {}
+    for (tipo, huella), h in metricas.histogramas().items():
+        if tipo not in ("rerun", "espera_pool", "bcrypt") and not (tipo == "sql" and h["n"] >= 50):
+            continue
+        res[f"{tipo}:{huella[:80]}"] = {
+            "n": h["n"], "media_ms": round(h["total_ms"] / h["n"], 1),
+            "p95_ms": metricas.percentil(h["buckets"], 0.95), "max_ms": round(h["max_ms"], 1),
+            "errores": h["errores"],
+        }
+    return res
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Carga concurrente de sesiones Streamlit (AppTest)")
+    ap.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", semilla.DSN_DEFECTO))
+    ap.add_argument("--escala", choices=list(semilla.ESCALAS), default="pequena")
+    ap.add_argument("--semilla", type=int, default=7)
+    ap.add_argument("--pacientes", type=int, default=10, help="sesiones de pacientes concurrentes")
+    ap.add_argument("--carmen", type=int, default=1, help="sesiones de Carmen concurrentes")
+    ap.add_argument("--duracion", type=float, default=60, help="segundos de carga")
+    ap.add_argument("--sesiones", type=int, default=0, help="máximo de sesiones por hilo (0 = hasta --duracion)")
+    ap.add_argument("--rampa", type=float, default=5, help="segundos para arrancar todos los hilos")
+    ap.add_argument("--pausa-ms", type=float, default=300, help="pausa aleatoria máx. entre pasos")
+    ap.add_argument("--timeout", type=float, default=30, help="timeout de cada rerun (s)")
+    ap.add_argument("--almacen", choices=["drive", "local"], default="drive")
+    ap.add_argument("--latencia-drive-ms", type=float, default=80)
+    ap.add_argument("--sin-sembrar", action="store_true")
+    ap.add_argument("--permitir-remoto", action="store_true")
+    ap.add_argument("--salida", help="archivo JSON (además de stdout)")
+    args = ap.parse_args(argv)
+
+    os.chdir(RAIZ)  # st.Page y los estáticos se resuelven desde la raíz
+    semilla.preparar_entorno(args.dsn, args.permitir_remoto, args.almacen)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    import requests
+    from modules import drive, metricas
+    fake = FakeDrive(args.latencia_drive_ms)
+    drive._drive_service = lambda: fake
+    requests.post = FakeWhatsApp().post
+
+    if args.sin_sembrar:
+        from modules.db import df_sql
+        n = int(df_sql("SELECT count(*) AS n FROM pacientes").loc[0, "n"])
+        info = {"pacientes": n, "libres_desde": n - max(50, n // 10) + 1, "escala": args.escala}
+    else:
+        info = semilla.sembrar(args.escala, args.semilla)
+    # pacientes sin citas: pueden agendar sin chocar con la regla de 7 días
+    pids = list(range(info["libres_desde"], info["pacientes"] + 1))
+
+    metricas.reiniciar()
+    reg = Registro()
+    hilos = [("paciente", n) for n in range(args.pacientes)] + [("carmen", n) for n in range(args.carmen)]
+    t0 = monotonic()
+    fin = t0 + args.rampa + args.duracion
+    ts = []
+    for k, (tipo, n) in enumerate(hilos):
+        t = threading.Thread(target=_trabajador, args=(tipo, n, reg, args, fin, pids), name=f"{tipo}-{n}", daemon=True)
+        t.start(); ts.append(t)
+        sleep(args.rampa / max(len(hilos), 1))
+    for t in ts:
+        t.join()
+    segundos = monotonic() - t0
+
+    pasos = reg.resumen()
+    total = sum(p["n"] for p in pasos.values())
+    todos = [x for xs in reg.ms.values() for x in xs]
+    salida = {
+        "meta": {
+            "commit": _commit(),
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "pacientes": args.pacientes, "carmen": args.carmen,
+            "duracion_s": round(segundos, 1), "pausa_ms": args.pausa_ms,
+            "almacen": args.almacen, "latencia_drive_ms": args.latencia_drive_ms,
+            "semilla": info,
+        },
+        "global": {
+            "reruns": total,
+            "reruns_por_s": round(total / segundos, 2) if segundos else 0,
+            "p50_ms": round(_pct(todos, 0.50), 1) if todos else None,
+            "p95_ms": round(_pct(todos, 0.95), 1) if todos else None,
+            "p99_ms": round(_pct(todos, 0.99), 1) if todos else None,
+            "tasa_error": round(sum(p["errores"] for p in pasos.values()) / total, 4) if total else None,
+            "sesiones": dict(reg.sesiones),
+        },
+        "pasos": pasos,
+        "metricas": _hist_metricas(),
+    }
+    txt = json.dumps(salida, indent=2, ensure_ascii=False, default=str)
+    print(txt)
+    if args.salida:
+        Path(args.salida).write_text(txt + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+# benchmarks/drive_first_call.py
+"""
+Tiempo hasta la primera llamada a Drive (build del cliente + files.list pageSize=1).
+
+Compara, en el mismo proceso:
+  - antes:    build("drive", "v3", credentials=creds) como hacía get_drive()
+  - actual:   modules.drive._drive_service() (discovery estático, transporte compartido)
+y además cuánto cuesta la segunda llamada con cada cliente (reuso de conexión keep-alive).
+
+Necesita credenciales reales de Google en el entorno (las mismas que usa la app).
+Uso:
+    python benchmarks/drive_first_call.py -n 5
+"""
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def _primera_llamada(drv) -> float:
+    t0 = perf_counter()
+    drv.files().list(pageSize=1, fields="files(id)", supportsAllDrives=True,
+                     includeItemsFromAllDrives=True).execute()
+    return perf_counter() - t0
+
+
+def antes(creds) -> dict:
+    from googleapiclient.discovery import build
+    t0 = perf_counter()
+    drv = build("drive", "v3", credentials=creds)
+    t_build = perf_counter() - t0
+    return {"build": t_build, "primera": _primera_llamada(drv), "segunda": _primera_llamada(drv)}
+
+
+def actual() -> dict:
+    from modules import drive
+    drive._drive_service.clear()
+    t0 = perf_counter()
+    drv = drive._drive_service()
+    t_build = perf_counter() - t0
+    return {"build": t_build, "primera": _primera_llamada(drv), "segunda": _primera_llamada(drv)}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Tiempo hasta la primera llamada a Drive")
+    ap.add_argument("-n", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    from modules.drive import _drive_credentials
+    creds = _drive_credentials()
+    if creds is None:
+        raise SystemExit("Sin credenciales de Google en el entorno.")
+
+    res = {"antes": [], "actual": []}
+    for _ in range(args.n):
+        res["antes"].append(antes(creds))
+        res["actual"].append(actual())
+
+    resumen = {
+        k: {m: round(statistics.median(r[m] for r in v) * 1000, 1) for m in ("build", "primera", "segunda")}
+        for k, v in res.items()
+    }
+    print(json.dumps({"n": args.n, "mediana_ms": resumen}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
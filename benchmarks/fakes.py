@@ -0,0 +1,212 @@
+# benchmarks/fakes.py
+"""
+Dobles locales de Google Drive y de la Graph API de WhatsApp para los benchmarks.
+
+FakeDrive imita la forma del cliente de googleapiclient que usa la app
+(`drv.files().list(...).execute()`, batch, changes) guardando todo en memoria, con una
+latencia fija por llamada para que las rutas que hablan con Drive pesen como en producción.
+Cuenta llamadas por método, viajes de red (un batch es uno) y bytes subidos para el reporte.
+"""
+import itertools
+import re
+import threading
+import time
+from collections import Counter
+
+
+class _Peticion:
+    def __init__(self, fake, metodo: str, fn):
+        self.fake, self.methodId, self._fn = fake, metodo, fn
+
+    def execute(self, *args, **kwargs):
+        return self.fake._ejecutar(self.methodId, self._fn)
+
+
+class FakeHttpError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.resp = type("Resp", (), {"status": status})()
+
+
+class _Batch:
+    def __init__(self, fake, callback):
+        self.fake, self.callback, self._items = fake, callback, []
+
+    def add(self, req, request_id=None):
+        self._items.append((request_id, req))
+
+    def execute(self):
+        # un solo viaje de red para todo el batch
+        self.fake._dormir()
+        self.fake.llamadas["batch"] += 1
+        for rid, req in self._items:
+            try:
+                resp, exc = req._fn(), None
+            except Exception as e:
+                resp, exc = None, e
+            self.fake.llamadas[req.methodId] += 1
+            if self.callback:
+                self.callback(rid, resp, exc)
+
+
+class _Files:
+    def __init__(self, fake):
+        self.f = fake
+
+    def list(self, q: str = "", fields: str = "", pageSize: int = 100, pageToken=None, **kw):
+        return _Peticion(self.f, "drive.files.list", lambda: {"files": self.f._buscar(q)[:pageSize]})
+
+    def get(self, fileId: str, fields: str = "", **kw):
+        return _Peticion(self.f, "drive.files.get", lambda: dict(self.f._archivo(fileId)))
+
+    def get_media(self, fileId: str, **kw):
+        return _Peticion(self.f, "drive.files.get_media", lambda: self.f.contenido.get(fileId, b""))
+
+    def create(self, body: dict, media_body=None, fields: str = "", **kw):
+        def _crear():
+            n = media_body.size() if media_body is not None else 0
+            self.f.bytes_subidos += n or 0
+            return self.f._nuevo(body.get("name"), body.get("mimeType") or getattr(media_body, "mimetype", lambda: None)(),
+                                 (body.get("parents") or [None])[0])
+        return _Peticion(self.f, "drive.files.create", _crear)
+
+    def copy(self, fileId: str, body: dict, fields: str = "", **kw):
+        def _copiar():
+            src = self.f._archivo(fileId)
+            return self.f._nuevo(body.get("name") or src["name"], src["mimeType"], (body.get("parents") or src["parents"])[0])
+        return _Peticion(self.f, "drive.files.copy", _copiar)
+
+    def update(self, fileId: str, body: dict, fields: str = "", **kw):
+        def _actualizar():
+            a = self.f._archivo(fileId)
+            a.update({k: v for k, v in body.items() if k in ("trashed", "name")})
+            return {"id": fileId}
+        return _Peticion(self.f, "drive.files.update", _actualizar)
+
+    def delete(self, fileId: str, **kw):
+        def _borrar():
+            self.f._archivo(fileId)
+            self.f.archivos.pop(fileId, None)
+            return {}
+        return _Peticion(self.f, "drive.files.delete", _borrar)
+
+
+class _Permisos:
+    def __init__(self, fake):
+        self.f = fake
+
+    def create(self, fileId: str, body: dict, fields: str = "", **kw):
+        return _Peticion(self.f, "drive.permissions.create", lambda: {"id": "perm"})
+
+
+class _Cambios:
+    def __init__(self, fake):
+        self.f = fake
+
+    def getStartPageToken(self, **kw):
+        return _Peticion(self.f, "drive.changes.getStartPageToken", lambda: {"startPageToken": "1"})
+
+    def list(self, pageToken: str, **kw):
+        return _Peticion(self.f, "drive.changes.list", lambda: {"changes": [], "newStartPageToken": pageToken})
+
+
+class FakeDrive:
+    """Servicio Drive v3 en memoria. `latencia_ms` se duerme en cada viaje de red."""
+
+    CARPETA = "application/vnd.google-apps.folder"
+
+    def __init__(self, latencia_ms: float = 80):
+        self.latencia = latencia_ms / 1000
+        self.archivos: dict[str, dict] = {}
+        self.contenido: dict[str, bytes] = {}
+        self.llamadas: Counter = Counter()
+        self.bytes_subidos = 0
+        self.viajes = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    # --- API tipo googleapiclient ---
+    def files(self):
+        return _Files(self)
+
+    def permissions(self):
+        return _Permisos(self)
+
+    def changes(self):
+        return _Cambios(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    # --- utilidades ---
+    def reiniciar_contadores(self):
+        self.llamadas.clear()
+        self.bytes_subidos = 0
+        self.viajes = 0
+
+    def sembrar(self, file_id: str, nombre: str, mime: str, parent: str | None):
+        self.archivos[file_id] = {"id": file_id, "name": nombre, "mimeType": mime, "parents": [parent] if parent else [],
+                                  "trashed": False, "webViewLink": f"https://drive.google.com/file/d/{file_id}/view"}
+
+    def _dormir(self):
+        self.viajes += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def _ejecutar(self, metodo: str, fn):
+        self._dormir()
+        self.llamadas[metodo] += 1
+        return fn()
+
+    def _nuevo(self, nombre, mime, parent) -> dict:
+        with self._lock:
+            fid = f"fake{next(self._ids):012d}"
+        self.sembrar(fid, nombre, mime or "application/octet-stream", parent)
+        return {"id": fid, "webViewLink": self.archivos[fid]["webViewLink"], "thumbnailLink": ""}
+
+    def _archivo(self, fid: str) -> dict:
+        a = self.archivos.get(fid)
+        if a is None:
+            raise FakeHttpError(404)
+        return a
+
+    def _buscar(self, q: str) -> list[dict]:
+        """Subconjunto de la sintaxis `q` de Drive que usa la app."""
+        conds = []
+        for parent in re.findall(r"'([^']+)' in parents", q):
+            conds.append(lambda a, p=parent: p in a["parents"])
+        for nombre in re.findall(r"(?<!\w)name\s*=\s*'((?:[^'\\]|\\.)*)'", q):
+            conds.append(lambda a, n=nombre.replace("\\'", "'"): a["name"] == n)
+        for parte in re.findall(r"name contains '((?:[^'\\]|\\.)*)'", q):
+            conds.append(lambda a, s=parte.replace("\\'", "'"): s in a["name"])
+        for mime in re.findall(r"mimeType\s*=\s*'([^']+)'", q):
+            conds.append(lambda a, m=mime: a["mimeType"] == m)
+        if "trashed=false" in q.replace(" ", ""):
+            conds.append(lambda a: not a["trashed"])
+        return [dict(a) for a in self.archivos.values() if all(c(a) for c in conds)]
+
+
+class FakeWhatsApp:
+    """Sustituto de requests.post para la Graph API: responde 200 con latencia fija."""
+
+    def __init__(self, latencia_ms: float = 150):
+        self.latencia = latencia_ms / 1000
+        self.enviados = 0
+
+    def post(self, url, headers=None, json=None, timeout=None, **kw):
+        time.sleep(self.latencia)
+        self.enviados += 1
+        return _RespuestaWA({"messages": [{"id": f"wamid.fake{self.enviados}"}]})
+
+
+class _RespuestaWA:
+    status_code = 200
+
+    def __init__(self, cuerpo):
+        self._cuerpo = cuerpo
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._cuerpo
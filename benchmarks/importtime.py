@@ -0,0 +1,74 @@
+# benchmarks/importtime.py
+"""
+Tiempo de importación en frío de `modules.core` (lo que paga el login en cada proceso nuevo).
+
+Usa `python -X importtime` en un subproceso limpio y compara:
+  - actual:  import modules.core (dependencias pesadas diferidas)
+  - eager:   import modules.core + las dependencias que antes se importaban al cargar core
+             (pandas, googleapiclient.discovery/http/errors, google.oauth2, requests, bcrypt)
+
+Uso:
+    python benchmarks/importtime.py            # 5 corridas, mediana
+    python benchmarks/importtime.py -n 10 --top 15
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+PESADAS = [
+    "pandas", "googleapiclient.discovery", "googleapiclient.http", "googleapiclient.errors",
+    "google.oauth2.credentials", "google.oauth2.service_account", "requests", "bcrypt",
+]
+
+ESCENARIOS = {
+    "actual": "import modules.core",
+    "eager": "import modules.core; " + "; ".join(f"import {m}" for m in PESADAS),
+}
+
+_LINEA = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def medir(codigo: str) -> tuple[int, dict[str, int]]:
+    """Devuelve (µs totales, {modulo_top: µs acumulados}) de una importación en frío."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=RAIZ, env=env, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        raise SystemExit(out.stderr[-2000:])
+    tops = {}
+    for linea in out.stderr.splitlines():
+        m = _LINEA.match(linea)
+        if m and len(m.group(3)) == 1:  # solo módulos de primer nivel
+            tops[m.group(4)] = int(m.group(2))
+    return sum(tops.values()), tops
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("-n", type=int, default=5, help="corridas por escenario")
+    ap.add_argument("--top", type=int, default=10, help="módulos más lentos a listar")
+    args = ap.parse_args(argv)
+
+    res = {}
+    for nombre, codigo in ESCENARIOS.items():
+        corridas = [medir(codigo) for _ in range(args.n)]
+        res[nombre] = statistics.median(t for t, _ in corridas)
+        print(f"\n== {nombre}: mediana {res[nombre] / 1000:.1f} ms ({args.n} corridas)")
+        for mod, us in sorted(corridas[-1][1].items(), key=lambda kv: -kv[1])[: args.top]:
+            print(f"   {us / 1000:8.1f} ms  {mod}")
+
+    ahorro = res["eager"] - res["actual"]
+    print(f"\nAhorro en frío: {ahorro / 1000:.1f} ms ({ahorro / res['eager']:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
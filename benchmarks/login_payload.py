@@ -0,0 +1,41 @@
+# benchmarks/login_payload.py
+"""
+Bytes de imágenes que cuesta renderizar el login: base64 inline vs estáticos cacheables.
+
+  - antes:  los 4 PNG de assets/ en base64 dentro del markdown → viajan por el websocket
+            en CADA render del login y el navegador no los puede cachear.
+  - ahora:  el markdown solo lleva <picture> con URLs a static/ (ver modules/theme.asset_img);
+            la primera visita descarga las variantes WebP por HTTP y las siguientes usan caché.
+
+Uso:
+    python benchmarks/login_payload.py
+"""
+import base64
+import json
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+IMAGENES = ["Logo.png", "ig.png", "tiktok.png", "wa.png"]
+
+
+def main() -> int:
+    manif = json.loads((RAIZ / "static" / "assets.json").read_text(encoding="utf-8"))
+    antes = sum(len(base64.b64encode((RAIZ / "assets" / n).read_bytes())) for n in IMAGENES)
+    html, http_webp = 0, 0
+    for n in IMAGENES:
+        m = manif[Path(n).stem]
+        tag = (f'<picture><source type="image/webp" srcset="app/static/{m["webp"]["file"]}?v={m["webp"]["hash"]}">'
+               f'<img src="app/static/{m["png"]["file"]}?v={m["png"]["hash"]}" alt="" decoding="async"></picture>')
+        html += len(tag.encode())
+        http_webp += m["webp"]["bytes"]
+    print(json.dumps({
+        "antes_websocket_por_render_B": antes,
+        "ahora_websocket_por_render_B": html,
+        "ahora_http_primera_visita_B": http_webp,
+        "ahora_http_visitas_siguientes_B": 0,
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
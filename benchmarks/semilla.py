@@ -0,0 +1,186 @@
+# benchmarks/semilla.py
+"""
+Base de datos sintética para los benchmarks: pacientes, citas, mediciones y fotos a escala.
+
+Trabaja sobre un Postgres LOCAL desechable: crea el esquema con setup_db() y VACÍA todas las
+tablas del esquema public antes de sembrar (por eso se niega a tocar hosts que no sean locales,
+salvo --permitir-remoto). Todo es determinista para una misma --semilla.
+
+Escalas (pacientes / mediciones por paciente / fotos por medición / días de citas pasadas):
+    pequena   200 / 6 / 3 / 60
+    mediana  2000 / 8 / 3 / 365
+    grande  20000 / 8 / 4 / 730
+
+Todos los pacientes comparten la contraseña PASSWORD (un solo hash bcrypt). Mañana queda con
+la agenda llena (recordatorios) y los días 30–60 libres (para agendar). Los últimos pacientes
+no tienen citas, así las pruebas de agendar no chocan con la regla de 7 días.
+
+Uso:
+    python benchmarks/semilla.py --dsn postgresql://localhost/carmen_bench --escala mediana
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+ESCALAS = {
+    "pequena": {"pacientes": 200, "mediciones": 6, "fotos": 3, "dias_citas": 60},
+    "mediana": {"pacientes": 2000, "mediciones": 8, "fotos": 3, "dias_citas": 365},
+    "grande": {"pacientes": 20000, "mediciones": 8, "fotos": 4, "dias_citas": 730},
+}
+PASSWORD = "benchmark1"
+DSN_DEFECTO = "postgresql://localhost/carmen_bench"
+_HOSTS_LOCALES = ("", "localhost", "127.0.0.1", "::1")
+
+_NOMBRES = ["Ana", "Luis", "María", "José", "Sofía", "Diego", "Valeria", "Jorge", "Camila", "Andrés",
+            "Fernanda", "Ricardo", "Daniela", "Héctor", "Paola", "Emilio", "Regina", "Óscar"]
+_APELLIDOS = ["García", "Hernández", "López", "Martínez", "González", "Pérez", "Rodríguez", "Sánchez",
+              "Ramírez", "Flores", "Gómez", "Díaz", "Cruz", "Morales", "Núñez", "Ibáñez"]
+
+
+def preparar_entorno(dsn: str, permitir_remoto: bool = False, almacen: str = "drive"):
+    """
+    Variables de entorno para importar `modules.*` contra la base de pruebas.
+    Debe llamarse ANTES de importar cualquier módulo de la app (config se lee al importar).
+    almacen: "drive" (el FakeDrive de benchmarks/fakes.py) o "local" (directorio temporal).
+    """
+    from psycopg.conninfo import conninfo_to_dict
+    host = str(conninfo_to_dict(dsn).get("host") or "")
+    if host not in _HOSTS_LOCALES and not host.startswith("/") and not permitir_remoto:
+        raise SystemExit(f"El benchmark vacía la base; {host!r} no es local (usa --permitir-remoto si es a propósito).")
+    os.environ.update({
+        "NEON_DATABASE_URL": dsn,
+        "DRIVE_ROOT_FOLDER_ID": "semilla_raiz",
+        "DRIVE_PUBLIC_LINKS": "0",
+        "INSTRUMENTACION": "1",
+        "METRICAS_BUFFER": "50000",
+        # el limitador de intentos no es lo que se mide
+        "LOGIN_INTENTOS": "1000000",
+        "LOGIN_INTENTOS_IP": "1000000",
+        "WHATSAPP_PHONE_ID": "000000000000000",
+        "WHATSAPP_TOKEN": "benchmark",
+        "WHATSAPP_TEMPLATE": "recordatorio_cita",
+        "STORAGE_BACKEND": almacen,
+    })
+    if almacen == "local":
+        import tempfile
+        os.environ["STORAGE_DIR"] = tempfile.mkdtemp(prefix="carmen_almacen_")
+    # el espejo SQLite podría venir de secrets.toml: aquí siempre se lee del primario
+    from modules import db
+    db.LOCAL_MIRROR_PATH = None
+
+
+def _vaciar(cur):
+    cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public'")
+    tablas = [r[0] for r in cur.fetchall()]
+    if tablas:
+        cur.execute("TRUNCATE " + ", ".join(f'"{t}"' for t in tablas) + " RESTART IDENTITY CASCADE")
+
+
+def _dias_con_slots(desde: date, hasta: date):
+    from modules.agenda import generar_slots
+    d = desde
+    while d <= hasta:
+        slots = generar_slots(d)
+        if slots:
+            yield d, slots
+        d += timedelta(days=1)
+
+
+def sembrar(escala: str = "pequena", semilla: int = 7) -> dict:
+    """Vacía la base y la llena. Devuelve conteos y los ids útiles para los casos del benchmark."""
+    from modules.auth import hash_password
+    from modules.db import conn, setup_db
+
+    cfg, rnd = ESCALAS[escala], random.Random(semilla)
+    n_pac = cfg["pacientes"]
+    libres = max(50, n_pac // 10)  # pacientes sin citas (para agendar)
+    hoy = date.today()
+    t0 = perf_counter()
+
+    setup_db()
+    pw_hash = hash_password(PASSWORD)
+    c = conn()
+    res = {"escala": escala, "semilla": semilla}
+    with c.transaction(), c.cursor() as cur:
+        _vaciar(cur)
+
+        with cur.copy("COPY pacientes (nombre, telefono, password_hash, drive_folder_id, creado_en) FROM STDIN") as cp:
+            for i in range(1, n_pac + 1):
+                nombre = f"{rnd.choice(_NOMBRES)} {rnd.choice(_APELLIDOS)} {rnd.choice(_APELLIDOS)}"
+                cp.write_row((nombre, f"55{i:08d}", pw_hash, f"semilla_p{i}",
+                              datetime.now() - timedelta(days=rnd.randint(0, 900))))
+        res["pacientes"] = n_pac
+        con_citas = range(1, n_pac - libres + 1)
+
+        # citas: pasado lleno al ~80 %, próximas 2 semanas al ~60 %, mañana completo; días 30-60 libres
+        n_citas = 0
+        with cur.copy("COPY citas (fecha, hora, paciente_id, nota) FROM STDIN") as cp:
+            for d, slots in _dias_con_slots(hoy - timedelta(days=cfg["dias_citas"]), hoy + timedelta(days=14)):
+                ocupacion = 1.0 if d == hoy + timedelta(days=1) else (0.8 if d <= hoy else 0.6)
+                for h in slots:
+                    if rnd.random() < ocupacion:
+                        cp.write_row((d, h, rnd.choice(con_citas), None)); n_citas += 1
+        res["citas"] = n_citas
+
+        # mediciones cada ~4 semanas hacia atrás; fotos en la carpeta de cada cita
+        n_med = n_fotos = 0
+        with cur.copy("""COPY mediciones (paciente_id, fecha, peso_kg, grasa_pct, musculo_pct, cintura_cm,
+                                          cadera_cm, rutina_pdf, plan_pdf, drive_cita_folder_id) FROM STDIN""") as cp:
+            fotos = []
+            for pid in range(1, n_pac + 1):
+                peso = rnd.uniform(55, 110)
+                for k in range(cfg["mediciones"]):
+                    f = (hoy - timedelta(days=28 * k + rnd.randint(0, 6))).isoformat()
+                    carpeta = f"semilla_c{pid}_{k}"
+                    link = f"https://drive.google.com/file/d/semilla_pdf{pid}_{k}/view"
+                    cp.write_row((pid, f, round(peso - k * 0.4, 1), round(rnd.uniform(15, 38), 1),
+                                  round(rnd.uniform(25, 45), 1), round(rnd.uniform(65, 110), 1),
+                                  round(rnd.uniform(85, 120), 1), link, link, carpeta))
+                    n_med += 1
+                    for j in range(1, cfg["fotos"] + 1):
+                        fotos.append((pid, f, f"semilla_f{pid}_{k}_{j}", f"{f}_foto_{j:02d}.jpg", carpeta))
+        with cur.copy("COPY fotos (paciente_id, fecha, drive_file_id, web_view_link, filename) FROM STDIN") as cp:
+            for pid, f, fid, nombre, _ in fotos:
+                cp.write_row((pid, f, fid, f"https://drive.google.com/file/d/{fid}/view", nombre)); n_fotos += 1
+        res["mediciones"], res["fotos"] = n_med, n_fotos
+
+    with c.cursor() as cur:
+        cur.execute("ANALYZE")
+    res["segundos"] = round(perf_counter() - t0, 2)
+    res["libres_desde"] = n_pac - libres + 1
+    return res
+
+
+def sembrar_drive(fake, pid: int, fecha: str):
+    """Registra en el FakeDrive la carpeta y las fotos sembradas de (paciente, fecha)."""
+    from modules.db import df_sql
+    m = df_sql("SELECT drive_cita_folder_id FROM mediciones WHERE paciente_id=%s AND fecha=%s", (pid, fecha))
+    carpeta = None if m.empty else m.loc[0, "drive_cita_folder_id"]
+    if carpeta:
+        fake.sembrar(carpeta, fecha, fake.CARPETA, f"semilla_p{pid}")
+    for _, r in df_sql("SELECT drive_file_id, filename FROM fotos WHERE paciente_id=%s AND fecha=%s", (pid, fecha)).iterrows():
+        fake.sembrar(r["drive_file_id"], r["filename"], "image/jpeg", carpeta)
+
+
+def main(argv=None) -> int:
+    import json
+    ap = argparse.ArgumentParser(description="Siembra una base local con datos sintéticos")
+    ap.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", DSN_DEFECTO))
+    ap.add_argument("--escala", choices=list(ESCALAS), default="pequena")
+    ap.add_argument("--semilla", type=int, default=7)
+    ap.add_argument("--permitir-remoto", action="store_true")
+    args = ap.parse_args(argv)
+
+    preparar_entorno(args.dsn, args.permitir_remoto)
+    print(json.dumps(sembrar(args.escala, args.semilla), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
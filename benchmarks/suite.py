@@ -0,0 +1,264 @@
+# benchmarks/suite.py
+"""
+Suite reproducible de las rutas calientes contra un Postgres local sembrado y Drive/WhatsApp falsos.
+
+Casos (cada uno se repite --repeticiones veces; solo se cronometra la llamada, no su preparación):
+    login_paciente             teléfono + contraseña correctos (bcrypt en el pool)
+    agendar_cita_autenticado   pacientes sin citas, slots libres a 30-60 días
+    citas_por_dia              agenda de mañana
+    slots_ocupados             un día de las próximas 2 semanas
+    agenda_rango               semana desde hoy (grid de Carmen)
+    historial                  primera página de mediciones + PDFs + fotos de un paciente
+    delete_medicion_dia        borra la última medición (fotos a papelera en batch)
+    subir_fotos                lote de --fotos imágenes de ~200 KB a una fecha nueva
+    recordatorios              enviar_recordatorios_manana() contra la Graph API falsa
+
+Entre iteraciones se vacía st.cache_data (mide el camino frío a la base) salvo con --con-cache.
+Por caso reporta p50/p95/p99/media/mín/máx en ms, consultas SQL y llamadas a Drive por iteración.
+La latencia de red simulada se ajusta con --latencia-drive-ms / --latencia-wa-ms; con --almacen local
+los archivos van al StorageBackend en disco (modules/almacenamiento.py) en vez de al Drive falso.
+
+Uso:
+    python benchmarks/suite.py --escala mediana -n 20 --salida bench.json
+    python benchmarks/suite.py --sin-sembrar --casos login_paciente,historial
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks import semilla  # noqa: E402
+from benchmarks.fakes import FakeDrive, FakeWhatsApp  # noqa: E402
+
+
+class _Subida(io.BytesIO):
+    """Lo mínimo de un UploadedFile de Streamlit: .name, .type y lectura."""
+
+    def __init__(self, datos: bytes, name: str, type: str = "image/jpeg"):
+        super().__init__(datos)
+        self.name, self.type = name, type
+
+
+class Contexto:
+    def __init__(self, info: dict, rnd: random.Random, fake: FakeDrive, args):
+        self.info, self.rnd, self.fake, self.args = info, rnd, fake, args
+        self.n_pac = info["pacientes"]
+        self.libres_desde = info["libres_desde"]
+        self.hoy = date.today()
+        # slots libres para agendar: días 30-60 (la semilla no pone citas ahí)
+        from modules.agenda import generar_slots
+        self.slots_libres = [(self.hoy + timedelta(days=d), h)
+                             for d in range(30, 61) for h in generar_slots(self.hoy + timedelta(days=d))]
+
+
+# --------- casos: cada uno prepara y devuelve la llamada a cronometrar ---------
+def caso_login_paciente(ctx: Contexto, i: int):
+    from modules.auth import login_paciente
+    tel = f"55{ctx.rnd.randint(1, ctx.n_pac):08d}"
+    return lambda: login_paciente(tel, semilla.PASSWORD)
+
+
+def caso_agendar_cita_autenticado(ctx: Contexto, i: int):
+    from modules.agenda import agendar_cita_autenticado
+    pool = ctx.n_pac - ctx.libres_desde + 1
+    # cada iteración usa otro paciente; si se reciclan, la fecha queda a más de 7 días
+    fecha, hora = ctx.slots_libres[(i * 11) % len(ctx.slots_libres)]
+    pid = ctx.libres_desde + (i % pool)
+    return lambda: agendar_cita_autenticado(fecha, hora, pid, "benchmark")
+
+
+def caso_citas_por_dia(ctx: Contexto, i: int):
+    from modules.agenda import citas_por_dia
+    return lambda: citas_por_dia(ctx.hoy + timedelta(days=1))
+
+
+def caso_slots_ocupados(ctx: Contexto, i: int):
+    from modules.agenda import slots_ocupados
+    fecha = ctx.hoy + timedelta(days=ctx.rnd.randint(1, 14))
+    return lambda: slots_ocupados(fecha)
+
+
+def caso_agenda_rango(ctx: Contexto, i: int):
+    from modules.agenda import agenda_rango
+    return lambda: agenda_rango(ctx.hoy, 7)
+
+
+def caso_historial(ctx: Contexto, i: int):
+    from modules.mediciones import mediciones_pagina, pdfs_pagina, fotos_pagina
+    pid = ctx.rnd.randint(1, ctx.libres_desde - 1)
+
+    def _historial():
+        mediciones_pagina(pid); pdfs_pagina(pid); fotos_pagina(pid)
+    return _historial
+
+
+def caso_delete_medicion_dia(ctx: Contexto, i: int):
+    from modules.db import df_sql
+    from modules.mediciones import delete_medicion_dia
+    pid = 1 + i  # uno distinto por iteración
+    d = df_sql("SELECT max(fecha) AS f FROM mediciones WHERE paciente_id=%s", (pid,))
+    fecha = d.loc[0, "f"]
+    if ctx.args.almacen == "drive":
+        semilla.sembrar_drive(ctx.fake, pid, fecha)
+    return lambda: delete_medicion_dia(pid, fecha)
+
+
+def caso_subir_fotos(ctx: Contexto, i: int):
+    from modules.mediciones import subir_fotos
+    pid = ctx.n_pac - i  # pacientes del final: no los toca delete_medicion_dia
+    fecha = (ctx.hoy + timedelta(days=1)).isoformat()
+    lote = [_Subida(ctx.rnd.randbytes(200_000), f"IMG_{i:03d}_{k:02d}.jpg") for k in range(ctx.args.fotos)]
+    return lambda: subir_fotos(pid, fecha, lote)
+
+
+def caso_recordatorios(ctx: Contexto, i: int):
+    from modules.whatsapp import enviar_recordatorios_manana
+    return lambda: enviar_recordatorios_manana()
+
+
+CASOS = {n[len("caso_"):]: f for n, f in dict(globals()).items() if n.startswith("caso_")}
+
+
+# --------- medición ---------
+def _pct(xs: list[float], p: float) -> float:
+    """Percentil por rango más cercano."""
+    s = sorted(xs)
+    return s[min(len(s), max(1, math.ceil(p * len(s)))) - 1]
+
+
+def _resumen(ms: list[float]) -> dict:
+    if not ms:
+        return {}
+    return {
+        "n": len(ms),
+        "p50_ms": round(_pct(ms, 0.50), 2),
+        "p95_ms": round(_pct(ms, 0.95), 2),
+        "p99_ms": round(_pct(ms, 0.99), 2),
+        "media_ms": round(sum(ms) / len(ms), 2),
+        "min_ms": round(min(ms), 2),
+        "max_ms": round(max(ms), 2),
+    }
+
+
+def correr_caso(nombre: str, ctx: Contexto, repeticiones: int, con_cache: bool) -> dict:
+    import streamlit as st
+    from modules import metricas
+
+    fabrica, ms, errores = CASOS[nombre], [], []
+    metricas.reiniciar()
+    ctx.fake.reiniciar_contadores()
+    for i in range(repeticiones):
+        fn = fabrica(ctx, i)
+        if not con_cache:
+            st.cache_data.clear()
+        t0 = perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            errores.append(f"{type(e).__name__}: {e}")
+            continue
+        ms.append((perf_counter() - t0) * 1000)
+
+    hist = metricas.histogramas()
+    sql = sum(h["n"] for (t, _), h in hist.items() if t == "sql")
+    sql_ms = sum(h["total_ms"] for (t, _), h in hist.items() if t == "sql")
+    drive = sum(v for k, v in ctx.fake.llamadas.items() if k != "batch")
+    return {
+        **_resumen(ms),
+        "errores": len(errores),
+        "primer_error": errores[0] if errores else None,
+        "sql_por_iter": round(sql / repeticiones, 2),
+        "sql_ms_por_iter": round(sql_ms / repeticiones, 2),
+        "drive_por_iter": round(drive / repeticiones, 2),
+        "drive_viajes_por_iter": round(ctx.fake.viajes / repeticiones, 2),  # un batch = un viaje
+        "drive_metodos": dict(ctx.fake.llamadas),
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parents[1], timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark de rutas calientes con Postgres local y Drive falso")
+    ap.add_argument("--dsn", default=os.getenv("BENCH_DATABASE_URL", semilla.DSN_DEFECTO))
+    ap.add_argument("--escala", choices=list(semilla.ESCALAS), default="pequena")
+    ap.add_argument("--semilla", type=int, default=7)
+    ap.add_argument("-n", "--repeticiones", type=int, default=20)
+    ap.add_argument("--casos", default=",".join(CASOS), help="lista separada por comas")
+    ap.add_argument("--fotos", type=int, default=10, help="imágenes por lote en subir_fotos")
+    ap.add_argument("--almacen", choices=["drive", "local"], default="drive",
+                    help="drive = FakeDrive con latencia; local = StorageBackend en disco")
+    ap.add_argument("--latencia-drive-ms", type=float, default=80)
+    ap.add_argument("--latencia-wa-ms", type=float, default=150)
+    ap.add_argument("--con-cache", action="store_true", help="no vaciar st.cache_data entre iteraciones")
+    ap.add_argument("--sin-sembrar", action="store_true", help="reusar la base ya sembrada")
+    ap.add_argument("--permitir-remoto", action="store_true")
+    ap.add_argument("--salida", help="archivo JSON (además de stdout)")
+    args = ap.parse_args(argv)
+
+    casos = [c.strip() for c in args.casos.split(",") if c.strip()]
+    desconocidos = [c for c in casos if c not in CASOS]
+    if desconocidos:
+        raise SystemExit(f"Casos desconocidos: {desconocidos}. Disponibles: {list(CASOS)}")
+
+    semilla.preparar_entorno(args.dsn, args.permitir_remoto, args.almacen)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)  # avisos de "sin runtime" fuera de `streamlit run`
+
+    import requests
+    from modules import drive
+    fake, wa = FakeDrive(args.latencia_drive_ms), FakeWhatsApp(args.latencia_wa_ms)
+    drive._drive_service = lambda: fake
+    requests.post = wa.post
+
+    if args.sin_sembrar:
+        from modules.db import df_sql
+        n = int(df_sql("SELECT count(*) AS n FROM pacientes").loc[0, "n"])
+        info = {"pacientes": n, "libres_desde": n - max(50, n // 10) + 1, "escala": args.escala}
+    else:
+        info = semilla.sembrar(args.escala, args.semilla)
+
+    ctx = Contexto(info, random.Random(args.semilla), fake, args)
+    resultados = {}
+    for c in casos:
+        resultados[c] = correr_caso(c, ctx, args.repeticiones, args.con_cache)
+        print(f"{c:28s} p50={resultados[c].get('p50_ms', '-')} ms  p95={resultados[c].get('p95_ms', '-')} ms  "
+              f"errores={resultados[c]['errores']}", file=sys.stderr)
+
+    salida = {
+        "meta": {
+            "commit": _commit(),
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "repeticiones": args.repeticiones,
+            "con_cache": args.con_cache,
+            "almacen": args.almacen,
+            "latencia_drive_ms": args.latencia_drive_ms,
+            "latencia_wa_ms": args.latencia_wa_ms,
+            "semilla": info,
+        },
+        "casos": resultados,
+    }
+    txt = json.dumps(salida, indent=2, ensure_ascii=False, default=str)
+    print(txt)
+    if args.salida:
+        Path(args.salida).write_text(txt + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
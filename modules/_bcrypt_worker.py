@@ -0,0 +1,15 @@
+# modules/_bcrypt_worker.py
+# Funciones que corren dentro del pool de procesos de bcrypt.
+# Módulo mínimo a propósito: los workers (spawn) solo importan bcrypt, no Streamlit/pandas.
+import bcrypt
+
+
+def hashpw(pw: bytes, cost: int) -> str:
+    return bcrypt.hashpw(pw, bcrypt.gensalt(rounds=cost)).decode()
+
+
+def checkpw(pw: bytes, pw_hash: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(pw, pw_hash)
+    except Exception:
+        return False
@@ -0,0 +1,154 @@
+# modules/agenda.py
+# Agenda: horarios, ocupación de slots y citas.
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, time
+from typing import Optional, TYPE_CHECKING
+
+import streamlit as st
+from psycopg import errors as pg_errors
+
+from modules.config import PASO_MIN, BLOQUEO_DIAS_MIN
+from modules.db import conn, exec_sql, df_sentencia, exec_sentencia, leer_de_espejo
+from modules.auth import normalize_tel, _por_telefono
+from modules.cache_compartida import cache_compartida
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Paciente NO puede agendar hoy ni mañana (a partir del día 3)
+def is_fecha_permitida(fecha: date) -> bool:
+    return fecha >= (date.today() + timedelta(days=BLOQUEO_DIAS_MIN))
+
+def _bloques_del_dia(fecha: date) -> list[tuple[time, time]]:
+    wd = fecha.weekday()  # 0=lun ... 6=dom
+    if 0 <= wd <= 4:
+        return [(time(10,0), time(12,0)), (time(14,0), time(16,30)), (time(18,30), time(19,0))]
+    elif wd == 5:
+        return [(time(8,0), time(14,0))]
+    else:
+        return []
+
+def generar_slots(fecha: date) -> list[time]:
+    slots: list[time] = []
+    delta = timedelta(minutes=PASO_MIN)
+    for ini, fin in _bloques_del_dia(fecha):
+        t = datetime.combine(fecha, ini); tfin = datetime.combine(fecha, fin)
+        while t < tfin:
+            slots.append(t.time()); t += delta
+    return slots
+
+@cache_compartida("slots_ocupados", lambda fecha: [f"citas:{fecha.isoformat()}"], ttl=600,
+                  l2=False, espejo=True, max_entries=1000)
+def slots_ocupados(fecha: date) -> set:
+    """
+    Horas ocupadas del día. La clave de caché lleva la versión de citas:<fecha>
+    (modules/notificaciones): una cita nueva o borrada en cualquier réplica invalida
+    solo ese día; sin escucha activa vale el TTL corto de siempre.
+    """
+    if leer_de_espejo():
+        from modules import espejo
+        r = espejo.slots_ocupados(fecha)
+        if r is not None:
+            return r
+    d = df_sentencia("slots_ocupados", (fecha,))
+    return set(d["hora"].tolist()) if not d.empty else set()
+
+def _espacios_rango(desde: date, dias: int = 7) -> list[str]:
+    return ["pacientes"] + [f"citas:{(desde + timedelta(days=i)).isoformat()}" for i in range(max(int(dias), 1))]
+
+@cache_compartida("agenda_rango", _espacios_rango, ttl=300, ttl_sin_aviso=30)
+def agenda_rango(desde: date, dias: int = 7) -> pd.DataFrame:
+    """
+    Ocupación de la agenda (slots × días) en UNA sola consulta.
+    Los slots se generan con `generar_slots` (única fuente de horarios) y se cruzan en SQL
+    contra las citas del rango; las citas fuera de horario también aparecen (FULL JOIN).
+    Columnas: fecha, hora, id_cita, paciente_id, nombre, telefono, nota, ocupado.
+    """
+    dias = max(int(dias), 1)
+    fechas, horas = [], []
+    for i in range(dias):
+        f = desde + timedelta(days=i)
+        for t in generar_slots(f):
+            fechas.append(f); horas.append(t)
+    hasta = desde + timedelta(days=dias - 1)
+    return df_sentencia("agenda_rango", (fechas, horas, desde, hasta))
+
+def grid_ocupacion(agenda: pd.DataFrame) -> pd.DataFrame:
+    """
+    Matriz horas × días a partir de `agenda_rango` (vectorizado, sin lambdas por fila).
+    Celda: "✅ libre", "🟡 <nombre>" o vacío si ese día no tiene ese horario.
+    """
+    import numpy as np
+    import pandas as pd
+    if agenda.empty:
+        return pd.DataFrame()
+    a = agenda.copy()
+    a["hora_txt"] = pd.to_datetime(a["hora"].astype(str), format="%H:%M:%S").dt.strftime("%H:%M")
+    a["fecha"] = pd.to_datetime(a["fecha"])
+    ocupado = a["ocupado"].fillna(False).astype(bool).to_numpy()
+    a["estado"] = np.where(ocupado, "🟡 " + a["nombre"].fillna("ocupado").astype(str), "✅ libre")
+    grid = a.pivot_table(index="hora_txt", columns="fecha", values="estado", aggfunc="first")
+    grid = grid.sort_index().sort_index(axis=1).fillna("")
+    grid.columns = [c.strftime("%a %d/%m") for c in grid.columns]
+    grid.index.name = "hora"
+    return grid
+
+def crear_o_encontrar_paciente(nombre: str, telefono: str) -> int:
+    tel = normalize_tel(telefono)
+    d = _por_telefono("paciente_id_por_telefono", tel)
+    if not d.empty: return int(d.iloc[0]["id"])
+    with conn().cursor() as cur:
+        # otra sesión pudo registrar el mismo número entre la búsqueda y el INSERT (índice único
+        # de telefono_e164): sin target en ON CONFLICT, sirve aunque el índice aún no sea único
+        cur.execute("INSERT INTO pacientes(nombre, telefono) VALUES (%s, %s) ON CONFLICT DO NOTHING RETURNING id",
+                    (nombre.strip(), tel))
+        fila = cur.fetchone()
+    if fila is None:
+        d = _por_telefono("paciente_id_por_telefono", tel)
+        if d.empty:
+            raise ValueError("No se pudo registrar el teléfono. Intenta de nuevo.")
+        return int(d.iloc[0]["id"])
+    new_id = int(fila[0])
+    try: st.cache_data.clear()
+    except: pass
+    return new_id
+
+def ya_tiene_cita_en_dia(paciente_id: int, fecha: date) -> bool:
+    d = df_sentencia("cita_en_dia", (paciente_id, fecha))
+    return not d.empty
+
+def ya_tiene_cita_en_ventana_7dias(paciente_id: int, fecha_ref: date) -> bool:
+    d = df_sentencia("cita_en_ventana_7dias", (paciente_id, fecha_ref, fecha_ref))
+    return not d.empty
+
+def agendar_cita_autenticado(fecha: date, hora: time, paciente_id: int, nota: Optional[str] = None):
+    # Bloqueo duro: hoy y mañana no se puede (mínimo día 3)
+    if not is_fecha_permitida(fecha):
+        raise ValueError("La fecha seleccionada no está permitida. Debe ser a partir del tercer día.")
+
+    if ya_tiene_cita_en_dia(paciente_id, fecha):
+        raise ValueError("Ya tienes una cita ese día. Solo se permite una por día.")
+
+    if ya_tiene_cita_en_ventana_7dias(paciente_id, fecha):
+        raise ValueError("Solo se permite una cita cada 7 días (respecto a la fecha elegida).")
+
+    try:
+        exec_sentencia("agendar_cita", (fecha, hora, paciente_id, nota))
+    except pg_errors.UniqueViolation:
+        raise ValueError("Ese horario ya fue tomado. Elige otro.")
+
+
+def citas_por_dia(fecha: date):
+    return df_sentencia("citas_por_dia", (fecha,))
+
+def actualizar_cita(cita_id: int, nombre: str, telefono: str, nota: Optional[str]):
+    pid = crear_o_encontrar_paciente(nombre.strip(), telefono.strip())
+    exec_sql("UPDATE citas SET paciente_id=%s, nota=%s WHERE id=%s", (pid, nota, cita_id))
+
+def eliminar_cita(cita_id: int) -> int:
+    with conn().cursor() as cur:
+        cur.execute("DELETE FROM citas WHERE id=%s", (cita_id,)); n = cur.rowcount or 0
+    try: st.cache_data.clear()
+    except: pass
+    return n
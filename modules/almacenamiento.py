@@ -0,0 +1,316 @@
+# modules/almacenamiento.py
+"""
+Dónde viven los archivos (fotos, PDFs, carpetas por paciente/cita).
+
+`StorageBackend` es la interfaz que usan drive.py y media.py; STORAGE_BACKEND elige la
+implementación:
+  - drive  (por defecto): Google Drive v3, `DriveBackend` en modules/drive.py.
+  - local: árbol de archivos bajo STORAGE_DIR. Sin red: crear carpetas o listar una cita
+    cuesta lo que un stat; sirve para despliegues sin Drive y para pruebas.
+  - s3:    el mismo esquema que el local sobre un bucket S3 compatible (MinIO, R2, AWS);
+    necesita boto3.
+
+Los ids son opacos para la app (se siguen guardando en las columnas `drive_*`). Los links
+que quedan en la base (`rutina_pdf`, `plan_pdf`, `web_view_link`) llevan siempre el id como
+`/d/<id>/`, así `drive_id_de_url` y el proxy de medios funcionan igual con cualquier backend.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import streamlit as st
+
+from modules.config import (
+    STORAGE_BACKEND, STORAGE_DIR,
+    S3_BUCKET, S3_ENDPOINT_URL, S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY, S3_REGION,
+)
+from modules.metricas import medir
+
+CARPETA = "application/vnd.google-apps.folder"
+
+
+class StorageBackend:
+    """
+    Operaciones de archivos que necesita la app. Los dicts de archivo usan las claves de
+    Drive: id, name, mimeType (+ createdTime, parents, trashed, webViewLink, md5Checksum
+    cuando el backend las tiene).
+    """
+    nombre = ""
+    raiz: str | None = None  # carpeta bajo la que cuelgan las de pacientes (None = raíz del backend)
+
+    def ensure_folder(self, nombre: str, parent_id: str | None = None) -> str:
+        """Id de la carpeta `nombre` dentro de `parent_id`; la crea si no existe."""
+        raise NotImplementedError
+
+    def upload(self, datos: bytes, nombre: str, parent_id: str, mime: str) -> dict:
+        """Sube un archivo nuevo. Devuelve {"id", "webViewLink"}."""
+        raise NotImplementedError
+
+    def copy(self, file_id: str, nombre: str, parent_id: str) -> dict:
+        """Copia del lado del backend (sin volver a mandar los bytes). Devuelve {"id", "webViewLink"}."""
+        raise NotImplementedError
+
+    def list(self, parent_id: str | None, nombre: str | None = None, prefijo: str | None = None,
+             mime: str | None = None, carpetas: bool | None = None) -> list[dict]:
+        """Hijos vigentes (no en papelera) de `parent_id`, filtrados por nombre exacto, prefijo o tipo."""
+        raise NotImplementedError
+
+    def get(self, file_id: str) -> dict | None:
+        """Metadatos del archivo; None si no existe."""
+        raise NotImplementedError
+
+    def download(self, file_id: str, destino: Path) -> dict:
+        """Escribe el contenido en `destino` y devuelve los metadatos."""
+        raise NotImplementedError
+
+    def trash(self, file_ids: list[str], borrar: bool = False) -> dict[str, Exception]:
+        """
+        Manda a papelera (o borra) los archivos; una carpeta se lleva su contenido.
+        Los que ya no existen no cuentan. Devuelve {id: error} de los que fallaron.
+        """
+        raise NotImplementedError
+
+    def url_for(self, file_id: str) -> str:
+        """Link estable para guardar en la base (contiene `/d/<id>/`)."""
+        raise NotImplementedError
+
+    def make_public(self, file_id: str) -> None:
+        """Lectura pública del archivo, si el backend lo soporta (solo Drive)."""
+
+
+# --------- backends de objetos: local y S3 ---------
+class _ObjetosBackend(StorageBackend):
+    """
+    Árbol de Drive sobre un almacén clave → bytes:
+        obj/<id[:2]>/<id>.json   metadatos (name, mimeType, parents, trashed, createdTime, md5Checksum)
+        obj/<id[:2]>/<id>.bin    contenido
+        hijos/<parent>/<id>      marca vacía: listar una carpeta es listar este prefijo
+    Las subclases solo implementan _leer/_escribir/_borrar/_claves/_a_archivo.
+    """
+    _RAIZ = "_raiz"
+
+    def __init__(self):
+        self._lock = threading.Lock()  # ensure_folder: dos reruns no crean la misma carpeta dos veces
+
+    # primitivas
+    def _leer(self, clave: str) -> bytes | None: raise NotImplementedError
+    def _escribir(self, clave: str, datos: bytes) -> None: raise NotImplementedError
+    def _borrar(self, clave: str) -> None: raise NotImplementedError
+    def _claves(self, prefijo: str) -> list[str]: raise NotImplementedError
+    def _a_archivo(self, clave: str, destino: Path) -> None: raise NotImplementedError
+
+    @staticmethod
+    def _k_meta(fid: str) -> str:
+        return f"obj/{fid[:2]}/{fid}.json"
+
+    @staticmethod
+    def _k_datos(fid: str) -> str:
+        return f"obj/{fid[:2]}/{fid}.bin"
+
+    def _k_hijo(self, parent_id: str | None, fid: str = "") -> str:
+        return f"hijos/{parent_id or self._RAIZ}/{fid}"
+
+    def _guardar(self, meta: dict):
+        self._escribir(self._k_meta(meta["id"]), json.dumps(meta).encode())
+
+    def _crear(self, nombre: str, mime: str, parent_id: str | None, datos: bytes | None = None) -> dict:
+        fid = uuid.uuid4().hex
+        meta = {
+            "id": fid, "name": nombre, "mimeType": mime,
+            "parents": [parent_id] if parent_id else [], "trashed": False,
+            "createdTime": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        }
+        if datos is not None:
+            self._escribir(self._k_datos(fid), datos)
+            meta["md5Checksum"], meta["size"] = hashlib.md5(datos).hexdigest(), len(datos)
+        self._guardar(meta)
+        self._escribir(self._k_hijo(parent_id, fid), b"")
+        return {"id": fid, "webViewLink": self.url_for(fid)}
+
+    def get(self, file_id: str) -> dict | None:
+        crudo = self._leer(self._k_meta(file_id)) if file_id else None
+        if crudo is None:
+            return None
+        meta = json.loads(crudo)
+        meta["webViewLink"] = self.url_for(file_id)
+        return meta
+
+    def ensure_folder(self, nombre: str, parent_id: str | None = None) -> str:
+        with self._lock:
+            ex = self.list(parent_id, nombre=nombre, carpetas=True)
+            return ex[0]["id"] if ex else self._crear(nombre, CARPETA, parent_id)["id"]
+
+    def upload(self, datos: bytes, nombre: str, parent_id: str, mime: str) -> dict:
+        return self._crear(nombre, mime, parent_id, bytes(datos))
+
+    def copy(self, file_id: str, nombre: str, parent_id: str) -> dict:
+        src, datos = self.get(file_id), self._leer(self._k_datos(file_id))
+        if src is None or datos is None:
+            raise FileNotFoundError(file_id)
+        return self._crear(nombre, src["mimeType"], parent_id, datos)
+
+    def list(self, parent_id: str | None, nombre: str | None = None, prefijo: str | None = None,
+             mime: str | None = None, carpetas: bool | None = None) -> list[dict]:
+        base = self._k_hijo(parent_id)
+        res = []
+        for k in self._claves(base):
+            m = self.get(k[len(base):])
+            if m is None or m.get("trashed"):
+                continue
+            if nombre is not None and m["name"] != nombre: continue
+            if prefijo is not None and not m["name"].startswith(prefijo): continue
+            if mime is not None and m["mimeType"] != mime: continue
+            if carpetas is not None and (m["mimeType"] == CARPETA) != carpetas: continue
+            res.append({k2: m.get(k2) for k2 in ("id", "name", "mimeType", "createdTime")})
+        return sorted(res, key=lambda f: f["createdTime"] or "")
+
+    def download(self, file_id: str, destino: Path) -> dict:
+        meta = self.get(file_id)
+        if meta is None or meta["mimeType"] == CARPETA:
+            raise FileNotFoundError(file_id)
+        self._a_archivo(self._k_datos(file_id), destino)
+        return meta
+
+    def _arbol(self, file_id: str) -> list[str]:
+        ids, pendientes = [], [file_id]
+        while pendientes:
+            fid = pendientes.pop()
+            ids.append(fid)
+            base = self._k_hijo(fid)
+            pendientes += [k[len(base):] for k in self._claves(base)]
+        return ids
+
+    def trash(self, file_ids: list[str], borrar: bool = False) -> dict[str, Exception]:
+        errores = {}
+        for fid in dict.fromkeys(i for i in file_ids if i):
+            meta = self.get(fid)
+            if meta is None:
+                continue
+            try:
+                self._borrar(self._k_hijo((meta.get("parents") or [None])[0], fid))
+                for sub in self._arbol(fid):
+                    if borrar:
+                        for k in self._claves(self._k_hijo(sub)):
+                            self._borrar(k)
+                        self._borrar(self._k_datos(sub))
+                        self._borrar(self._k_meta(sub))
+                    else:
+                        m = self.get(sub)
+                        if m is not None and not m.get("trashed"):
+                            m["trashed"] = True
+                            m.pop("webViewLink", None)
+                            self._guardar(m)
+            except Exception as e:
+                errores[fid] = e
+        return errores
+
+    def url_for(self, file_id: str) -> str:
+        return f"{self.nombre}://archivos/d/{file_id}/view"
+
+
+class LocalBackend(_ObjetosBackend):
+    nombre = "local"
+
+    def __init__(self, directorio: str | os.PathLike):
+        super().__init__()
+        self.dir = Path(directorio)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _leer(self, clave):
+        try:
+            return (self.dir / clave).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _escribir(self, clave, datos):
+        ruta = self.dir / clave
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ruta.with_name(f".{ruta.name}.{secrets.token_hex(4)}.tmp")
+        try:
+            tmp.write_bytes(datos)
+            os.replace(tmp, ruta)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def _borrar(self, clave):
+        (self.dir / clave).unlink(missing_ok=True)
+
+    def _claves(self, prefijo):
+        d = self.dir / prefijo
+        try:
+            return [prefijo + p.name for p in d.iterdir() if not p.name.startswith(".")]
+        except FileNotFoundError:
+            return []
+
+    def _a_archivo(self, clave, destino):
+        try:
+            shutil.copyfile(self.dir / clave, destino)
+        except FileNotFoundError:
+            raise FileNotFoundError(clave) from None
+
+
+class S3Backend(_ObjetosBackend):
+    nombre = "s3"
+
+    def __init__(self, bucket: str, endpoint_url: str | None = None, access_key: str | None = None,
+                 secret_key: str | None = None, region: str | None = None):
+        import boto3  # opcional: solo con STORAGE_BACKEND=s3
+        super().__init__()
+        self.bucket = bucket
+        self.s3 = boto3.client(
+            "s3", endpoint_url=endpoint_url or None, region_name=region or None,
+            aws_access_key_id=access_key or None, aws_secret_access_key=secret_key or None,
+        )
+
+    def _leer(self, clave):
+        with medir("almacen", "s3.get_object"):
+            try:
+                return self.s3.get_object(Bucket=self.bucket, Key=clave)["Body"].read()
+            except self.s3.exceptions.NoSuchKey:
+                return None
+
+    def _escribir(self, clave, datos):
+        with medir("almacen", "s3.put_object"):
+            self.s3.put_object(Bucket=self.bucket, Key=clave, Body=datos)
+
+    def _borrar(self, clave):
+        with medir("almacen", "s3.delete_object"):
+            self.s3.delete_object(Bucket=self.bucket, Key=clave)
+
+    def _claves(self, prefijo):
+        claves = []
+        with medir("almacen", "s3.list_objects_v2"):
+            for pag in self.s3.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefijo):
+                claves += [o["Key"] for o in pag.get("Contents", [])]
+        return claves
+
+    def _a_archivo(self, clave, destino):
+        with medir("almacen", "s3.download_file"):
+            self.s3.download_file(self.bucket, clave, str(destino))
+
+
+# --------- backend configurado ---------
+@st.cache_resource(show_spinner=False)
+def _backend(tipo: str) -> StorageBackend:
+    if tipo == "local":
+        return LocalBackend(STORAGE_DIR)
+    if tipo == "s3":
+        if not S3_BUCKET:
+            raise RuntimeError("STORAGE_BACKEND=s3 necesita S3_BUCKET.")
+        return S3Backend(S3_BUCKET, S3_ENDPOINT_URL, S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY, S3_REGION)
+    if tipo != "drive":
+        raise RuntimeError(f"STORAGE_BACKEND desconocido: {tipo!r} (drive | local | s3).")
+    from modules.drive import DriveBackend
+    return DriveBackend()
+
+
+def get_backend() -> StorageBackend:
+    return _backend(STORAGE_BACKEND)
@@ -0,0 +1,204 @@
+# modules/auth.py
+# Acceso de Carmen y pacientes (registro, login, contraseñas).
+import re
+from typing import Optional
+
+import streamlit as st
+from psycopg import errors as pg_errors
+
+from modules.config import ADMIN_USER, ADMIN_PASSWORD
+from modules.db import conn, exec_sql, df_sentencia, exec_sentencia, leer_de_espejo
+from modules.drive import ensure_patient_folder
+from modules.metricas import contar
+
+# --------- AUTH ---------
+def is_admin_ok(user: str, password: str) -> bool:
+    return bool(ADMIN_USER) and bool(ADMIN_PASSWORD) and (user == ADMIN_USER) and (password == ADMIN_PASSWORD)
+
+def normalize_tel(t: str) -> str:
+    return re.sub(r'[-\s]+', '', (t or '').strip().lower())
+
+def telefono_e164(t: str) -> str | None:
+    """
+    Teléfono canónico E.164 (+52 + 10 dígitos para México); None si no se puede saber.
+    Es la misma regla que tel_e164_mx() en SQL, de la que sale la columna generada
+    pacientes.telefono_e164 (ver setup_db): si cambia una, cambiar la otra.
+    """
+    s = str(t or "").strip()
+    d = re.sub(r"\D+", "", s)
+    if not d:
+        return None
+    if len(d) == 13 and d.startswith("521"):  # móvil MX con el "1" de antes
+        return f"+52{d[3:]}"
+    if s.startswith("+"):
+        return f"+{d}" if 8 <= len(d) <= 15 else None
+    if len(d) == 10:
+        return f"+52{d}"
+    if len(d) == 12 and d.startswith("52"):
+        return f"+{d}"
+    return None
+
+def _por_telefono(sentencia: str, telefono: str):
+    """Busca por telefono_e164 (índice único); si no es normalizable, por el texto tal cual."""
+    tel = normalize_tel(telefono)
+    e164 = telefono_e164(tel)
+    return df_sentencia(sentencia, (e164, e164, tel))
+
+def hash_password(pw: str) -> str:
+    # bcrypt con costo calibrado, en el pool de procesos (ver modules/seguridad.py)
+    from modules import seguridad
+    return seguridad.hash_password(pw)
+
+# --- Alta por Carmen (con opcionales) ---
+def registrar_paciente_admin(
+    nombre: str,
+    telefono: str,
+    password_6d: str,
+    fecha_nac: str | None = None,
+    correo: str | None = None,
+) -> int:
+    """
+    Registra paciente con contraseña definida por Carmen (6 dígitos) y opcionales fecha_nac/correo.
+    - Valida contraseña 6 dígitos.
+    - Crea carpeta en Drive y la enlaza.
+    - Devuelve el id del paciente.
+    """
+    if not re.fullmatch(r"\d{6}", str(password_6d or "").strip()):
+        raise ValueError("La contraseña debe ser exactamente 6 dígitos.")
+
+    tel = normalize_tel(telefono)
+    pw_hash = hash_password(password_6d)
+
+    with conn().cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO pacientes (nombre, telefono, password_hash, fecha_nac, correo)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT DO NOTHING
+            RETURNING id
+            """,
+            (nombre.strip(), tel, pw_hash, (fecha_nac or None), (correo or None)),
+        )
+        row = cur.fetchone()
+
+    if not row:
+        # Teléfono ya existe (en cualquier formato) → obtenemos id
+        d = _por_telefono("paciente_id_por_telefono", tel)
+        if d.empty:
+            raise RuntimeError("No se pudo registrar ni encontrar el paciente.")
+        pid = int(d.iloc[0]["id"])
+    else:
+        pid = int(row[0])
+
+    # Asegurar carpeta de Drive (idempotente)
+    try:
+        folder_id = ensure_patient_folder(nombre.strip(), pid)
+        exec_sql("UPDATE pacientes SET drive_folder_id=%s WHERE id=%s", (folder_id, pid))
+    except Exception as e:
+        st.warning(f"[Drive] No se pudo crear la carpeta del paciente: {e}")
+
+    try:
+        st.cache_data.clear()
+    except Exception:
+        pass
+
+    return pid
+
+def cambiar_password_paciente(paciente_id: int, pw_actual: str, pw_nueva6: str) -> None:
+    """
+    Cambia la contraseña de un paciente verificando la actual.
+    La nueva debe ser 6 dígitos.
+    """
+    if not re.fullmatch(r"\d{6}", str(pw_nueva6 or "")):
+        raise ValueError("La nueva contraseña debe ser exactamente 6 dígitos.")
+
+    from modules import seguridad
+    seguridad.permitir_intento(f"pid:{paciente_id}")
+
+    d = df_sentencia("paciente_password", (paciente_id,))
+    if d.empty:
+        raise ValueError("Paciente no encontrado.")
+
+    pw_hash = d.iloc[0].get("password_hash")
+    # Si no tenía password previa, también pedimos la 'actual' por seguridad mínima
+    if not pw_hash or not check_password(pw_actual or "", str(pw_hash)):
+        raise ValueError("La contraseña actual no es válida.")
+
+    seguridad.intento_exitoso(f"pid:{paciente_id}")
+    exec_sql("UPDATE pacientes SET password_hash=%s WHERE id=%s", (hash_password(pw_nueva6), paciente_id))
+    try: st.cache_data.clear()
+    except: pass
+
+
+def check_password(pw: str, pw_hash: str) -> bool:
+    from modules import seguridad
+    return seguridad.check_password(pw, pw_hash or "")
+
+def registrar_paciente(nombre: str, telefono: str, password: str) -> int:
+    tel = normalize_tel(telefono)
+    pw_hash = hash_password(password)
+    try:
+        with conn().cursor() as cur:
+            cur.execute(
+                "INSERT INTO pacientes (nombre, telefono, password_hash) VALUES (%s, %s, %s) RETURNING id",
+                (nombre.strip(), tel, pw_hash),
+            )
+            pid = int(cur.fetchone()[0])
+    except pg_errors.UniqueViolation:
+        raise ValueError("Ese teléfono ya está registrado. Inicia sesión o pide a Carmen que te ayude.")
+    # carpeta de Drive al registro
+    try:
+        folder_id = ensure_patient_folder(nombre.strip(), pid)
+        exec_sql("UPDATE pacientes SET drive_folder_id=%s WHERE id=%s", (folder_id, pid))
+    except Exception as e:
+        st.warning(f"[Drive] No se pudo crear la carpeta del paciente (puedes reintentar desde Admin): {e}")
+    try: st.cache_data.clear()
+    except: pass
+    return pid
+
+def login_paciente(telefono: str, password: str) -> Optional[dict]:
+    """
+    Devuelve el paciente si las credenciales son válidas, None si no.
+    Lanza ValueError si se agotaron los intentos (por teléfono o IP).
+    """
+    from modules import seguridad
+    resultado = "error"
+    try:
+        r = _login_paciente(telefono, password)
+        resultado = "ok" if r else "fallo"
+        return r
+    except seguridad.ServicioOcupado:
+        resultado = "ocupado"
+        raise
+    except ValueError:
+        resultado = "bloqueado"
+        raise
+    finally:
+        contar("login_intentos_total", resultado=resultado)
+
+def _login_paciente(telefono: str, password: str) -> Optional[dict]:
+    from modules import seguridad
+    tel = normalize_tel(telefono)
+    seguridad.permitir_intento(f"tel:{tel}")
+    r = None
+    desde_espejo = leer_de_espejo()
+    if desde_espejo:
+        from modules import espejo
+        r = espejo.paciente_por_telefono(tel, telefono_e164(tel))
+        desde_espejo = r is not None
+    if r is None:
+        d = _por_telefono("paciente_login", tel)
+        if d.empty: return None
+        r = d.iloc[0]
+    pw_hash = str(r.get("password_hash") or "")
+    if pw_hash and check_password(password, pw_hash):
+        seguridad.intento_exitoso(f"tel:{tel}")
+        # hash con costo viejo → se re-hashea con el costo calibrado actual. No si el login salió
+        # del espejo: el UPDATE despertaría al primario; se hará en un login con Neon despierto
+        if not desde_espejo and seguridad.necesita_rehash(pw_hash):
+            try:
+                exec_sentencia("paciente_rehash", (hash_password(password), int(r["id"]), pw_hash))
+            except Exception:
+                pass
+        return {"id": int(r["id"]), "nombre": r["nombre"], "telefono": r["telefono"]}
+    return None
@@ -0,0 +1,29 @@
+# modules/busqueda.py
+"""
+Búsqueda de texto completo en las notas clínicas: perfil del paciente (nombre + notas),
+notas de mediciones y notas de citas.
+
+Columnas `busqueda` tsvector generadas con la configuración `es_unaccent` (español, sin acentos)
+e índices GIN (ver setup_db). La consulta acepta la sintaxis de websearch_to_tsquery:
+    rodilla dolor        ambas palabras
+    "dolor de rodilla"   frase
+    rodilla or tobillo   cualquiera
+    rodilla -cirugía     sin la segunda
+"""
+from modules.db import df_sentencia
+
+LIMITE = 30
+
+
+def buscar_notas(texto: str, limite: int = LIMITE):
+    """
+    Resultados ordenados por relevancia.
+    Columnas: origen (perfil | medicion | cita), paciente_id, nombre, fecha, rango,
+    fragmento (con **coincidencias** resaltadas, listo para st.markdown).
+    """
+    texto = (texto or "").strip()
+    limite = max(1, min(int(limite), 200))
+    if not texto:
+        import pandas as pd
+        return pd.DataFrame(columns=["origen", "paciente_id", "nombre", "fecha", "rango", "fragmento"])
+    return df_sentencia("buscar_notas", (texto, limite, limite, limite, limite))
@@ -0,0 +1,118 @@
+# modules/cache_compartida.py
+"""
+Caché de lecturas compartida entre réplicas.
+
+`st.cache_data` es por proceso: con dos o más réplicas detrás de un balanceador cada una
+consultaba Postgres por su cuenta. `@cache_compartida` pone dos niveles:
+
+  L1  st.cache_data del proceso (como antes), con las versiones en la clave;
+  L2  tabla UNLOGGED `cache_compartida` (clave → pickle, expira), común a todas las réplicas.
+
+La clave lleva las versiones de los espacios de los que depende la lectura
+(modules/notificaciones.py): un cambio en `citas` del día X o en las mediciones del
+paciente Y sube su versión (triggers) y avisa por NOTIFY a todas las réplicas, así que
+las entradas viejas dejan de encontrarse en ambos niveles y caducan solas.
+
+Un fallo de L1 con L2 cuesta una lectura de `cache_versiones`, el SELECT de L2 y, si tampoco
+está, la consulta original más un INSERT: solo compensa para lecturas caras (agenda_rango).
+Las baratas (una consulta por índice) usan `l2=False`: solo L1 con versiones en la clave, y
+sin escucha de avisos el bucket de TTL de siempre, sin tocar la base por las versiones.
+
+Se activa con CACHE_COMPARTIDA=1. Sin ella (o sin versiones confiables, o leyendo del espejo
+con Neon dormido) se comporta como el cache_data_medido de siempre. Lo que sale del espejo
+(`espejo=True`) no tiene versión confiable y dura a lo más `ttl_sin_aviso` en L1.
+"""
+import hashlib
+import pickle
+import random
+from functools import wraps
+from time import monotonic
+
+from modules.config import CACHE_COMPARTIDA, CACHE_COMPARTIDA_MAX_KB, CITAS_TTL_SEG
+from modules.db import conn, leer_de_espejo
+from modules.metricas import cache_data_medido, contar, medir
+from modules.notificaciones import activa, versiones
+
+_PURGA_PROB = 0.005  # de vez en cuando, al escribir, se barren las entradas caducadas
+
+
+def _clave(nombre: str, version: tuple, a: tuple, k: dict) -> str:
+    h = hashlib.sha1(pickle.dumps((version, a, sorted(k.items())), protocol=4)).hexdigest()
+    return f"{nombre}:{h}"
+
+
+def _obtener(clave: str):
+    with medir("sql", "SELECT valor FROM cache_compartida"), conn().cursor() as cur:
+        cur.execute("SELECT valor FROM cache_compartida WHERE clave = %s AND expira > now()", (clave,))
+        fila = cur.fetchone()
+    return pickle.loads(fila[0]) if fila else None
+
+
+def _guardar(clave: str, valor, ttl: int):
+    datos = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(datos) > CACHE_COMPARTIDA_MAX_KB * 1024:
+        return False
+    with medir("sql", "INSERT INTO cache_compartida"), conn().cursor() as cur:
+        cur.execute("""
+            INSERT INTO cache_compartida (clave, valor, expira)
+            VALUES (%s, %s, now() + make_interval(secs => %s))
+            ON CONFLICT (clave) DO UPDATE SET valor = EXCLUDED.valor, expira = EXCLUDED.expira
+        """, (clave, datos, ttl))
+        if random.random() < _PURGA_PROB:
+            cur.execute("DELETE FROM cache_compartida WHERE expira < now()")
+    return True
+
+
+def cache_compartida(nombre: str, espacios, ttl: int, ttl_sin_aviso: int = CITAS_TTL_SEG,
+                     l2: bool = True, espejo: bool = False, **kwargs):
+    """
+    Como @cache_data_medido(nombre, ttl=...), más el nivel compartido.
+    `espacios(*args, **kwargs)` devuelve de qué espacios depende la llamada, p.ej.
+    `lambda fecha: [f"citas:{fecha}"]` o `lambda pid, **_: [f"paciente:{pid}"]`.
+    `ttl_sin_aviso`: atraso tolerado cuando no hay escucha de avisos (ver notificaciones.versiones).
+    `l2=False`: sin nivel compartido (lecturas baratas). `espejo=True`: la función puede leer
+    del espejo SQLite (ver db.leer_de_espejo).
+    Los valores se guardan con pickle: solo para lecturas propias (DataFrames, sets, tuplas).
+    """
+    def deco(fn):
+        @wraps(fn)
+        def _leer(version, *a, **k):
+            if not (l2 and CACHE_COMPARTIDA) or version[0] in ("ttl", "espejo") or leer_de_espejo():
+                return fn(*a, **k)
+            try:
+                # falló L1 (p.ej. recién se escribió y se vació st.cache_data): versión de la base,
+                # no la de memoria, para no traer de L2 lo que esta misma sesión acaba de cambiar
+                version = versiones(espacios(*a, **k), ttl_sin_aviso, frescas=True)
+                if version[0] == "ttl":
+                    return fn(*a, **k)
+                clave = _clave(nombre, version, a, k)
+                fila = _obtener(clave)
+            except Exception:
+                contar("cache_compartida_total", cache=nombre, resultado="error")
+                return fn(*a, **k)
+            if fila is not None:
+                contar("cache_compartida_total", cache=nombre, resultado="acierto")
+                return fila
+            valor = fn(*a, **k)
+            try:
+                guardado = _guardar(clave, valor, ttl)
+            except Exception:
+                guardado = False
+            contar("cache_compartida_total", cache=nombre, resultado="fallo" if guardado else "omitido")
+            return valor
+
+        l1 = cache_data_medido(nombre, ttl=ttl, show_spinner=False, **kwargs)(_leer)
+
+        @wraps(fn)
+        def _llamada(*a, **k):
+            if espejo and leer_de_espejo():
+                version = ("espejo", int(monotonic() // ttl_sin_aviso))
+            elif not l2 and not activa():
+                version = ("ttl", int(monotonic() // ttl_sin_aviso))
+            else:
+                version = versiones(espacios(*a, **k), ttl_sin_aviso)
+            return l1(version, *a, **k)
+
+        _llamada.clear = l1.clear
+        return _llamada
+    return deco
@@ -0,0 +1,97 @@
+# modules/config.py
+# Configuración: variables de entorno (Railway) primero, st.secrets opcional.
+import os
+import streamlit as st
+
+# --- lector seguro de config (env primero, secrets opcional) ---
+def _safe_secrets_dict():
+    try:
+        return dict(st.secrets)   # puede explotar si no hay secrets.toml
+    except Exception:
+        return {}
+
+_SECRETS = _safe_secrets_dict()
+
+def get_conf(key, default=None, alias=None):
+    """
+    Lee primero de variables de entorno (Railway).
+    Si no existe, intenta en st.secrets (si está disponible).
+    alias: nombre alterno dentro de secrets (por ejemplo mayúsculas/minúsculas o claves anidadas).
+    """
+    v = os.getenv(key)
+    if v not in (None, ""):
+        return v
+    return _SECRETS.get(alias or key, default)
+
+
+
+# --------- Secrets / env (Railway-first, sin crashear) ---------
+NEON_URL = get_conf("NEON_DATABASE_URL")
+PEPPER = (get_conf("PASSWORD_PEPPER", "") or "").encode()
+
+SCOPES = ["https://www.googleapis.com/auth/drive"]
+ROOT_FOLDER_ID = get_conf("DRIVE_ROOT_FOLDER_ID")
+
+ADMIN_USER = get_conf("CARMEN_USER", "carmen")
+ADMIN_PASSWORD = get_conf("CARMEN_PASSWORD")
+
+# --- OAuth Google (si usas OAuth) ---
+GOOGLE_CLIENT_ID     = get_conf("GOOGLE_CLIENT_ID",     alias="google_oauth.client_id")
+GOOGLE_CLIENT_SECRET = get_conf("GOOGLE_CLIENT_SECRET", alias="google_oauth.client_secret")
+GOOGLE_REFRESH_TOKEN = get_conf("GOOGLE_REFRESH_TOKEN", alias="google_oauth.refresh_token")
+GOOGLE_TOKEN_URI     = get_conf("GOOGLE_TOKEN_URI",     "https://oauth2.googleapis.com/token")
+
+# --- Service Account Google ---
+GCP_TYPE            = get_conf("GCP_TYPE", "service_account", alias="gcp_service_account.type")
+GCP_PROJECT_ID      = get_conf("GCP_PROJECT_ID",         alias="gcp_service_account.project_id")
+GCP_PRIVATE_KEY_ID  = get_conf("GCP_PRIVATE_KEY_ID",     alias="gcp_service_account.private_key_id")
+GCP_PRIVATE_KEY     = (get_conf("GCP_PRIVATE_KEY",       alias="gcp_service_account.private_key") or "").replace("\\n","\n")
+GCP_CLIENT_EMAIL    = get_conf("GCP_CLIENT_EMAIL",       alias="gcp_service_account.client_email")
+GCP_CLIENT_ID       = get_conf("GCP_CLIENT_ID",          alias="gcp_service_account.client_id")
+GCP_TOKEN_URI       = get_conf("GCP_TOKEN_URI", "https://oauth2.googleapis.com/token")
+
+# --- WhatsApp (Meta Cloud) ---
+WHATSAPP_PHONE_ID = get_conf("WHATSAPP_PHONE_ID",  alias="whatsapp.PHONE_NUMBER_ID")
+WHATSAPP_TOKEN    = get_conf("WHATSAPP_TOKEN",     alias="whatsapp.TOKEN")
+WHATSAPP_TEMPLATE = get_conf("WHATSAPP_TEMPLATE",  alias="whatsapp.TEMPLATE")
+WHATSAPP_LANG     = get_conf("WHATSAPP_LANG", "es_MX", alias="whatsapp.LANG")
+
+
+# --- Espejo local de lectura (SQLite) para arranques en frío de Neon ---
+LOCAL_MIRROR_PATH = get_conf("LOCAL_MIRROR_PATH")          # vacío = desactivado
+NEON_SUSPEND_SECONDS = int(get_conf("NEON_SUSPEND_SECONDS", "240") or 240)
+# Sentencias del catálogo preparadas en el servidor (modules/sentencias.py).
+# 0 detrás de un pooler en modo transacción que no soporte sentencias preparadas (PgBouncer < 1.21)
+SQL_PREPARAR = str(get_conf("SQL_PREPARAR", "1")).lower() in ("1", "true", "yes")
+
+# --- Avisos de cambios (LISTEN/NOTIFY, modules/notificaciones.py) ---
+# LISTEN necesita una conexión directa: con un pooler en modo transacción, apuntar aquí al host directo
+NOTIFY_DATABASE_URL = get_conf("NOTIFY_DATABASE_URL") or NEON_URL
+CITAS_TTL_SEG       = int(get_conf("CITAS_TTL_SEG", "5") or 5)          # sin escucha activa
+AGENDA_REFRESCO_SEG = int(get_conf("AGENDA_REFRESCO_SEG", "3") or 3)    # agendador abierto; 0 = no refresca
+
+# --- Caché compartida entre réplicas (modules/cache_compartida.py) ---
+CACHE_COMPARTIDA = str(get_conf("CACHE_COMPARTIDA", "0")).lower() in ("1", "true", "yes")
+CACHE_COMPARTIDA_MAX_KB = int(get_conf("CACHE_COMPARTIDA_MAX_KB", "512") or 512)  # valores más grandes solo en L1
+
+# --- Servidor HTTP lateral (medios firmados, métricas) ---
+SIDE_HTTP_PORT   = int(get_conf("SIDE_HTTP_PORT", "0") or 0)   # 0 = desactivado
+MEDIA_PUBLIC_URL = (get_conf("MEDIA_PUBLIC_URL", "") or "").rstrip("/")  # p.ej. https://media.midominio.com
+MEDIA_URL_SECRET = get_conf("MEDIA_URL_SECRET")   # obligatorio con MEDIA_PUBLIC_URL; igual en todas las réplicas
+MEDIA_CACHE_DIR  = get_conf("MEDIA_CACHE_DIR", ".cache/media")
+MEDIA_CACHE_MB   = int(get_conf("MEDIA_CACHE_MB", "500") or 500)
+# Compatibilidad: hacer públicos los archivos subidos (ya no hace falta con el proxy de medios)
+DRIVE_PUBLIC_LINKS = str(get_conf("DRIVE_PUBLIC_LINKS", "0")).lower() in ("1", "true", "yes")
+
+# --- Almacenamiento de archivos (modules/almacenamiento.py): drive | local | s3 ---
+STORAGE_BACKEND = (get_conf("STORAGE_BACKEND", "drive") or "drive").strip().lower()
+STORAGE_DIR     = get_conf("STORAGE_DIR", ".almacen")       # backend local
+S3_BUCKET       = get_conf("S3_BUCKET")
+S3_ENDPOINT_URL = get_conf("S3_ENDPOINT_URL")               # MinIO u otro compatible; vacío = AWS
+S3_ACCESS_KEY_ID     = get_conf("S3_ACCESS_KEY_ID")
+S3_SECRET_ACCESS_KEY = get_conf("S3_SECRET_ACCESS_KEY")
+S3_REGION       = get_conf("S3_REGION", "us-east-1")
+
+# Agenda
+PASO_MIN: int = 30
+BLOQUEO_DIAS_MIN: int = 2  # hoy y mañana bloqueados (paciente agenda desde el día 3)
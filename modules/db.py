@@ -0,0 +1,440 @@
+# modules/db.py
+# Conexión a Postgres (Neon), helpers exec_sql/df_sql y esquema.
+import threading
+from time import monotonic
+
+import psycopg
+import streamlit as st
+
+from modules.config import NEON_URL, LOCAL_MIRROR_PATH, NEON_SUSPEND_SECONDS, SQL_PREPARAR
+from modules.metricas import medir, huella_sql
+from modules.sentencias import SENTENCIAS
+
+# --------- CONEXIÓN + DB ---------
+# keepalives para conexiones serverless (Neon)
+_OPCIONES = dict(connect_timeout=10, keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=5)
+
+@st.cache_resource
+def _connect():
+    if not NEON_URL:
+        st.error("Falta NEON_DATABASE_URL en Secrets."); st.stop()
+    return psycopg.connect(NEON_URL, autocommit=True, **_OPCIONES)
+
+def conexion_propia():
+    """
+    Conexión aparte para trabajos largos con transacción propia (sincronización, importación,
+    exportación). La de conn() es compartida por todas las sesiones y psycopg no aísla una
+    transacción entre hilos: abrirla ahí metería las escrituras de las demás sesiones en ella.
+    Usar con `with` (se cierra al salir).
+    """
+    if not NEON_URL:
+        raise RuntimeError("Falta NEON_DATABASE_URL.")
+    return psycopg.connect(NEON_URL, autocommit=True, **_OPCIONES)
+
+def conn():
+    """Devuelve una conexión viva; si está cerrada o sin uso, reconecta."""
+    c = _connect()
+    try:
+        # psycopg3: atributo .closed puede existir; además ping simple
+        if getattr(c, "closed", False):
+            raise psycopg.OperationalError("closed")
+        with medir("ping", "SELECT 1"), c.cursor() as cur:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+    except Exception:
+        # si falló, limpiamos SOLO la conexión cacheada (Drive, pool de bcrypt, etc. siguen vivos)
+        try:
+            _connect.clear()
+        except Exception:
+            pass
+        c = _connect()
+    return c
+
+# Estado del primario (Neon): cuándo respondió por última vez
+_PRIMARIO = {"ultimo_ok": 0.0, "despertando": False, "setup_ok": False}
+_primario_lock = threading.Lock()
+
+def _marcar_primario_ok():
+    _PRIMARIO["ultimo_ok"] = monotonic()
+
+def primario_caliente() -> bool:
+    """True si Neon respondió hace menos de NEON_SUSPEND_SECONDS (no debería estar suspendido)."""
+    return _PRIMARIO["ultimo_ok"] > 0 and (monotonic() - _PRIMARIO["ultimo_ok"]) < NEON_SUSPEND_SECONDS
+
+def _despertar_primario():
+    try:
+        conn()
+        _marcar_primario_ok()
+        if not _PRIMARIO["setup_ok"]:
+            setup_db_safe(_en_segundo_plano=False)
+        from modules import espejo
+        espejo.refrescar()
+    except Exception:
+        pass
+    finally:
+        _PRIMARIO["despertando"] = False
+
+def despertar_primario_async():
+    """Conecta (y deja listo) el primario en un hilo aparte, sin bloquear el rerun."""
+    with _primario_lock:
+        if _PRIMARIO["despertando"]:
+            return
+        _PRIMARIO["despertando"] = True
+    threading.Thread(target=_despertar_primario, name="despertar-neon", daemon=True).start()
+
+def leer_de_espejo() -> bool:
+    """
+    ¿Servir esta lectura desde el espejo SQLite? Solo si está activado y el primario
+    puede estar frío; en ese caso se despierta en segundo plano. Las escrituras siempre van a Postgres.
+    """
+    if not LOCAL_MIRROR_PATH:
+        return False
+    from modules import espejo
+    if primario_caliente():
+        espejo.refrescar_async()
+        return False
+    despertar_primario_async()
+    return espejo.tiene_datos()
+
+def exec_sql(q_ps: str, p: tuple = ()):
+    c = conn()
+    with medir("sql", huella_sql(q_ps)) as m, c.cursor() as cur:
+        cur.execute(q_ps, p)
+        m.filas = cur.rowcount
+    _marcar_primario_ok()
+    # invalidar caché de lecturas para que se vea el cambio
+    try:
+        st.cache_data.clear()
+    except Exception:
+        pass
+
+def df_sql(q_ps: str, p: tuple = ()):
+    import pandas as pd  # diferido: el login no necesita pandas para arrancar
+    # usar conn() cada vez para evitar objetos conexión zombis en pandas
+    with conn() as c, medir("sql", huella_sql(q_ps)) as m:
+        d = pd.read_sql_query(q_ps, c, params=p)
+        m.filas = len(d)
+    _marcar_primario_ok()
+    return d
+
+# --------- catálogo de sentencias (modules/sentencias.py) ---------
+def exec_sentencia(nombre: str, p: tuple = ()) -> int:
+    """exec_sql de una sentencia del catálogo: preparada en el servidor, medida con su nombre."""
+    with medir("sql", nombre) as m, conn().cursor() as cur:
+        cur.execute(SENTENCIAS[nombre], p, prepare=SQL_PREPARAR)
+        m.filas = cur.rowcount
+    _marcar_primario_ok()
+    try:
+        st.cache_data.clear()
+    except Exception:
+        pass
+    return m.filas
+
+def df_sentencia(nombre: str, p: tuple = ()):
+    """df_sql de una consulta del catálogo: preparada en el servidor, medida con su nombre."""
+    import pandas as pd
+    with medir("sql", nombre) as m, conn().cursor() as cur:
+        cur.execute(SENTENCIAS[nombre], p, prepare=SQL_PREPARAR)
+        d = pd.DataFrame.from_records(cur.fetchall(), columns=[c.name for c in cur.description],
+                                      coerce_float=True)
+        m.filas = len(d)
+    _marcar_primario_ok()
+    return d
+
+def setup_db():
+    # pacientes (SIN token)
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS pacientes (
+      id BIGSERIAL PRIMARY KEY,
+      nombre TEXT NOT NULL,
+      fecha_nac TEXT,
+      telefono TEXT,
+      correo TEXT,
+      notas TEXT,
+      drive_folder_id TEXT,
+      password_hash TEXT,
+      creado_en TIMESTAMP DEFAULT now()
+    );
+    """)
+    # unique teléfono (idempotente)
+    try:
+        exec_sql("ALTER TABLE pacientes ADD CONSTRAINT uq_pacientes_telefono UNIQUE (telefono);")
+    except Exception:
+        pass
+    # limpia columna token si existe
+    try:
+        exec_sql("ALTER TABLE pacientes DROP COLUMN IF EXISTS token;")
+    except Exception:
+        pass
+    # teléfono canónico E.164: columna generada (se calcula al escribir; el ADD COLUMN rellena
+    # las filas existentes). Misma regla que auth.telefono_e164(): si cambia una, cambiar la otra.
+    exec_sql(r"""
+    CREATE OR REPLACE FUNCTION tel_e164_mx(t TEXT) RETURNS TEXT AS $$
+      SELECT CASE
+        WHEN d = '' THEN NULL
+        WHEN length(d) = 13 AND d LIKE '521%' THEN '+52' || substr(d, 4)
+        WHEN btrim(t) LIKE '+%' THEN CASE WHEN length(d) BETWEEN 8 AND 15 THEN '+' || d END
+        WHEN length(d) = 10 THEN '+52' || d
+        WHEN length(d) = 12 AND d LIKE '52%' THEN '+' || d
+      END
+      FROM (SELECT regexp_replace(coalesce(t, ''), '\D', '', 'g') AS d) x
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+    """)
+    exec_sql("""
+    ALTER TABLE pacientes ADD COLUMN IF NOT EXISTS telefono_e164 TEXT
+      GENERATED ALWAYS AS (tel_e164_mx(telefono)) STORED;
+    """)
+    try:
+        exec_sql("CREATE UNIQUE INDEX IF NOT EXISTS uq_pacientes_telefono_e164 ON pacientes(telefono_e164);")
+    except Exception:
+        # ya hay la misma persona con y sin +52: índice normal hasta que Carmen fusione los duplicados
+        # (SELECT telefono_e164, array_agg(id) FROM pacientes GROUP BY 1 HAVING count(*) > 1)
+        exec_sql("CREATE INDEX IF NOT EXISTS idx_pacientes_telefono_e164 ON pacientes(telefono_e164);")
+
+    # citas
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS citas (
+      id SERIAL PRIMARY KEY,
+      fecha DATE NOT NULL,
+      hora TIME NOT NULL,
+      paciente_id BIGINT REFERENCES pacientes(id) ON DELETE SET NULL,
+      nota TEXT,
+      creado_en TIMESTAMP DEFAULT now(),
+      UNIQUE (fecha, hora)
+    );
+    """)
+    exec_sql("CREATE INDEX IF NOT EXISTS idx_citas_fecha ON citas(fecha);")
+
+    # mediciones
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS mediciones(
+      id BIGSERIAL PRIMARY KEY,
+      paciente_id BIGINT NOT NULL REFERENCES pacientes(id) ON DELETE CASCADE,
+      fecha TEXT NOT NULL,
+      rutina_pdf TEXT,
+      plan_pdf TEXT,
+      peso_kg DOUBLE PRECISION,
+      grasa_pct DOUBLE PRECISION,
+      musculo_pct DOUBLE PRECISION,
+      brazo_rest DOUBLE PRECISION,
+      brazo_flex DOUBLE PRECISION,
+      pecho_rest DOUBLE PRECISION,
+      pecho_flex DOUBLE PRECISION,
+      cintura_cm DOUBLE PRECISION,
+      cadera_cm DOUBLE PRECISION,
+      pierna_cm DOUBLE PRECISION,
+      pantorrilla_cm DOUBLE PRECISION,
+      notas TEXT,
+      drive_cita_folder_id TEXT,
+      cita_id INTEGER REFERENCES citas(id) ON DELETE SET NULL,
+      CONSTRAINT mediciones_unq UNIQUE (paciente_id, fecha)
+    );
+    """)
+
+    # fotos
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS fotos(
+      id BIGSERIAL PRIMARY KEY,
+      paciente_id BIGINT NOT NULL REFERENCES pacientes(id) ON DELETE CASCADE,
+      fecha TEXT NOT NULL,
+      drive_file_id TEXT,
+      web_view_link TEXT,
+      filename TEXT
+    );
+    """)
+
+    # contador de índices de fotos por (paciente, fecha): nombres YYYY-MM-DD_foto_XX sin listar Drive
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS foto_contadores(
+      paciente_id BIGINT NOT NULL REFERENCES pacientes(id) ON DELETE CASCADE,
+      fecha TEXT NOT NULL,
+      ultimo INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (paciente_id, fecha)
+    );
+    """)
+
+    # archivos subidos a Drive por hash de contenido (deduplicación de subidas)
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS archivos(
+      drive_file_id TEXT PRIMARY KEY,
+      paciente_id BIGINT NOT NULL REFERENCES pacientes(id) ON DELETE CASCADE,
+      sha256 TEXT NOT NULL,
+      folder_id TEXT,
+      web_view_link TEXT,
+      filename TEXT,
+      creado_en TIMESTAMP DEFAULT now()
+    );
+    """)
+    exec_sql("CREATE INDEX IF NOT EXISTS idx_archivos_pac_sha ON archivos(paciente_id, sha256);")
+
+    # copia local del árbol de Drive + cursor del feed de cambios (modules/sincronizacion.py)
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS drive_archivos(
+      id TEXT PRIMARY KEY,
+      nombre TEXT,
+      mime TEXT,
+      parent_id TEXT,
+      md5 TEXT,
+      actualizado_en TIMESTAMP DEFAULT now()
+    );
+    """)
+    exec_sql("CREATE INDEX IF NOT EXISTS idx_drive_archivos_parent_nombre ON drive_archivos(parent_id, nombre);")
+    exec_sql("CREATE TABLE IF NOT EXISTS drive_estado(clave TEXT PRIMARY KEY, valor TEXT);")
+
+    # índices para la paginación keyset (paciente, fecha DESC, id DESC)
+    exec_sql("CREATE INDEX IF NOT EXISTS idx_mediciones_pac_fecha_id ON mediciones(paciente_id, fecha DESC, id DESC);")
+    exec_sql("CREATE INDEX IF NOT EXISTS idx_fotos_pac_fecha_id ON fotos(paciente_id, fecha DESC, id DESC);")
+
+    # updated_at (marcas de agua del espejo local); borrar una medición "toca" al paciente
+    exec_sql("""
+    CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+    BEGIN NEW.updated_at = now(); RETURN NEW; END $$ LANGUAGE plpgsql;
+    """)
+    for t in ("pacientes", "citas", "mediciones"):
+        exec_sql(f"ALTER TABLE {t} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT now();")
+        exec_sql(f"CREATE INDEX IF NOT EXISTS idx_{t}_updated_at ON {t}(updated_at);")
+        exec_sql(f"""
+        CREATE OR REPLACE TRIGGER trg_{t}_updated_at BEFORE UPDATE ON {t}
+        FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+        """)
+    exec_sql("""
+    CREATE OR REPLACE FUNCTION touch_paciente_medicion() RETURNS trigger AS $$
+    BEGIN UPDATE pacientes SET updated_at = now() WHERE id = OLD.paciente_id; RETURN OLD; END $$ LANGUAGE plpgsql;
+    """)
+    exec_sql("""
+    CREATE OR REPLACE TRIGGER trg_mediciones_delete_touch AFTER DELETE ON mediciones
+    FOR EACH ROW EXECUTE FUNCTION touch_paciente_medicion();
+    """)
+
+    # caché compartida entre réplicas (modules/cache_compartida.py) y versiones por espacio
+    # (modules/notificaciones.py). UNLOGGED: tras un crash se vacían las dos juntas.
+    exec_sql("""
+    CREATE UNLOGGED TABLE IF NOT EXISTS cache_compartida(
+      clave TEXT PRIMARY KEY,
+      valor BYTEA NOT NULL,
+      expira TIMESTAMPTZ NOT NULL
+    );
+    """)
+    exec_sql("CREATE UNLOGGED TABLE IF NOT EXISTS cache_versiones(espacio TEXT PRIMARY KEY, version BIGINT NOT NULL);")
+    exec_sql("""
+    CREATE OR REPLACE FUNCTION cache_invalidar(esp TEXT) RETURNS BIGINT AS $$
+    DECLARE v BIGINT;
+    BEGIN
+      INSERT INTO cache_versiones AS cv (espacio, version) VALUES (esp, 1)
+      ON CONFLICT (espacio) DO UPDATE SET version = cv.version + 1
+      RETURNING version INTO v;
+      PERFORM pg_notify('cache_invalidada', esp || '=' || v);
+      RETURN v;
+    END $$ LANGUAGE plpgsql;
+    """)
+
+    # citas: NOTIFY citas_changed (payload = fecha) y versión citas:<fecha>, una vez por día y sentencia
+    exec_sql("DROP TRIGGER IF EXISTS trg_citas_notify ON citas;")
+    exec_sql("""
+    CREATE OR REPLACE FUNCTION notificar_citas() RETURNS trigger AS $$
+    BEGIN
+      IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('citas_changed', '*');
+        PERFORM cache_invalidar('*');
+        RETURN NULL;
+      END IF;
+      IF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('citas_changed', f::text), cache_invalidar('citas:' || f::text)
+        FROM (SELECT DISTINCT fecha AS f FROM nuevas) x;
+      ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('citas_changed', f::text), cache_invalidar('citas:' || f::text)
+        FROM (SELECT DISTINCT fecha AS f FROM viejas) x;
+      ELSE
+        PERFORM pg_notify('citas_changed', f::text), cache_invalidar('citas:' || f::text)
+        FROM (SELECT fecha AS f FROM nuevas UNION SELECT fecha FROM viejas) x;
+      END IF;
+      RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+    """)
+    # mediciones / fotos: versión paciente:<id>; pacientes: versión "pacientes"
+    exec_sql("""
+    CREATE OR REPLACE FUNCTION invalidar_paciente() RETURNS trigger AS $$
+    BEGIN
+      IF TG_OP = 'INSERT' THEN
+        PERFORM cache_invalidar('paciente:' || pid) FROM (SELECT DISTINCT paciente_id AS pid FROM nuevas) x;
+      ELSIF TG_OP = 'DELETE' THEN
+        PERFORM cache_invalidar('paciente:' || pid) FROM (SELECT DISTINCT paciente_id AS pid FROM viejas) x;
+      ELSE
+        PERFORM cache_invalidar('paciente:' || pid)
+        FROM (SELECT paciente_id AS pid FROM nuevas UNION SELECT paciente_id FROM viejas) x;
+      END IF;
+      RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+    """)
+    exec_sql("""
+    CREATE OR REPLACE FUNCTION invalidar_pacientes() RETURNS trigger AS $$
+    BEGIN PERFORM cache_invalidar('pacientes'); RETURN NULL; END $$ LANGUAGE plpgsql;
+    """)
+    # tablas de transición: un trigger por evento (Postgres no las admite con varios eventos);
+    # la función solo toca la tabla que existe en cada rama de TG_OP
+    for t, fn in (("citas", "notificar_citas"), ("mediciones", "invalidar_paciente"), ("fotos", "invalidar_paciente")):
+        for ev, ref in (("INSERT", "NEW TABLE AS nuevas"),
+                        ("UPDATE", "OLD TABLE AS viejas NEW TABLE AS nuevas"),
+                        ("DELETE", "OLD TABLE AS viejas")):
+            exec_sql(f"""
+            CREATE OR REPLACE TRIGGER trg_{t}_cache_{ev.lower()} AFTER {ev} ON {t}
+            REFERENCING {ref} FOR EACH STATEMENT EXECUTE FUNCTION {fn}();
+            """)
+    exec_sql("""
+    CREATE OR REPLACE TRIGGER trg_citas_notify_truncate AFTER TRUNCATE ON citas
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_citas();
+    """)
+    exec_sql("""
+    CREATE OR REPLACE TRIGGER trg_pacientes_cache AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON pacientes
+    FOR EACH STATEMENT EXECUTE FUNCTION invalidar_pacientes();
+    """)
+
+    # búsqueda de texto completo en notas (modules/busqueda.py): español sin acentos.
+    # unaccent() no es IMMUTABLE, pero una configuración de búsqueda que lo usa sí sirve en
+    # columnas generadas. Sin permiso para la extensión queda "spanish" a secas.
+    try:
+        exec_sql("CREATE EXTENSION IF NOT EXISTS unaccent;")
+    except Exception:
+        pass
+    exec_sql("""
+    DO $$
+    BEGIN
+      IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION public.es_unaccent (COPY = pg_catalog.spanish);
+        IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'unaccent') THEN
+          ALTER TEXT SEARCH CONFIGURATION public.es_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+      END IF;
+    END $$;
+    """)
+    for t, expr in (
+        ("pacientes", "setweight(to_tsvector('public.es_unaccent'::regconfig, coalesce(nombre, '')), 'A') || "
+                      "setweight(to_tsvector('public.es_unaccent'::regconfig, coalesce(notas, '')), 'B')"),
+        ("mediciones", "to_tsvector('public.es_unaccent'::regconfig, coalesce(notas, ''))"),
+        ("citas", "to_tsvector('public.es_unaccent'::regconfig, coalesce(nota, ''))"),
+    ):
+        exec_sql(f"ALTER TABLE {t} ADD COLUMN IF NOT EXISTS busqueda tsvector GENERATED ALWAYS AS ({expr}) STORED;")
+        exec_sql(f"CREATE INDEX IF NOT EXISTS idx_{t}_busqueda ON {t} USING GIN (busqueda);")
+
+def setup_db_safe(_en_segundo_plano: bool = True):
+    """
+    Crea/migra el esquema una vez por proceso.
+    Con el espejo local activo, la primera vez se hace en segundo plano para no
+    congelar el login mientras Neon despierta.
+    """
+    if _PRIMARIO["setup_ok"]:
+        return
+    if _en_segundo_plano and LOCAL_MIRROR_PATH:
+        despertar_primario_async()
+        return
+    try:
+        setup_db()
+    except Exception:
+        # fuerza reconexión y reintenta una vez
+        try:
+            _connect.clear()
+        except Exception:
+            pass
+        setup_db()
+    _PRIMARIO["setup_ok"] = True
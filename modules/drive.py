@@ -0,0 +1,608 @@
+# modules/drive.py
+# Google Drive: cliente y DriveBackend; carpetas por paciente/cita, subidas y borrados
+# sobre el almacén configurado (ver modules/almacenamiento.py; Drive por defecto).
+# googleapiclient/google.oauth2 se importan dentro de las funciones (arranque en frío más rápido).
+import hashlib
+import io
+import re
+import threading
+import unicodedata
+import urllib.parse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import streamlit as st
+
+from modules.config import (
+    SCOPES, ROOT_FOLDER_ID,
+    GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REFRESH_TOKEN, GOOGLE_TOKEN_URI,
+    GCP_TYPE, GCP_PROJECT_ID, GCP_PRIVATE_KEY_ID, GCP_PRIVATE_KEY, GCP_CLIENT_EMAIL, GCP_CLIENT_ID, GCP_TOKEN_URI,
+    DRIVE_PUBLIC_LINKS,
+)
+from modules.db import conn, exec_sql, df_sql
+from modules import sincronizacion
+from modules.almacenamiento import StorageBackend, CARPETA, get_backend
+from modules.metricas import medir, contar
+
+def _drive_credentials():
+    # cliente de Google cargado bajo demanda (es lo más pesado de importar)
+    from google.oauth2.credentials import Credentials
+    from google.oauth2 import service_account
+
+    # 1) Intentar OAuth de usuario (si hay variables)
+    if GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET and GOOGLE_REFRESH_TOKEN:
+        creds = Credentials(
+            token=None,
+            refresh_token=GOOGLE_REFRESH_TOKEN,
+            token_uri=GOOGLE_TOKEN_URI,
+            client_id=GOOGLE_CLIENT_ID,
+            client_secret=GOOGLE_CLIENT_SECRET,
+            scopes=SCOPES,
+        )
+        return creds
+
+    # 2) Intentar Service Account (Railway env o secrets)
+    if GCP_CLIENT_EMAIL and (GCP_PRIVATE_KEY or "").strip():
+        info = {
+            "type": GCP_TYPE or "service_account",
+            "project_id": GCP_PROJECT_ID,
+            "private_key_id": GCP_PRIVATE_KEY_ID,
+            # en Railway el private key suele venir con \n escapadas → convertir a saltos reales
+            "private_key": (GCP_PRIVATE_KEY or "").replace("\\n", "\n"),
+            "client_email": GCP_CLIENT_EMAIL,
+            "client_id": GCP_CLIENT_ID,
+            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+            "token_uri": GCP_TOKEN_URI or "https://oauth2.googleapis.com/token",
+            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+            "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{urllib.parse.quote(GCP_CLIENT_EMAIL or '')}",
+        }
+        creds = service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+        return creds
+
+    # 3) Fallback: estructuras antiguas en secrets (compatibilidad)
+    if "google_oauth" in st.secrets:
+        i = st.secrets["google_oauth"]
+        creds = Credentials(
+            token=None,
+            refresh_token=i.get("refresh_token"),
+            token_uri=i.get("token_uri", "https://oauth2.googleapis.com/token"),
+            client_id=i.get("client_id"),
+            client_secret=i.get("client_secret"),
+            scopes=SCOPES,
+        )
+        return creds
+
+    if "gcp_service_account" in st.secrets:
+        i = dict(st.secrets["gcp_service_account"])  # type: ignore
+        # por si el private_key en secrets también viene con \n escapados
+        if "private_key" in i and isinstance(i["private_key"], str):
+            i["private_key"] = i["private_key"].replace("\\n", "\n")
+        creds = service_account.Credentials.from_service_account_info(i, scopes=SCOPES)
+        return creds
+
+    return None
+
+
+# Renovar el token antes de que venza (no en medio de una subida)
+TOKEN_MARGEN = timedelta(minutes=5)
+DRIVE_HTTP_TIMEOUT = 60
+
+
+class _TransporteDrive:
+    """
+    Transporte autorizado compartido: un httplib2.Http keep-alive por hilo
+    (httplib2 no es thread-safe) y las mismas credenciales para todos, con
+    refresco proactivo del token bajo lock.
+    """
+
+    def __init__(self, creds):
+        self.creds = creds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _http(self):
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        h = getattr(self._local, "http", None)
+        if h is None:
+            h = AuthorizedHttp(self.creds, http=httplib2.Http(timeout=DRIVE_HTTP_TIMEOUT))
+            self._local.http = h
+        return h
+
+    def token_vigente(self):
+        exp = getattr(self.creds, "expiry", None)
+        if self.creds.valid and exp and exp - datetime.utcnow() > TOKEN_MARGEN:
+            return
+        with self._lock:
+            exp = getattr(self.creds, "expiry", None)
+            if self.creds.valid and exp and exp - datetime.utcnow() > TOKEN_MARGEN:
+                return
+            import httplib2
+            from google_auth_httplib2 import Request
+            self.creds.refresh(Request(httplib2.Http(timeout=DRIVE_HTTP_TIMEOUT)))
+
+    def request_builder(self, http, *args, **kwargs):
+        self.token_vigente()
+        return _http_request_medido()(self._http(), *args, **kwargs)
+
+
+def _http_request_medido():
+    """HttpRequest cuyo execute() queda medido en modules.metricas (huella = método de la API)."""
+    global _HttpRequestMedido
+    if _HttpRequestMedido is None:
+        from googleapiclient.http import HttpRequest
+
+        class HttpRequestMedido(HttpRequest):
+            def execute(self, *args, **kwargs):
+                metodo, estado = self.methodId or self.method, "200"
+                try:
+                    with medir("drive", metodo):
+                        return super().execute(*args, **kwargs)
+                except Exception as e:
+                    estado = str(getattr(getattr(e, "resp", None), "status", None) or type(e).__name__)
+                    raise
+                finally:
+                    contar("drive_llamadas_total", metodo=metodo, estado=estado)
+
+        _HttpRequestMedido = HttpRequestMedido
+    return _HttpRequestMedido
+
+_HttpRequestMedido = None
+
+
+@st.cache_resource(show_spinner=False)
+def _drive_service():
+    """
+    Cliente Drive v3 construido desde el documento de discovery incluido en la librería
+    (sin ir a la red) sobre el transporte compartido. Su caché es independiente de la
+    conexión a la base: reconectar Postgres ya no lo reconstruye.
+    """
+    from googleapiclient.discovery import build
+    creds = _drive_credentials()
+    if creds is None:
+        return None
+    t = _TransporteDrive(creds)
+    return build(
+        "drive", "v3",
+        http=t._http(),
+        requestBuilder=t.request_builder,
+        static_discovery=True,
+        cache_discovery=False,
+    )
+
+
+def get_drive():
+    drv = _drive_service()
+    if drv is None:
+        st.error("No hay credenciales de Google configuradas (OAuth o Service Account).")
+        st.stop()
+    return drv
+
+
+class DriveBackend(StorageBackend):
+    """
+    StorageBackend sobre Google Drive v3. Las búsquedas por carpeta se responden desde la
+    copia local de modules/sincronizacion.py cuando está al día; lo que se crea o borra se
+    anota ahí al momento.
+    """
+    nombre = "drive"
+    raiz = ROOT_FOLDER_ID or None
+    _CAMPOS = "id,name,mimeType,createdTime"
+
+    def _listar_api(self, parent_id, nombre=None, prefijo=None, mime=None, carpetas=None) -> list[dict]:
+        q = ["trashed=false"]
+        if parent_id: q.append(f"'{parent_id}' in parents")
+        if nombre is not None: q.append(f"name='{_escape_for_q(nombre)}'")
+        if prefijo is not None: q.append(f"name contains '{_escape_for_q(prefijo)}'")
+        if mime is not None: q.append(f"mimeType='{mime}'")
+        if carpetas is not None: q.append(f"mimeType{'=' if carpetas else '!='}'{CARPETA}'")
+        drv, files, token = get_drive(), [], None
+        while True:
+            resp = drv.files().list(
+                q=" and ".join(q), fields=f"nextPageToken, files({self._CAMPOS})", pageSize=1000, pageToken=token,
+                supportsAllDrives=True, includeItemsFromAllDrives=True,
+            ).execute()
+            files.extend(resp.get("files", []))
+            token = resp.get("nextPageToken")
+            if not token:
+                break
+        # `name contains` busca por palabras: el prefijo se confirma aquí
+        return [f for f in files if prefijo is None or f.get("name", "").startswith(prefijo)]
+
+    def list(self, parent_id, nombre=None, prefijo=None, mime=None, carpetas=None) -> list[dict]:
+        local = sincronizacion.buscar(parent_id, nombre=nombre, prefijo=prefijo, carpetas=carpetas) if parent_id else None
+        if local is not None:
+            contar("drive_listados_total", origen="drive_archivos")
+            return [f for f in local if mime is None or f["mimeType"] == mime]
+        contar("drive_listados_total", origen="drive")
+        return self._listar_api(parent_id, nombre, prefijo, mime, carpetas)
+
+    def ensure_folder(self, nombre, parent_id=None) -> str:
+        # en la copia local un "no está" puede ser solo que aún no llegó el cambio: se confirma con la API
+        ex = self.list(parent_id, nombre=nombre, carpetas=True) or self._listar_api(parent_id, nombre, carpetas=True)
+        if ex:
+            return ex[0]["id"]
+        meta = {"name": nombre, "mimeType": CARPETA}
+        if parent_id: meta["parents"] = [parent_id]
+        folder = get_drive().files().create(body=meta, fields="id", supportsAllDrives=True).execute()
+        sincronizacion.anotar(folder["id"], nombre, CARPETA, parent_id)
+        return folder["id"]
+
+    def upload(self, datos, nombre, parent_id, mime) -> dict:
+        from googleapiclient.http import MediaIoBaseUpload
+        media = MediaIoBaseUpload(io.BytesIO(datos), mimetype=mime, resumable=False)
+        f = get_drive().files().create(
+            body={"name": nombre, "parents": [parent_id]}, media_body=media,
+            fields="id,webViewLink", supportsAllDrives=True,
+        ).execute()
+        sincronizacion.anotar(f["id"], nombre, mime, parent_id)
+        return f
+
+    def copy(self, file_id, nombre, parent_id) -> dict:
+        f = get_drive().files().copy(
+            fileId=file_id, body={"name": nombre, "parents": [parent_id]},
+            fields="id,webViewLink,mimeType", supportsAllDrives=True,
+        ).execute()
+        sincronizacion.anotar(f["id"], nombre, f.pop("mimeType", None), parent_id)
+        return f
+
+    def get(self, file_id) -> dict | None:
+        try:
+            return get_drive().files().get(
+                fileId=file_id, fields="id,name,mimeType,parents,trashed,webViewLink,md5Checksum",
+                supportsAllDrives=True,
+            ).execute()
+        except Exception as e:
+            if getattr(getattr(e, "resp", None), "status", None) == 404:
+                return None
+            raise
+
+    def download(self, file_id, destino) -> dict:
+        from googleapiclient.http import MediaIoBaseDownload
+        drv = get_drive()
+        meta = drv.files().get(
+            fileId=file_id, fields="id,name,mimeType,md5Checksum,size", supportsAllDrives=True
+        ).execute()
+        with open(destino, "wb") as fh:
+            dl = MediaIoBaseDownload(fh, drv.files().get_media(fileId=file_id, supportsAllDrives=True),
+                                     chunksize=4 * 1024 * 1024)
+            hecho = False
+            while not hecho:
+                _, hecho = dl.next_chunk()
+        return meta
+
+    def trash(self, file_ids, borrar=False) -> dict:
+        """Peticiones batch de Drive, hasta 100 por viaje."""
+        ids = [i for i in dict.fromkeys(file_ids) if i]
+        if not ids:
+            return {}
+        drv, fallidos = get_drive(), {}
+
+        def _cb(request_id, response, exception):
+            if exception is not None:
+                fallidos[request_id] = exception
+
+        for i in range(0, len(ids), 100):
+            batch = drv.new_batch_http_request(callback=_cb)
+            for fid in ids[i:i + 100]:
+                if borrar:
+                    req = drv.files().delete(fileId=fid, supportsAllDrives=True)
+                else:
+                    req = drv.files().update(fileId=fid, body={"trashed": True}, fields="id", supportsAllDrives=True)
+                batch.add(req, request_id=fid)
+            batch.execute()
+
+        errores = {k: e for k, e in fallidos.items() if getattr(getattr(e, "resp", None), "status", None) != 404}
+        sincronizacion.olvidar([i for i in ids if i not in errores])
+        return errores
+
+    def url_for(self, file_id) -> str:
+        return f"https://drive.google.com/file/d/{file_id}/view"
+
+    def make_public(self, file_id) -> None:
+        get_drive().permissions().create(
+            fileId=file_id,
+            body={"type": "anyone", "role": "reader"},
+            fields="id",
+            supportsAllDrives=True,
+        ).execute()
+
+
+def make_anyone_reader(file_id: str):
+    try:
+        get_backend().make_public(file_id)
+    except Exception as e:
+        st.info(f"[Drive] No pude hacer público {file_id}: {e}")
+
+def drive_image_view_url(file_id: str) -> str:
+    return f"https://lh3.googleusercontent.com/d/{file_id}=s0"
+
+def drive_image_download_url(file_id: str) -> str:
+    return f"https://drive.google.com/uc?export=download&id={file_id}"
+
+def trash_drive_files(file_ids, send_to_trash: bool = True) -> int:
+    """
+    Manda a papelera (o borra) varios archivos del almacén (en Drive, con peticiones batch).
+    Los que ya no existen no cuentan como error. Devuelve cuántos se procesaron.
+    """
+    ids = [i for i in dict.fromkeys(file_ids) if i]
+    if not ids:
+        return 0
+    errores = get_backend().trash(ids, borrar=not send_to_trash)
+    if errores:
+        st.info(f"[Drive] No se pudieron eliminar {len(errores)} archivo(s): {next(iter(errores.values()))}")
+    return len(ids) - len(errores)
+
+def delete_paciente(pid: int, remove_drive_folder: bool = True, send_to_trash: bool = True) -> bool:
+    """
+    Elimina definitivamente al paciente `pid`.
+    - Un solo DELETE: mediciones, fotos y el resto en cascada (por FK); citas quedan con paciente_id = NULL.
+    - Opcionalmente manda a papelera (o borra) la carpeta de Drive del paciente, y las fotos
+      que no estuvieran dentro de ella, en un batch.
+    """
+    try:
+        with conn().cursor() as cur:
+            cur.execute("""
+                WITH f AS (DELETE FROM fotos WHERE paciente_id = %(pid)s RETURNING drive_file_id),
+                     p AS (DELETE FROM pacientes WHERE id = %(pid)s RETURNING drive_folder_id)
+                SELECT (SELECT drive_folder_id FROM p),
+                       ARRAY(SELECT drive_file_id FROM f WHERE coalesce(drive_file_id, '') <> ''),
+                       EXISTS (SELECT 1 FROM p)
+            """, {"pid": pid})
+            folder_id, foto_ids, existia = cur.fetchone()
+        if not existia:
+            return False
+
+        # Drive no bloquea el borrado en DB (ya hecho)
+        if remove_drive_folder:
+            folder_id = (folder_id or "").strip()
+            try:
+                # la carpeta y también cada foto: alguna pudo quedar fuera de ella (movida,
+                # subida antes de la carpeta); repetir las de dentro no hace daño
+                trash_drive_files([folder_id, *foto_ids], send_to_trash=send_to_trash)
+            except Exception as e:
+                st.info(f"[Drive] No se pudo eliminar/trash la carpeta del paciente: {e}")
+
+        try:
+            st.cache_data.clear()
+        except Exception:
+            pass
+        return True
+    except Exception as e:
+        st.error(f"No se pudo eliminar el paciente: {e}")
+        return False
+
+def _slug(s: str) -> str:
+    s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('ascii')
+    s = re.sub(r'[^\w\s.-]', '', s, flags=re.UNICODE).strip().lower()
+    s = re.sub(r'\s+', '_', s); s = re.sub(r'_+', '_', s)
+    return s.strip('_')
+
+def _escape_for_q(s: str) -> str:
+    # Escapa comillas simples para la query de Drive
+    return s.replace("'", "\\'")
+
+def _referenciados(ids: list[str]) -> set[str]:
+    """De `ids`, los que la app todavía usa (fotos, o link de rutina/plan de alguna medición)."""
+    d = df_sql("""
+        SELECT b.id FROM unnest(%s::text[]) AS b(id)
+        WHERE EXISTS (SELECT 1 FROM fotos f WHERE f.drive_file_id = b.id)
+           OR EXISTS (SELECT 1 FROM mediciones m
+                      WHERE strpos(m.rutina_pdf, b.id) > 0 OR strpos(m.plan_pdf, b.id) > 0)
+    """, (list(ids),))
+    return set(d["id"].tolist()) if not d.empty else set()
+
+def _purge_drive_files_with_prefix(parent_id: str, name_prefix: str, conservar: str | None = None) -> int:
+    """
+    Mueve a papelera todos los archivos en `parent_id` cuyo nombre empiece con `name_prefix`
+    (salvo el id `conservar`, p.ej. el archivo recién subido o reutilizado, y los que alguna
+    columna sigue referenciando: llamar después de actualizar el link en la base).
+    """
+    try:
+        b = get_backend()
+        ids = [f["id"] for f in b.list(parent_id, prefijo=name_prefix) if f["id"] != conservar]
+        if ids:
+            usados = _referenciados(ids)
+            ids = [i for i in ids if i not in usados]
+        return len(ids) - len(b.trash(ids)) if ids else 0
+    except Exception:
+        return 0
+
+def upload_pdf_named(pid: int, fecha_str: str, kind: str, file_bytes: bytes) -> dict:
+    kind = _slug(kind or "pdf")
+    folder_id = ensure_cita_folder(pid, fecha_str)
+    target = f"{fecha_str}_{kind}.pdf"
+    f = upload_pdf_to_folder(file_bytes, target, folder_id, pid=pid)
+    _purge_drive_files_with_prefix(folder_id, f"{fecha_str}_{kind}", conservar=f["id"])
+    return f
+
+def upload_image_named(pid: int, fecha_str: str, base_name: str, file_bytes: bytes, mime: str) -> dict:
+    """
+    Sube imagen con nombre `YYYY-MM-DD_slug.ext` (conserva extensión).
+    No purga; permite múltiples fotos por fecha.
+    """
+    folder_id = ensure_cita_folder(pid, fecha_str)
+    slug = _slug(Path(base_name).stem or "foto")
+    ext = Path(base_name).suffix.lower() or ".jpg"
+    target = f"{fecha_str}_{slug}{ext}"
+    return upload_image_to_folder(file_bytes, target, folder_id, mime, pid=pid)
+
+def ensure_patient_folder(nombre: str, pid: int) -> str:
+    b = get_backend()
+    contar("carpetas_cache_total", carpeta="paciente", origen=b.nombre)
+    return b.ensure_folder(f"{pid:05d} - {nombre}", b.raiz)
+
+def ensure_cita_folder(pid: int, fecha_str: str) -> str:
+    # si ya está guardada la carpeta
+    m = df_sql("SELECT drive_cita_folder_id FROM mediciones WHERE paciente_id=%s AND fecha=%s", (pid, fecha_str))
+    if not m.empty and (m.loc[0, "drive_cita_folder_id"] or "").strip():
+        contar("carpetas_cache_total", carpeta="cita", origen="db")
+        return m.loc[0, "drive_cita_folder_id"].strip()
+
+    # asegurar carpeta de paciente
+    d = df_sql("SELECT nombre, drive_folder_id FROM pacientes WHERE id=%s", (pid,))
+    if d.empty:
+        raise RuntimeError("Paciente no existe.")
+    patient_folder_id = (d.loc[0, "drive_folder_id"] or "").strip()
+    if not patient_folder_id:
+        folder_id = ensure_patient_folder(d.loc[0, "nombre"].strip(), pid)
+        exec_sql("UPDATE pacientes SET drive_folder_id=%s WHERE id=%s", (folder_id, pid))
+        patient_folder_id = folder_id
+
+    b = get_backend()
+    contar("carpetas_cache_total", carpeta="cita", origen=b.nombre)
+    cita_folder_id = b.ensure_folder(fecha_str, patient_folder_id)
+
+    exec_sql("""
+        INSERT INTO mediciones (paciente_id, fecha, drive_cita_folder_id)
+        VALUES (%s,%s,%s)
+        ON CONFLICT (paciente_id, fecha)
+        DO UPDATE SET drive_cita_folder_id = EXCLUDED.drive_cita_folder_id
+    """, (pid, fecha_str, cita_folder_id))
+    return cita_folder_id
+
+# --------- deduplicación por hash de contenido ---------
+def sha256_de(datos) -> str:
+    """SHA-256 de bytes o de un archivo abierto (leído por bloques; deja el cursor al inicio)."""
+    if isinstance(datos, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(datos).hexdigest()
+    datos.seek(0)
+    h = hashlib.file_digest(datos, "sha256")
+    datos.seek(0)
+    return h.hexdigest()
+
+def _archivo_vigente(file_id: str) -> dict | None:
+    """Metadatos del archivo si sigue en el almacén y no está en la papelera."""
+    try:
+        f = get_backend().get(file_id)
+    except Exception:
+        return None
+    return None if not f or f.get("trashed") else f
+
+def buscar_duplicado(pid: int, sha: str, folder_id: str | None = None) -> dict | None:
+    """
+    Archivo ya subido para `pid` con el mismo contenido. Prefiere uno en `folder_id`.
+    Los registros cuyo archivo ya no existe en el almacén se limpian al pasar.
+    """
+    d = df_sql("""
+        SELECT drive_file_id, folder_id FROM archivos
+        WHERE paciente_id=%s AND sha256=%s
+        ORDER BY (folder_id = %s) DESC NULLS LAST, creado_en DESC
+    """, (pid, sha, folder_id))
+    for fid, fol in d.itertuples(index=False, name=None):
+        f = _archivo_vigente(fid)
+        if f is None:
+            exec_sql("DELETE FROM archivos WHERE drive_file_id=%s", (fid,))
+            continue
+        f["mismo_folder"] = bool(folder_id) and folder_id in (f.get("parents") or [fol])
+        return f
+    return None
+
+def registrar_archivo(pid: int, sha: str, f: dict, folder_id: str, filename: str):
+    exec_sql("""
+        INSERT INTO archivos (drive_file_id, paciente_id, sha256, folder_id, web_view_link, filename)
+        VALUES (%s,%s,%s,%s,%s,%s)
+        ON CONFLICT (drive_file_id) DO NOTHING
+    """, (f["id"], pid, sha, folder_id, f.get("webViewLink", ""), filename))
+
+def _subir_dedup(file_bytes: bytes, filename: str, folder_id: str, mime: str, pid: int | None,
+                 sha: str | None = None) -> dict:
+    """
+    Sube al almacén salvo que el paciente ya tenga ese mismo contenido:
+    - en la misma carpeta y con el mismo nombre → se reutiliza tal cual ("reutilizado": "mismo"),
+    - en otra carpeta o con otro nombre → copia del lado del almacén, sin volver a mandar los
+      bytes ("reutilizado": "copia").
+    La copia (y no un link al mismo archivo) mantiene independientes las purgas por prefijo
+    (p.ej. la rutina y el plan idénticos de una fecha), las purgas por fecha y la cuota de PDFs.
+    """
+    b = get_backend()
+    sha = (sha or sha256_de(file_bytes)) if pid else None
+    dup = buscar_duplicado(pid, sha, folder_id) if sha else None
+    if dup and dup["mismo_folder"] and dup.get("name") == filename:
+        return {"id": dup["id"], "webViewLink": dup.get("webViewLink", ""), "reutilizado": "mismo", "sha256": sha}
+    if dup:
+        f = b.copy(dup["id"], filename, folder_id)
+        f["reutilizado"] = "copia"
+    else:
+        f = b.upload(file_bytes, filename, folder_id, mime)
+        f["reutilizado"] = None
+    if DRIVE_PUBLIC_LINKS:
+        make_anyone_reader(f["id"])
+    if sha:
+        registrar_archivo(pid, sha, f, folder_id, filename)
+        f["sha256"] = sha
+    return f
+
+def upload_pdf_to_folder(file_bytes: bytes, filename: str, folder_id: str, pid: int | None = None) -> dict:
+    """Con `pid`, un PDF idéntico ya subido para ese paciente no se vuelve a transferir."""
+    f = _subir_dedup(file_bytes, filename, folder_id, "application/pdf", pid)
+    if f["reutilizado"] != "mismo":
+        try:
+            from modules.media import precalentar_pdf
+            precalentar_pdf(f["id"], file_bytes, filename)
+        except Exception:
+            pass  # la miniatura se genera al primer uso
+    return f
+
+def upload_image_to_folder(file_bytes: bytes, filename: str, folder_id: str, mime: str,
+                           pid: int | None = None, sha: str | None = None) -> dict:
+    return _subir_dedup(file_bytes, filename, folder_id, mime, pid, sha=sha)
+
+def foto_duplicada(pid: int, fecha_str: str, sha: str) -> bool:
+    """¿Ya hay una foto con ese contenido en esa fecha del paciente?"""
+    d = df_sql("""
+        SELECT 1 FROM fotos f JOIN archivos a ON a.drive_file_id = f.drive_file_id
+        WHERE f.paciente_id=%s AND f.fecha=%s AND a.sha256=%s LIMIT 1
+    """, (pid, fecha_str, sha))
+    return not d.empty
+
+def drive_id_de_url(url: str) -> str | None:
+    """Extrae el file id de un link de Drive (/d/<id>/..., ?id=<id>)."""
+    m = re.search(r"/d/([\w-]{10,})", url or "") or re.search(r"[?&]id=([\w-]{10,})", url or "")
+    return m.group(1) if m else None
+
+def to_drive_preview(url: str) -> str:
+    if not url: return ""
+    u = url.strip()
+    if "drive.google.com" in u:
+        if "/view" in u: u = u.replace("/view", "/preview")
+        elif not u.endswith("/preview"): u = u.rstrip("/") + "/preview"
+    return u
+
+def enforce_patient_pdf_quota(patient_folder_id: str, keep: int = 10, send_to_trash: bool = True):
+    b = get_backend()
+    # PDFs en la carpeta del paciente y en sus subcarpetas (fechas)
+    all_pdfs = b.list(patient_folder_id, mime="application/pdf")
+    for sf in b.list(patient_folder_id, carpetas=True):
+        all_pdfs.extend(b.list(sf["id"], mime="application/pdf"))
+
+    # Mantener últimos 'keep' (sin createdTime, p.ej. desde la copia local, ordena el nombre YYYY-MM-DD_*)
+    if len(all_pdfs) > keep:
+        excess = len(all_pdfs) - keep
+        all_pdfs.sort(key=lambda x: (x.get("createdTime") or "", x.get("name") or ""))
+        to_remove = {f["id"]: f for f in all_pdfs[:excess]}
+        for fid, e in b.trash(list(to_remove), borrar=not send_to_trash).items():
+            st.info(f"[Drive] No se pudo depurar PDF {to_remove[fid].get('name')}: {e}")
+
+def delete_drive_file(file_id: str, send_to_trash: bool = True) -> bool:
+    try:
+        errores = get_backend().trash([file_id], borrar=not send_to_trash)
+        if errores:
+            raise errores[file_id]
+        return True
+    except Exception as e:
+        st.info(f"[Drive] No se pudo eliminar el archivo {file_id}: {e}")
+        return False
+
+def delete_foto(photo_id: int, send_to_trash: bool = True) -> bool:
+    fila = df_sql("SELECT drive_file_id FROM fotos WHERE id = %s", (photo_id,))
+    if fila.empty:
+        st.warning("No se encontró la foto en la base.")
+        return False
+    drive_id = (fila.loc[0, "drive_file_id"] or "").strip()
+    if drive_id:
+        delete_drive_file(drive_id, send_to_trash=send_to_trash)
+    exec_sql("DELETE FROM fotos WHERE id = %s", (photo_id,))
+    try: st.cache_data.clear()
+    except: pass
+    return True
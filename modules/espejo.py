@@ -0,0 +1,248 @@
+# modules/espejo.py
+"""
+Espejo local de lectura (SQLite) para absorber los arranques en frío de Neon.
+
+Guarda lo más leído y casi nunca escrito:
+- índice de pacientes (id, nombre, teléfono) → login; el hash de la contraseña solo se copia
+  con LOCAL_MIRROR_LOGIN=1 (el SQLite no va cifrado): sin él el login va siempre al primario,
+- citas de las próximas semanas → ocupación de slots,
+- últimas mediciones de cada paciente → primera página del historial.
+
+Se refresca de forma incremental con marcas de agua sobre `updated_at` (más una poda
+por ids para notar borrados) y solo mientras el primario está despierto, para no
+impedir que Neon se suspenda. Se activa con LOCAL_MIRROR_PATH; nunca recibe escrituras
+de la app: todo se escribe en Postgres y llega aquí en el siguiente refresco.
+"""
+import sqlite3
+import threading
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from time import monotonic
+
+import pandas as pd
+
+from modules.config import LOCAL_MIRROR_PATH, get_conf
+from modules.db import df_sql
+
+REFRESCO_SEG = int(get_conf("LOCAL_MIRROR_REFRESH_SECONDS", "60") or 60)
+CON_LOGIN = str(get_conf("LOCAL_MIRROR_LOGIN", "0")).lower() in ("1", "true", "yes")
+SEMANAS_CITAS = 6
+MEDICIONES_POR_PACIENTE = 20
+SOLAPE = timedelta(seconds=5)  # re-lee un poco hacia atrás por transacciones que terminaron tarde
+
+COLS_MED = [
+    "id", "paciente_id", "fecha", "peso_kg", "grasa_pct", "musculo_pct",
+    "brazo_rest", "brazo_flex", "pecho_rest", "pecho_flex",
+    "cintura_cm", "cadera_cm", "pierna_cm", "pantorrilla_cm", "notas",
+    "rutina_pdf", "plan_pdf",
+]
+
+ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS marcas (tabla TEXT PRIMARY KEY, marca TEXT);
+CREATE TABLE IF NOT EXISTS pacientes (
+  id INTEGER PRIMARY KEY, nombre TEXT, telefono TEXT, telefono_e164 TEXT, password_hash TEXT, updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pacientes_tel ON pacientes(telefono);
+CREATE TABLE IF NOT EXISTS citas (
+  id INTEGER PRIMARY KEY, fecha TEXT, hora TEXT, paciente_id INTEGER, updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_citas_fecha ON citas(fecha);
+CREATE TABLE IF NOT EXISTS mediciones (
+  {", ".join(c + (" INTEGER PRIMARY KEY" if c == "id" else "") for c in COLS_MED)}
+);
+CREATE INDEX IF NOT EXISTS idx_med_pac_fecha ON mediciones(paciente_id, fecha DESC, id DESC);
+"""
+
+_lock = threading.RLock()
+_estado = {"db": None, "ultimo_refresco": 0.0, "refrescando": False}
+
+
+def _db() -> sqlite3.Connection:
+    with _lock:
+        if _estado["db"] is None:
+            Path(LOCAL_MIRROR_PATH).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(LOCAL_MIRROR_PATH, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(ESQUEMA)
+            if "telefono_e164" not in {c[1] for c in db.execute("PRAGMA table_info(pacientes)")}:
+                # espejo de antes de la columna: se agrega y se vuelven a traer todos los pacientes
+                db.execute("ALTER TABLE pacientes ADD COLUMN telefono_e164 TEXT")
+                db.execute("DELETE FROM marcas WHERE tabla = 'pacientes'")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_pacientes_tel_e164 ON pacientes(telefono_e164)")
+            r = db.execute("SELECT marca FROM marcas WHERE tabla = 'login'").fetchone()
+            if (r[0] if r else "1") != ("1" if CON_LOGIN else "0"):
+                # cambió LOCAL_MIRROR_LOGIN: se borran los hashes o se vuelven a traer los pacientes
+                db.execute("UPDATE pacientes SET password_hash = NULL")
+                db.execute("DELETE FROM marcas WHERE tabla = 'pacientes'")
+                db.execute("INSERT OR REPLACE INTO marcas(tabla, marca) VALUES ('login', ?)", ("1" if CON_LOGIN else "0",))
+            _estado["db"] = db
+        return _estado["db"]
+
+
+def _marca(tabla: str) -> datetime:
+    r = _db().execute("SELECT marca FROM marcas WHERE tabla=?", (tabla,)).fetchone()
+    return datetime.fromisoformat(r[0]) if r and r[0] else datetime(1970, 1, 1)
+
+
+def _guardar_marca(tabla: str, serie: pd.Series, actual: datetime):
+    if serie.empty:
+        return
+    nueva = max(pd.to_datetime(serie).max().to_pydatetime() - SOLAPE, actual)
+    _db().execute("INSERT OR REPLACE INTO marcas(tabla, marca) VALUES (?, ?)", (tabla, nueva.isoformat()))
+
+
+def _txt(v):
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return None
+    if isinstance(v, (date, time, datetime, pd.Timestamp)):
+        return v.isoformat()
+    return v
+
+
+def _filas(d: pd.DataFrame, cols: list[str]):
+    return [tuple(_txt(v) for v in fila) for fila in d[cols].itertuples(index=False, name=None)]
+
+
+def _podar(tabla: str, ids_vivos: list[int]):
+    """Borra del espejo las filas cuyo id ya no existe en el primario."""
+    db = _db()
+    db.execute("CREATE TEMP TABLE IF NOT EXISTS _vivos(id INTEGER PRIMARY KEY)")
+    db.execute("DELETE FROM _vivos")
+    db.executemany("INSERT INTO _vivos(id) VALUES (?)", [(int(i),) for i in ids_vivos])
+    db.execute(f"DELETE FROM {tabla} WHERE id NOT IN (SELECT id FROM _vivos)")
+
+
+# --------- refresco ---------
+def refrescar() -> dict:
+    """Trae del primario solo lo que cambió desde la última marca. Devuelve filas tocadas por tabla."""
+    if not LOCAL_MIRROR_PATH:
+        return {}
+    with _lock:
+        db, res = _db(), {}
+        db.execute("BEGIN")
+        try:
+            # pacientes
+            m_pac = _marca("pacientes")
+            d = df_sql(f"""
+                SELECT id, nombre, telefono, telefono_e164,
+                       {"password_hash" if CON_LOGIN else "NULL::text AS password_hash"}, updated_at
+                FROM pacientes WHERE updated_at > %s ORDER BY updated_at
+            """, (m_pac,))
+            cols = ["id", "nombre", "telefono", "telefono_e164", "password_hash", "updated_at"]
+            db.executemany(f"INSERT OR REPLACE INTO pacientes({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                           _filas(d, cols))
+            _podar("pacientes", df_sql("SELECT id FROM pacientes")["id"].tolist())
+            res["pacientes"] = len(d)
+            pids_tocados = set(d["id"].astype(int).tolist())
+            _guardar_marca("pacientes", d["updated_at"], m_pac)
+
+            # citas (ventana: desde ayer hasta N semanas). Al avanzar la ventana entran días
+            # cuyas citas se agendaron antes de la marca: esas se traen aunque no hayan cambiado
+            ini, fin = date.today() - timedelta(days=1), date.today() + timedelta(weeks=SEMANAS_CITAS)
+            m_cit = _marca("citas")
+            r = db.execute("SELECT marca FROM marcas WHERE tabla = 'citas_fin'").fetchone()
+            fin_previo = date.fromisoformat(r[0]) if r else ini - timedelta(days=1)
+            d = df_sql("""
+                SELECT id, fecha, hora, paciente_id, updated_at
+                FROM citas WHERE (updated_at > %s OR fecha > %s) AND fecha BETWEEN %s AND %s
+                ORDER BY updated_at
+            """, (m_cit, fin_previo, ini, fin))
+            cols = ["id", "fecha", "hora", "paciente_id", "updated_at"]
+            db.executemany(f"INSERT OR REPLACE INTO citas({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                           _filas(d, cols))
+            vivos = df_sql("SELECT id FROM citas WHERE fecha BETWEEN %s AND %s", (ini, fin))["id"].tolist()
+            _podar("citas", vivos)
+            res["citas"] = len(d)
+            _guardar_marca("citas", d["updated_at"], m_cit)
+            db.execute("INSERT OR REPLACE INTO marcas(tabla, marca) VALUES ('citas_fin', ?)", (fin.isoformat(),))
+
+            # últimas mediciones de los pacientes con cambios
+            m_med = _marca("mediciones")
+            d = df_sql("SELECT DISTINCT paciente_id FROM mediciones WHERE updated_at > %s", (m_med,))
+            pids_tocados |= set(d["paciente_id"].astype(int).tolist())
+            ult = df_sql("SELECT max(updated_at) AS u FROM mediciones")
+            if pids_tocados:
+                pids = sorted(pids_tocados)
+                d = df_sql(f"""
+                    SELECT {", ".join(COLS_MED)} FROM (
+                      SELECT m.*, row_number() OVER (PARTITION BY paciente_id ORDER BY fecha DESC, id DESC) AS rn
+                      FROM mediciones m WHERE paciente_id = ANY(%s)
+                    ) x WHERE rn <= %s
+                """, (pids, MEDICIONES_POR_PACIENTE))
+                db.executemany("DELETE FROM mediciones WHERE paciente_id=?", [(p,) for p in pids])
+                db.executemany(f"INSERT OR REPLACE INTO mediciones({', '.join(COLS_MED)}) VALUES ({', '.join('?' * len(COLS_MED))})",
+                               _filas(d, COLS_MED))
+                res["mediciones"] = len(d)
+            db.execute("DELETE FROM mediciones WHERE paciente_id NOT IN (SELECT id FROM pacientes)")
+            _guardar_marca("mediciones", ult["u"].dropna(), m_med)
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        _estado["ultimo_refresco"] = monotonic()
+        return res
+
+
+def refrescar_async():
+    """Lanza un refresco en segundo plano si ya toca (cada LOCAL_MIRROR_REFRESH_SECONDS)."""
+    if monotonic() - _estado["ultimo_refresco"] < REFRESCO_SEG:
+        return
+    with _lock:
+        if _estado["refrescando"]:
+            return
+        _estado["refrescando"] = True
+
+    def _run():
+        try:
+            refrescar()
+        except Exception:
+            pass
+        finally:
+            _estado["refrescando"] = False
+
+    threading.Thread(target=_run, name="espejo-refresco", daemon=True).start()
+
+
+def tiene_datos() -> bool:
+    if not LOCAL_MIRROR_PATH:
+        return False
+    return _db().execute("SELECT 1 FROM marcas WHERE tabla <> 'login' LIMIT 1").fetchone() is not None
+
+
+# --------- lecturas (None = el espejo no lo sabe; preguntar al primario) ---------
+def paciente_por_telefono(tel: str, e164: str | None = None) -> dict | None:
+    if not CON_LOGIN:
+        return None
+    if e164:
+        q, p = "SELECT id, nombre, telefono, password_hash FROM pacientes WHERE telefono_e164=? ORDER BY id LIMIT 1", (e164,)
+    else:
+        q, p = "SELECT id, nombre, telefono, password_hash FROM pacientes WHERE telefono=? LIMIT 1", (tel,)
+    r = _db().execute(q, p).fetchone()
+    if not r:
+        return None
+    return {"id": r[0], "nombre": r[1], "telefono": r[2], "password_hash": r[3]}
+
+
+def slots_ocupados(fecha: date) -> set | None:
+    if not (date.today() - timedelta(days=1) <= fecha <= date.today() + timedelta(weeks=SEMANAS_CITAS)):
+        return None
+    filas = _db().execute("SELECT hora FROM citas WHERE fecha=?", (fecha.isoformat(),)).fetchall()
+    return {time.fromisoformat(h) for (h,) in filas}
+
+
+def mediciones_primera_pagina(pid: int, limit: int):
+    if limit > MEDICIONES_POR_PACIENTE:
+        return None
+    if not _db().execute("SELECT 1 FROM pacientes WHERE id=?", (int(pid),)).fetchone():
+        return None
+    cols = [c for c in COLS_MED if c not in ("id", "paciente_id", "rutina_pdf", "plan_pdf")]
+    filas = _db().execute(
+        f"SELECT {', '.join(cols)}, id FROM mediciones WHERE paciente_id=? ORDER BY fecha DESC, id DESC LIMIT ?",
+        (int(pid), limit + 1),
+    ).fetchall()
+    d = pd.DataFrame(filas, columns=cols + ["id"])
+    sig = None
+    if len(d) > limit:
+        d = d.iloc[:limit]
+        sig = (str(d.iloc[-1]["fecha"]), int(d.iloc[-1]["id"]))
+    return d.drop(columns=["id"]).reset_index(drop=True), sig
@@ -0,0 +1,218 @@
+# modules/exportacion.py
+"""
+Exportación completa de datos (respaldo / análisis) en Excel, CSV o Parquet.
+
+Las filas se leen con un cursor con nombre (server-side) en lotes de tamaño fijo y se
+escriben al destino de forma incremental (openpyxl write-only, csv.writer, ParquetWriter),
+así que la memoria no crece con el tamaño de la tabla.
+
+CLI:
+    python -m modules.exportacion pacientes citas mediciones fotos -f xlsx -o respaldo.xlsx
+"""
+import argparse
+import csv
+import importlib.util
+import io
+import os
+import tempfile
+import time
+import uuid
+import zipfile
+from pathlib import Path
+
+LOTE = 2000
+FORMATOS = ("xlsx", "csv", "parquet")
+# archivos generados desde la app (datos personales): se borran al regenerar, al descargar
+# y, los que deja una sesión que se cerró, pasado este tiempo
+DIR_TEMP = Path(tempfile.gettempdir()) / "exportaciones"
+TEMP_MAX_SEG = 3600
+
+# Qué se exporta de cada tabla (password_hash nunca sale)
+EXPORTABLES = {
+    "pacientes": "SELECT id, nombre, fecha_nac, telefono, correo, notas, drive_folder_id, creado_en FROM pacientes ORDER BY id",
+    "citas": "SELECT id, fecha, hora, paciente_id, nota, creado_en FROM citas ORDER BY id",
+    "mediciones": """
+        SELECT id, paciente_id, fecha, peso_kg, grasa_pct, musculo_pct,
+               brazo_rest, brazo_flex, pecho_rest, pecho_flex,
+               cintura_cm, cadera_cm, pierna_cm, pantorrilla_cm, notas,
+               rutina_pdf, plan_pdf, drive_cita_folder_id, cita_id
+        FROM mediciones ORDER BY id
+    """,
+    "fotos": "SELECT id, paciente_id, fecha, drive_file_id, web_view_link, filename FROM fotos ORDER BY id",
+}
+
+
+def iter_lotes(c, tabla: str, lote: int = LOTE):
+    """
+    Genera (columnas, filas, type_codes) por lote desde un cursor con nombre.
+    El cursor server-side necesita transacción y la mantiene abierta toda la exportación:
+    `c` debe ser una conexión propia (db.conexion_propia), nunca la compartida de conn().
+    """
+    if tabla not in EXPORTABLES:
+        raise ValueError(f"Tabla no exportable: {tabla}")
+    with c.transaction():
+        with c.cursor(name=f"exp_{tabla}_{uuid.uuid4().hex[:8]}") as cur:
+            cur.itersize = lote
+            cur.execute(EXPORTABLES[tabla])
+            cols = [d.name for d in cur.description]
+            tipos = [d.type_code for d in cur.description]
+            while True:
+                filas = cur.fetchmany(lote)
+                if not filas:
+                    break
+                yield cols, filas, tipos
+
+
+# --------- escritores ---------
+def _escribir_csv(c, tabla: str, fh_texto) -> int:
+    w, n, header = csv.writer(fh_texto), 0, False
+    for cols, filas, _ in iter_lotes(c, tabla):
+        if not header:
+            w.writerow(cols); header = True
+        w.writerows(filas); n += len(filas)
+    return n
+
+
+# OIDs de Postgres → tipos Arrow (lo demás se exporta como texto)
+def _arrow_tipo(oid: int):
+    import pyarrow as pa
+    return {
+        16: pa.bool_(), 20: pa.int64(), 21: pa.int64(), 23: pa.int64(),
+        700: pa.float64(), 701: pa.float64(), 1700: pa.float64(),
+        1082: pa.date32(), 1083: pa.time64("us"), 1114: pa.timestamp("us"), 1184: pa.timestamp("us", tz="UTC"),
+    }.get(oid, pa.string())
+
+
+def _escribir_parquet(c, tabla: str, fh_bin) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Para exportar a Parquet instala pyarrow (pip install pyarrow).")
+    writer, n = None, 0
+    try:
+        for cols, filas, tipos in iter_lotes(c, tabla):
+            if writer is None:
+                schema = pa.schema([(k, _arrow_tipo(t)) for k, t in zip(cols, tipos)])
+                es_texto = [schema.field(k).type == pa.string() for k in cols]
+                writer = pq.ParquetWriter(fh_bin, schema)
+            datos = {}
+            for i, k in enumerate(cols):
+                vals = [f[i] for f in filas]
+                datos[k] = [None if v is None else str(v) for v in vals] if es_texto[i] else vals
+            writer.write_table(pa.Table.from_pydict(datos, schema=schema)); n += len(filas)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
+
+
+def exportar(c, tablas: list[str], formato: str, destino) -> dict:
+    """
+    Escribe `tablas` en `destino` (ruta o archivo binario) y devuelve {tabla: filas}.
+    - xlsx: un libro con una hoja por tabla.
+    - csv / parquet: un archivo si es una sola tabla; si son varias, un .zip con uno por tabla.
+    """
+    formato = formato.lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    res = {}
+
+    if formato == "xlsx":
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        for t in tablas:
+            ws, n, header = wb.create_sheet(title=t), 0, False
+            for cols, filas, _ in iter_lotes(c, t):
+                if not header:
+                    ws.append(cols); header = True
+                for f in filas:
+                    ws.append(list(f))
+                n += len(filas)
+            res[t] = n
+        wb.save(destino)
+        return res
+
+    def _uno(t, fh_bin):
+        if formato == "csv":
+            txt = io.TextIOWrapper(fh_bin, encoding="utf-8", newline="")
+            try:
+                return _escribir_csv(c, t, txt)
+            finally:
+                txt.flush(); txt.detach()
+        return _escribir_parquet(c, t, fh_bin)
+
+    if len(tablas) == 1:
+        if isinstance(destino, (str, Path)):
+            with open(destino, "wb") as fh:
+                res[tablas[0]] = _uno(tablas[0], fh)
+        else:
+            res[tablas[0]] = _uno(tablas[0], destino)
+        return res
+
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for t in tablas:
+            with zf.open(f"{t}.{formato}", "w") as fh:
+                res[t] = _uno(t, fh)
+    return res
+
+
+def formatos_disponibles() -> tuple[str, ...]:
+    """FORMATOS sin Parquet si pyarrow no está instalado (es opcional)."""
+    return tuple(f for f in FORMATOS if f != "parquet" or importlib.util.find_spec("pyarrow"))
+
+
+def archivo_temporal(sufijo: str) -> str:
+    """Ruta nueva en DIR_TEMP (solo legible por el proceso); de paso barre las viejas."""
+    DIR_TEMP.mkdir(mode=0o700, exist_ok=True)
+    purgar_temporales()
+    fd, ruta = tempfile.mkstemp(suffix=sufijo, dir=DIR_TEMP)
+    os.close(fd)
+    return ruta
+
+
+def borrar_temporal(ruta: str | None):
+    if ruta:
+        Path(ruta).unlink(missing_ok=True)
+
+
+def purgar_temporales(max_edad: int = TEMP_MAX_SEG):
+    limite = time.time() - max_edad
+    for f in DIR_TEMP.glob("*"):
+        try:
+            if f.stat().st_mtime < limite:
+                f.unlink()
+        except OSError:
+            pass
+
+
+def nombre_archivo(tablas: list[str], formato: str) -> str:
+    base = "respaldo" if len(tablas) > 1 else tablas[0]
+    ext = formato if (formato == "xlsx" or len(tablas) == 1) else "zip"
+    return f"{base}.{ext}"
+
+
+def main(argv=None) -> int:
+    from modules.config import NEON_URL
+    from modules.db import conexion_propia
+
+    ap = argparse.ArgumentParser(description="Exporta tablas de la app (streaming).")
+    ap.add_argument("tablas", nargs="*", default=list(EXPORTABLES), help=f"Tablas ({', '.join(EXPORTABLES)})")
+    ap.add_argument("-f", "--formato", choices=FORMATOS, default="xlsx")
+    ap.add_argument("-o", "--salida", help="Archivo destino (por defecto según tablas/formato)")
+    args = ap.parse_args(argv)
+
+    if not NEON_URL:
+        ap.error("Falta NEON_DATABASE_URL en el entorno.")
+    tablas = args.tablas or list(EXPORTABLES)
+    salida = args.salida or nombre_archivo(tablas, args.formato)
+    with conexion_propia() as c:
+        res = exportar(c, tablas, args.formato, salida)
+    for t, n in res.items():
+        print(f"{t}: {n} filas")
+    print(f"→ {salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
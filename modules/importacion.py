@@ -0,0 +1,225 @@
+# modules/importacion.py
+"""
+Importación masiva de pacientes y mediciones históricas desde .xlsx / .csv.
+
+Flujo: leer en streaming (openpyxl read-only / csv) → validar y normalizar por lotes →
+COPY a una tabla temporal de staging → merge con upserts en una sola transacción.
+Cada fila inválida se reporta con su número de fila y el motivo; las válidas se cargan.
+"""
+import csv
+import io
+from datetime import date, datetime
+from pathlib import Path
+
+import streamlit as st
+
+from modules.db import conexion_propia
+from modules.auth import normalize_tel, telefono_e164
+from modules.drive import _slug
+
+LOTE = 5000
+
+# Columnas de staging (orden = orden del COPY)
+CAMPOS_PACIENTE = ["nombre", "telefono", "fecha_nac", "correo", "notas_paciente"]
+CAMPOS_MEDICION = [
+    "fecha", "peso_kg", "grasa_pct", "musculo_pct",
+    "brazo_rest", "brazo_flex", "pecho_rest", "pecho_flex",
+    "cintura_cm", "cadera_cm", "pierna_cm", "pantorrilla_cm", "notas",
+]
+NUMERICOS = set(CAMPOS_MEDICION[1:-1])
+COLUMNAS = ["fila"] + CAMPOS_PACIENTE + CAMPOS_MEDICION
+
+# Encabezados aceptados (ya pasados por _slug) → columna canónica
+ALIAS = {
+    "nombre_completo": "nombre", "paciente": "nombre",
+    "tel": "telefono", "celular": "telefono", "whatsapp": "telefono",
+    "fecha_nacimiento": "fecha_nac", "nacimiento": "fecha_nac",
+    "email": "correo", "mail": "correo",
+    "notas_perfil": "notas_paciente",
+    "fecha_cita": "fecha", "fecha_medicion": "fecha",
+    "peso": "peso_kg", "grasa": "grasa_pct", "musculo": "musculo_pct",
+    "brazo_reposo": "brazo_rest", "brazo": "brazo_rest",
+    "pecho_reposo": "pecho_rest", "pecho": "pecho_rest",
+    "cintura": "cintura_cm", "cadera": "cadera_cm",
+    "pierna": "pierna_cm", "pantorrilla": "pantorrilla_cm",
+}
+
+_FORMATOS_FECHA = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d/%m/%y")
+
+
+def _col(h) -> str:
+    k = _slug(str(h or ""))
+    return ALIAS.get(k, k)
+
+
+def leer_filas(nombre_archivo: str, fh):
+    """Genera (num_fila, dict) sin cargar el archivo completo en memoria."""
+    ext = Path(nombre_archivo).suffix.lower()
+    if ext in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        wb = load_workbook(fh, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            headers = [_col(h) for h in next(rows, [])]
+            for i, vals in enumerate(rows, start=2):
+                if vals is None or all(v in (None, "") for v in vals):
+                    continue
+                yield i, dict(zip(headers, vals))
+        finally:
+            wb.close()
+    elif ext == ".csv":
+        text = io.TextIOWrapper(fh, encoding="utf-8-sig", newline="")
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(text, dialect)
+        headers = [_col(h) for h in next(reader, [])]
+        for i, vals in enumerate(reader, start=2):
+            if not any((v or "").strip() for v in vals):
+                continue
+            yield i, dict(zip(headers, vals))
+    else:
+        raise ValueError("Formato no soportado (usa .xlsx o .csv).")
+
+
+def _fecha(v) -> str | None:
+    if v in (None, ""):
+        return None
+    if isinstance(v, datetime):
+        return v.date().isoformat()
+    if isinstance(v, date):
+        return v.isoformat()
+    s = str(v).strip()
+    for fmt in _FORMATOS_FECHA:
+        try:
+            return datetime.strptime(s[:10] if fmt == "%Y-%m-%d" else s, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"fecha inválida '{s}'")
+
+
+def _numero(v) -> float | None:
+    if v in (None, ""):
+        return None
+    if isinstance(v, (int, float)):
+        return float(v)
+    s = str(v).strip().replace(",", ".")
+    try:
+        return float(s)
+    except ValueError:
+        raise ValueError(f"número inválido '{v}'")
+
+
+def _texto(v) -> str | None:
+    s = str(v).strip() if v is not None else ""
+    return s or None
+
+
+def normalizar_fila(num: int, r: dict) -> tuple:
+    """Devuelve la tupla lista para COPY o lanza ValueError con el motivo."""
+    nombre = _texto(r.get("nombre"))
+    if not nombre:
+        raise ValueError("falta nombre")
+    tel_raw = r.get("telefono")
+    if isinstance(tel_raw, float) and tel_raw.is_integer():
+        tel_raw = int(tel_raw)  # Excel guarda teléfonos como número
+    tel = normalize_tel(str(tel_raw or ""))
+    if telefono_e164(tel) is None:
+        raise ValueError(f"teléfono inválido '{tel_raw or ''}'")
+
+    out = [num, nombre, tel, _fecha(r.get("fecha_nac")), _texto(r.get("correo")), _texto(r.get("notas_paciente"))]
+    fecha = _fecha(r.get("fecha"))
+    med = [_numero(r.get(c)) if c in NUMERICOS else _texto(r.get(c)) for c in CAMPOS_MEDICION[1:]]
+    if not fecha and any(v is not None for v in med):
+        raise ValueError("medición sin fecha")
+    return tuple(out + [fecha] + med)
+
+
+def _lotes(filas, n: int = LOTE):
+    lote = []
+    for f in filas:
+        lote.append(f)
+        if len(lote) >= n:
+            yield lote; lote = []
+    if lote:
+        yield lote
+
+
+def importar_archivo(nombre_archivo: str, fh) -> dict:
+    """
+    Importa pacientes (+ mediciones opcionales por fila) desde .xlsx/.csv.
+    Pacientes: upsert por teléfono. Mediciones: upsert por (paciente, fecha);
+    los campos vacíos del archivo no pisan valores existentes.
+    Devuelve {"filas", "validas", "pacientes", "mediciones", "errores": [{"fila", "error"}]}.
+    """
+    res = {"filas": 0, "validas": 0, "pacientes": 0, "mediciones": 0, "errores": []}
+    # conexión propia: el COPY queda abierto mientras se lee el archivo, y en la compartida
+    # bloquearía a las demás sesiones (y sus sentencias caerían dentro de esta transacción)
+    with conexion_propia() as c, c.transaction(), c.cursor() as cur:
+        cur.execute(f"""
+            CREATE TEMP TABLE stg_import (
+              fila INT,
+              nombre TEXT, telefono TEXT, fecha_nac TEXT, correo TEXT, notas_paciente TEXT,
+              fecha TEXT,
+              {", ".join(f"{k} DOUBLE PRECISION" for k in CAMPOS_MEDICION[1:-1])},
+              notas TEXT
+            ) ON COMMIT DROP
+        """)
+        with cur.copy(f"COPY stg_import ({', '.join(COLUMNAS)}) FROM STDIN") as cp:
+            for lote in _lotes(leer_filas(nombre_archivo, fh)):
+                for num, r in lote:
+                    res["filas"] += 1
+                    try:
+                        cp.write_row(normalizar_fila(num, r))
+                        res["validas"] += 1
+                    except ValueError as e:
+                        res["errores"].append({"fila": num, "error": str(e)})
+
+        # pacientes por teléfono canónico: "+52 351…" y "351…" son la misma persona.
+        # UPDATE + INSERT en vez de ON CONFLICT: el índice de telefono_e164 puede no ser único
+        # todavía si quedan duplicados de antes (ver setup_db).
+        cur.execute("""
+            CREATE TEMP TABLE stg_pac ON COMMIT DROP AS
+            SELECT DISTINCT ON (e164) e164, nombre, telefono, fecha_nac, correo, notas_paciente
+            FROM (SELECT *, tel_e164_mx(telefono) AS e164 FROM stg_import) s
+            ORDER BY e164, fila DESC
+        """)
+        cur.execute("""
+            UPDATE pacientes p SET
+              nombre    = s.nombre,
+              fecha_nac = COALESCE(s.fecha_nac,      p.fecha_nac),
+              correo    = COALESCE(s.correo,         p.correo),
+              notas     = COALESCE(s.notas_paciente, p.notas)
+            FROM stg_pac s
+            WHERE p.telefono_e164 = s.e164
+        """)
+        res["pacientes"] = cur.rowcount or 0
+        cur.execute("""
+            INSERT INTO pacientes (nombre, telefono, fecha_nac, correo, notas)
+            SELECT nombre, telefono, fecha_nac, correo, notas_paciente
+            FROM stg_pac s
+            WHERE NOT EXISTS (SELECT 1 FROM pacientes p WHERE p.telefono_e164 = s.e164)
+        """)
+        res["pacientes"] += cur.rowcount or 0
+
+        campos = CAMPOS_MEDICION[1:]
+        cur.execute(f"""
+            INSERT INTO mediciones (paciente_id, fecha, {", ".join(campos)})
+            SELECT DISTINCT ON (p.id, s.fecha) p.id, s.fecha, {", ".join(f"s.{k}" for k in campos)}
+            FROM stg_import s
+            JOIN pacientes p ON p.telefono_e164 = tel_e164_mx(s.telefono)
+            WHERE s.fecha IS NOT NULL
+            ORDER BY p.id, s.fecha, s.fila DESC
+            ON CONFLICT (paciente_id, fecha) DO UPDATE SET
+              {", ".join(f"{k} = COALESCE(EXCLUDED.{k}, mediciones.{k})" for k in campos)}
+        """)
+        res["mediciones"] = cur.rowcount or 0
+
+    try:
+        st.cache_data.clear()
+    except Exception:
+        pass
+    return res
@@ -0,0 +1,404 @@
+# modules/media.py
+"""
+Entrega de fotos y PDFs sin links públicos de Drive.
+
+Los archivos se bajan del almacén (Drive u otro backend) y se guardan en una
+caché LRU en disco (MEDIA_CACHE_DIR, tope MEDIA_CACHE_MB). El orden LRU es el mtime de
+cada archivo, que se toca en cada acierto.
+
+Con SIDE_HTTP_PORT + MEDIA_PUBLIC_URL + MEDIA_URL_SECRET las páginas reciben URLs firmadas
+(HMAC, con vencimiento) hacia /media/ del servidor lateral, que responde con ETag / 304, Range / 206
+y Cache-Control privado. Los PDFs tienen además una miniatura PNG de la primera página
+(pypdfium2), generada al subir y guardada por hash de contenido. Sin servidor lateral, las páginas muestran el archivo desde la
+misma caché (st.image / st.download_button). En ningún caso el archivo queda público.
+El secreto tiene que ser el mismo en todas las réplicas y sobrevivir a los reinicios (una
+URL firmada por un proceso se valida en otro): sin MEDIA_URL_SECRET no hay proxy.
+"""
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import urllib.parse
+from pathlib import Path
+from time import time
+
+import streamlit as st
+
+from modules.config import MEDIA_PUBLIC_URL, MEDIA_URL_SECRET, MEDIA_CACHE_DIR, MEDIA_CACHE_MB, DRIVE_PUBLIC_LINKS
+from modules.almacenamiento import get_backend
+from modules.drive import drive_id_de_url, to_drive_preview
+from modules import servidor
+from modules.metricas import contar
+
+PREFIJO = "/media/"
+URL_VIGENCIA_SEG = 6 * 3600
+THUMB_PX = 480
+PDF_P1_PX = 640
+VARIANTES = ("orig", "thumb", "p1")
+USO_RECIENTE_SEG = 120  # la poda no toca lo usado hace menos: puede estar sirviéndose
+
+_secreto = (MEDIA_URL_SECRET or "").encode()
+_locks: dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+
+# --------- caché en disco ---------
+def _dir() -> Path:
+    d = Path(MEDIA_CACHE_DIR)
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _clave(file_id: str, variante: str) -> str:
+    if not re.fullmatch(r"[\w-]{10,}", file_id or "") or variante not in VARIANTES:
+        raise ValueError("Archivo inválido.")
+    return f"{file_id}__{variante}"
+
+
+def _lock_de(clave: str) -> threading.Lock:
+    with _locks_lock:
+        return _locks.setdefault(clave, threading.Lock())
+
+
+def _podar_cache():
+    """Borra los menos usados hasta quedar bajo MEDIA_CACHE_MB (salvo los de uso reciente)."""
+    tope = MEDIA_CACHE_MB * 1024 * 1024
+    archivos = []
+    for p in _dir().glob("*.bin"):
+        try:
+            info = p.stat()
+        except OSError:
+            continue  # otro hilo lo acaba de podar
+        archivos.append((info.st_mtime, info.st_size, p))
+    total = sum(s for _, s, _ in archivos)
+    reciente = time() - USO_RECIENTE_SEG
+    for mtime, s, p in sorted(archivos):
+        if total <= tope or mtime >= reciente:
+            break
+        p.unlink(missing_ok=True)
+        p.with_suffix(".json").unlink(missing_ok=True)
+        total -= s
+
+
+def _miniatura(src: Path, dst: Path) -> str | None:
+    """Reduce una imagen a THUMB_PX de lado mayor (WebP). None si Pillow no está o no es imagen."""
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+    try:
+        with Image.open(src) as im:
+            im = ImageOps.exif_transpose(im)
+            im.thumbnail((THUMB_PX, THUMB_PX))
+            if im.mode not in ("RGB", "RGBA"):
+                im = im.convert("RGB")
+            im.save(dst, "WEBP", quality=80, method=4)
+        return "image/webp"
+    except Exception:
+        return None
+
+
+def obtener(file_id: str, variante: str = "orig") -> tuple[Path, dict]:
+    """
+    Ruta local + metadatos ({mime, etag, nombre}) del archivo, bajándolo del almacén si
+    no está en caché. Descargas concurrentes del mismo archivo esperan a la primera.
+    """
+    clave = _clave(file_id, variante)
+    if variante == "p1":
+        return _pagina1(file_id)
+    ruta, ruta_meta = _dir() / f"{clave}.bin", _dir() / f"{clave}.json"
+    acierto = ruta.exists() and ruta_meta.exists()
+    contar("media_cache_total", variante=variante, resultado="acierto" if acierto else "fallo")
+    if not acierto:
+        with _lock_de(clave):
+            if not (ruta.exists() and ruta_meta.exists()):
+                if variante == "orig":
+                    tmp = ruta.with_suffix(f".{secrets.token_hex(4)}.tmp")
+                    try:
+                        m = get_backend().download(file_id, tmp)
+                        os.replace(tmp, ruta)
+                    finally:
+                        tmp.unlink(missing_ok=True)
+                    meta = {
+                        "mime": m.get("mimeType") or "application/octet-stream",
+                        "nombre": m.get("name") or file_id,
+                        "etag": m.get("md5Checksum") or hashlib.md5(ruta.read_bytes()).hexdigest(),
+                    }
+                else:
+                    src, m = obtener(file_id, "orig")
+                    tmp = ruta.with_suffix(f".{secrets.token_hex(4)}.tmp")
+                    mime = _miniatura(src, tmp) if m["mime"].startswith("image/") else None
+                    if mime is None:
+                        tmp.unlink(missing_ok=True)
+                        return src, m  # sin miniatura posible: se sirve el original
+                    os.replace(tmp, ruta)
+                    meta = {"mime": mime, "nombre": Path(m["nombre"]).stem + ".webp", "etag": f"{m['etag']}-t{THUMB_PX}"}
+                ruta_meta.write_text(json.dumps(meta))
+                _podar_cache()
+    try:
+        os.utime(ruta)  # marca de uso (LRU)
+    except OSError:
+        pass
+    return ruta, json.loads(ruta_meta.read_text())
+
+
+# --------- primera página de PDFs ---------
+def _ruta_p1(etag: str) -> Path:
+    return _dir() / f"pdf_{etag}__p1.bin"
+
+
+def _render_p1(pdf, destino: Path) -> bool:
+    """Renderiza la primera página de `pdf` (ruta o bytes) a PNG. False si no se pudo."""
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        return False
+    tmp = destino.with_suffix(f".{secrets.token_hex(4)}.tmp")
+    try:
+        doc = pdfium.PdfDocument(str(pdf) if isinstance(pdf, Path) else pdf)
+        try:
+            pag = doc[0]
+            img = pag.render(scale=PDF_P1_PX / max(pag.get_width(), 1)).to_pil()
+            pag.close()
+        finally:
+            doc.close()
+        img.save(tmp, "PNG", optimize=True)
+        os.replace(tmp, destino)
+        return True
+    except Exception:
+        return False
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _pagina1(file_id: str) -> tuple[Path, dict]:
+    src, m = obtener(file_id, "orig")
+    ruta = _ruta_p1(m["etag"])
+    if not ruta.exists():
+        with _lock_de(ruta.name):
+            if not ruta.exists() and not _render_p1(src, ruta):
+                raise ValueError("Sin miniatura para este archivo.")
+    try:
+        os.utime(ruta)
+    except OSError:
+        pass
+    return ruta, {"mime": "image/png", "nombre": Path(m["nombre"]).stem + ".png", "etag": f"{m['etag']}-p1"}
+
+
+def precalentar_pdf(file_id: str, pdf_bytes: bytes, nombre: str) -> None:
+    """
+    Al subir un PDF: deja el original en caché y renderiza su primera página, para que la
+    primera vista no tenga que bajar nada de Drive. La clave de la miniatura es el md5 del
+    contenido (el mismo md5Checksum que reporta Drive), así un PDF re-subido igual la reutiliza.
+    """
+    etag = hashlib.md5(pdf_bytes).hexdigest()
+    clave = _clave(file_id, "orig")
+    ruta = _dir() / f"{clave}.bin"
+    ruta.write_bytes(pdf_bytes)
+    (_dir() / f"{clave}.json").write_text(json.dumps({"mime": "application/pdf", "nombre": nombre, "etag": etag}))
+    if not _ruta_p1(etag).exists():
+        _render_p1(pdf_bytes, _ruta_p1(etag))
+    _podar_cache()
+
+
+def invalidar(file_id: str) -> None:
+    """Saca de la caché todas las variantes de un archivo (p.ej. al borrarlo o reemplazarlo)."""
+    for v in VARIANTES:
+        for ext in (".bin", ".json"):
+            (_dir() / f"{file_id}__{v}{ext}").unlink(missing_ok=True)
+
+
+# --------- URLs firmadas ---------
+def _firma(file_id: str, variante: str, exp: int) -> str:
+    return hmac.new(_secreto, f"{file_id}:{variante}:{exp}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def proxy_disponible() -> bool:
+    return bool(MEDIA_PUBLIC_URL and _secreto) and servidor.activo()
+
+
+def media_url(file_id: str, variante: str = "orig", descargar: bool = False) -> str | None:
+    """URL firmada hacia el proxy, o None si no hay servidor lateral publicado."""
+    if not file_id or not proxy_disponible():
+        return None
+    # vencimiento redondeado a la hora: la URL es estable entre reruns y el navegador reaprovecha su caché
+    exp = (int(time()) // 3600 + 1) * 3600 + URL_VIGENCIA_SEG
+    q = {"exp": exp, "sig": _firma(file_id, variante, exp)}
+    if descargar:
+        q["dl"] = 1
+    return f"{MEDIA_PUBLIC_URL}{PREFIJO}{file_id}/{variante}?{urllib.parse.urlencode(q)}"
+
+
+# --------- handler HTTP (/media/<id>/<variante>) ---------
+def _rango(valor: str, total: int) -> tuple[int, int] | None:
+    m = re.fullmatch(r"bytes=(\d*)-(\d*)", (valor or "").strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if m.group(1):
+        ini = int(m.group(1))
+        fin = min(int(m.group(2)), total - 1) if m.group(2) else total - 1
+    else:
+        ini, fin = max(total - int(m.group(2)), 0), total - 1
+    return (ini, fin) if ini <= fin < total else None
+
+
+def _servir(req):
+    u = urllib.parse.urlsplit(req.path)
+    partes = u.path[len(PREFIJO):].split("/")
+    q = urllib.parse.parse_qs(u.query)
+    try:
+        file_id, variante = partes[0], (partes[1] if len(partes) > 1 else "orig")
+        exp = int(q["exp"][0])
+        ok = hmac.compare_digest(q["sig"][0], _firma(file_id, variante, exp))
+    except (KeyError, IndexError, ValueError):
+        ok = False
+    if not ok or not _secreto or exp < time():
+        return req.send_error(403)
+    try:
+        fh, meta = _abrir(file_id, variante)
+    except ValueError:
+        return req.send_error(404)
+    except OSError:
+        return req.send_error(503)
+    with fh:
+        _responder(req, fh, meta, bool(q.get("dl")))
+
+
+def _abrir(file_id: str, variante: str):
+    """obtener() + open(). Si la poda se llevó el archivo entre ambos, se vuelve a bajar una vez."""
+    for intento in (1, 2):
+        try:
+            ruta, meta = obtener(file_id, variante)
+            return open(ruta, "rb"), meta  # abierto, ya no importa si se poda después
+        except FileNotFoundError:
+            if intento == 2:
+                raise
+
+
+def _responder(req, fh, meta: dict, descargar: bool):
+    etag = f'"{meta["etag"]}"'
+    comunes = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=3600",
+        "Accept-Ranges": "bytes",
+    }
+    if etag in [e.strip() for e in (req.headers.get("If-None-Match") or "").split(",")]:
+        req.send_response(304)
+        for k, v in comunes.items():
+            req.send_header(k, v)
+        req.send_header("Content-Length", "0")
+        return req.end_headers()
+
+    total = os.fstat(fh.fileno()).st_size
+    ini, fin, estado = 0, total - 1, 200
+    if req.headers.get("Range") and req.headers.get("If-Range", etag) == etag:
+        r = _rango(req.headers["Range"], total)
+        if r is None:
+            req.send_response(416)
+            req.send_header("Content-Range", f"bytes */{total}")
+            req.send_header("Content-Length", "0")
+            return req.end_headers()
+        (ini, fin), estado = r, 206
+
+    disp = "attachment" if descargar else "inline"
+    nombre = urllib.parse.quote(meta["nombre"])
+    req.send_response(estado)
+    for k, v in comunes.items():
+        req.send_header(k, v)
+    req.send_header("Content-Type", meta["mime"])
+    req.send_header("Content-Disposition", f"{disp}; filename*=UTF-8''{nombre}")
+    req.send_header("Content-Length", str(fin - ini + 1))
+    if estado == 206:
+        req.send_header("Content-Range", f"bytes {ini}-{fin}/{total}")
+    req.end_headers()
+    if req.command == "HEAD":
+        return
+    fh.seek(ini)
+    restante = fin - ini + 1
+    while restante > 0:
+        bloque = fh.read(min(256 * 1024, restante))
+        if not bloque:
+            break
+        req.wfile.write(bloque)
+        restante -= len(bloque)
+
+
+servidor.registrar_ruta(PREFIJO, _servir)
+
+
+# --------- helpers para las páginas ---------
+ESTILO_TARJETA = "background:#111;border-radius:12px;overflow:hidden;display:flex;justify-content:center;"
+
+
+def mostrar_foto(file_id: str, alto: int = 220):
+    """Miniatura de una foto en la galería (proxy firmado, o desde la caché local)."""
+    url = media_url(file_id, "thumb")
+    if url:
+        st.markdown(
+            f'<div style="{ESTILO_TARJETA}"><img src="{url}" loading="lazy" '
+            f'style="height:{alto}px;object-fit:contain;"></div>',
+            unsafe_allow_html=True,
+        )
+        return
+    try:
+        ruta, _ = obtener(file_id, "thumb")
+        st.image(str(ruta), use_container_width=True)
+    except Exception:
+        st.caption("No se pudo cargar la foto.")
+
+
+def boton_descarga(file_id: str, etiqueta: str, key: str, disabled: bool = False):
+    """Descarga del original: link firmado si hay proxy; si no, se baja a la caché al pedirlo."""
+    if disabled or not file_id:
+        st.button(etiqueta, key=key, disabled=True)
+        return
+    url = media_url(file_id, descargar=True)
+    if url:
+        st.link_button(etiqueta, url)
+        return
+    listo = f"_media_listo_{key}"
+    if not st.session_state.get(listo):
+        if st.button(etiqueta, key=key):
+            st.session_state[listo] = True
+            st.rerun()
+        return
+    try:
+        ruta, meta = obtener(file_id)
+        st.download_button(f"💾 Guardar {meta['nombre']}", ruta.read_bytes(),
+                           file_name=meta["nombre"], mime=meta["mime"], key=f"{key}_dl")
+    except Exception as e:
+        st.error(f"No se pudo descargar: {e}")
+
+
+def boton_pdf(link: str, etiqueta: str, key: str):
+    """Botón para un PDF guardado como webViewLink de Drive (rutina_pdf / plan_pdf)."""
+    boton_descarga(drive_id_de_url(link), etiqueta, key, disabled=not bool(link))
+
+
+def vista_previa_pdf(link: str, key: str, alto: int = 360):
+    """
+    Miniatura de la primera página; el visor completo (iframe) solo se carga si se pide.
+    """
+    fid = drive_id_de_url(link)
+    if not fid:
+        return
+    url = media_url(fid, "p1")
+    if url:
+        st.markdown(
+            f'<div style="{ESTILO_TARJETA}"><img src="{url}" loading="lazy" '
+            f'style="max-height:{alto}px;max-width:100%;object-fit:contain;"></div>',
+            unsafe_allow_html=True,
+        )
+    else:
+        try:
+            ruta, _ = obtener(fid, "p1")
+            st.image(str(ruta), use_container_width=True)
+        except Exception:
+            st.caption("Vista previa no disponible.")
+
+    visor = media_url(fid) or (to_drive_preview(link) if DRIVE_PUBLIC_LINKS else None)
+    if visor and st.toggle("Ver documento completo", key=f"visor_{key}"):
+        st.components.v1.iframe(visor, height=alto * 2)
@@ -0,0 +1,199 @@
+# modules/mediciones.py
+# Mediciones por fecha, borrado de un día y lecturas paginadas (historial, PDFs, fotos).
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import streamlit as st
+
+from modules.db import conn, exec_sql, df_sql, df_sentencia, leer_de_espejo
+from modules.drive import (
+    ensure_cita_folder, sha256_de, foto_duplicada, upload_image_to_folder,
+)
+from modules.cache_compartida import cache_compartida
+from modules.almacenamiento import get_backend
+from modules.metricas import contar
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# --------- MEDICIONES / PDFs / FOTOS ---------
+def upsert_medicion(pid: int, fecha: str, rutina_pdf: str | None, plan_pdf: str | None):
+    exec_sql(
+        """
+        INSERT INTO mediciones (paciente_id, fecha, rutina_pdf, plan_pdf)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (paciente_id, fecha)
+        DO UPDATE SET
+          rutina_pdf = COALESCE(EXCLUDED.rutina_pdf, mediciones.rutina_pdf),
+          plan_pdf   = COALESCE(EXCLUDED.plan_pdf,   mediciones.plan_pdf)
+        """,
+        (pid, fecha, rutina_pdf, plan_pdf),
+    )
+
+def reservar_indices_foto(pid: int, fecha_str: str, n: int = 1) -> int:
+    """
+    Reserva `n` índices consecutivos para fotos `YYYY-MM-DD_foto_XX` de (paciente, fecha) y
+    devuelve el primero. Es un solo upsert atómico sobre la fila contador, así dos subidas
+    simultáneas nunca reciben el mismo índice. La primera vez arranca después del mayor
+    índice ya guardado en `fotos`.
+    """
+    n = max(int(n), 1)
+    with conn().cursor() as cur:
+        cur.execute(r"""
+            INSERT INTO foto_contadores AS fc (paciente_id, fecha, ultimo)
+            SELECT %(pid)s, %(fecha)s, COALESCE(max(substring(filename FROM '_foto_(\d+)')::int), 0) + %(n)s
+            FROM fotos WHERE paciente_id = %(pid)s AND fecha = %(fecha)s
+            ON CONFLICT (paciente_id, fecha) DO UPDATE SET ultimo = fc.ultimo + %(n)s
+            RETURNING ultimo
+        """, {"pid": pid, "fecha": fecha_str, "n": n})
+        ultimo = int(cur.fetchone()[0])
+    return ultimo - n + 1
+
+def subir_fotos(pid: int, fecha_str: str, archivos) -> dict:
+    """
+    Sube un lote de fotos (archivos tipo UploadedFile: .name, .type, .read()) a la carpeta de la cita
+    con nombres `YYYY-MM-DD_foto_XX.ext`. Las idénticas (en el lote o ya en esa fecha) se omiten
+    y los índices se reservan de una vez en la base.
+    Devuelve {"subidas", "repetidas", "fallidas", "errores": [str]}.
+    """
+    res = {"subidas": 0, "repetidas": 0, "fallidas": 0, "errores": []}
+    folder_id = ensure_cita_folder(pid, fecha_str)
+
+    nuevas, vistos = [], set()
+    for f in archivos:
+        sha = sha256_de(f)
+        if sha in vistos or foto_duplicada(pid, fecha_str, sha):
+            res["repetidas"] += 1
+            continue
+        vistos.add(sha)
+        nuevas.append((f, sha))
+
+    idx = reservar_indices_foto(pid, fecha_str, len(nuevas)) if nuevas else 1
+    for f, sha in nuevas:
+        try:
+            ext = Path(f.name).suffix.lower() or ".jpg"
+            if ext not in {".jpg", ".jpeg", ".png", ".webp"}:
+                ext = ".jpg"
+            mime = getattr(f, "type", None) or "image/jpeg"
+            nombre = f"{fecha_str}_foto_{idx:02d}{ext}"
+            idx += 1
+            up = upload_image_to_folder(f.read(), nombre, folder_id, mime, pid=pid, sha=sha)
+            exec_sql("""
+                INSERT INTO fotos (paciente_id, fecha, drive_file_id, web_view_link, filename)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (pid, fecha_str, up["id"], up.get("webViewLink", ""), nombre))
+            res["subidas"] += 1
+        except Exception as e:
+            res["fallidas"] += 1
+            res["errores"].append(f"Error subiendo {getattr(f, 'name', 'foto')}: {e}")
+
+    asociar_medicion_a_cita(pid, fecha_str)
+    return res
+
+def asociar_medicion_a_cita(pid: int, fecha_str: str):
+    d = df_sql("SELECT id FROM citas WHERE paciente_id=%s AND fecha=%s ORDER BY hora ASC LIMIT 1", (pid, fecha_str))
+    if not d.empty:
+        cid = int(d.loc[0, "id"])
+        exec_sql("UPDATE mediciones SET cita_id=%s WHERE paciente_id=%s AND fecha=%s", (cid, pid, fecha_str))
+
+def delete_medicion_dia(
+    pid: int,
+    fecha_str: str,
+    remove_drive_folder: bool = True,
+    send_to_trash: bool = True,
+    delete_cita_row: bool = False,
+) -> list[str]:
+    """
+    Borra la medición del día con sus fotos (y opcionalmente la cita) en una sola sentencia
+    `DELETE ... RETURNING`; los archivos de Drive devueltos se mandan a papelera en un batch.
+    Devuelve los ids que Drive no pudo borrar: en la base ya nada los referencia, así que
+    quien llama debe mostrarlos para limpiarlos a mano.
+    """
+    with conn().cursor() as cur:
+        cur.execute("""
+            WITH f AS (DELETE FROM fotos WHERE paciente_id = %(pid)s AND fecha = %(fecha)s RETURNING drive_file_id),
+                 m AS (DELETE FROM mediciones WHERE paciente_id = %(pid)s AND fecha = %(fecha)s RETURNING drive_cita_folder_id),
+                 k AS (DELETE FROM foto_contadores WHERE paciente_id = %(pid)s AND fecha = %(fecha)s),
+                 c AS (DELETE FROM citas WHERE %(citas)s AND paciente_id = %(pid)s AND fecha = %(fecha)s::date)
+            SELECT (SELECT drive_cita_folder_id FROM m),
+                   ARRAY(SELECT drive_file_id FROM f WHERE coalesce(drive_file_id, '') <> '')
+        """, {"pid": pid, "fecha": fecha_str, "citas": bool(delete_cita_row)})
+        cita_folder_id, foto_ids = cur.fetchone()
+
+    cita_folder_id = (cita_folder_id or "").strip()
+    # las fotos viven en la carpeta de la cita: si se borra la carpeta, se van con ella
+    ids = list(foto_ids or [])
+    if remove_drive_folder and cita_folder_id:
+        ids.append(cita_folder_id)
+    try:
+        fallidos = list(get_backend().trash(ids, borrar=not send_to_trash)) if ids else []
+    except Exception:
+        fallidos = ids
+    if fallidos:
+        contar("drive_papelera_fallidos_total", origen="medicion_dia", n=len(fallidos))
+    try: st.cache_data.clear()
+    except: pass
+    return fallidos
+
+# --------- LECTURAS PAGINADAS (keyset sobre (fecha, id)) ---------
+def _pagina_keyset(pagina: str, pid: int, cursor: tuple | None, limit: int):
+    """
+    Una página del paciente, ordenada por (fecha DESC, id DESC); `pagina` es una de
+    sentencias.PAGINAS (mediciones, pdfs, fotos).
+    `cursor` = (fecha, id) de la última fila ya mostrada; None = primera página.
+    Devuelve (df, siguiente_cursor | None). Costo acotado por `limit`, no por el historial.
+    """
+    if cursor:
+        d = df_sentencia(f"{pagina}_pagina_siguiente", (pid, str(cursor[0]), int(cursor[1]), int(limit) + 1))
+    else:
+        d = df_sentencia(f"{pagina}_pagina", (pid, int(limit) + 1))
+    sig = None
+    if len(d) > limit:
+        d = d.iloc[:limit]
+        last = d.iloc[-1]
+        sig = (str(last["_cur_fecha"]), int(last["_cur_id"]))
+    return d.drop(columns=["_cur_fecha", "_cur_id"]).reset_index(drop=True), sig
+
+def _espacio_paciente(pid: int, *_, **__) -> list[str]:
+    return [f"paciente:{int(pid)}"]
+
+@cache_compartida("mediciones_pagina", _espacio_paciente, ttl=300, ttl_sin_aviso=300, l2=False, espejo=True)
+def mediciones_pagina(pid: int, cursor: tuple | None = None, limit: int = 20):
+    if cursor is None and leer_de_espejo():
+        from modules import espejo
+        r = espejo.mediciones_primera_pagina(pid, limit)
+        if r is not None:
+            return r
+    return _pagina_keyset("mediciones", pid, cursor, limit)
+
+@cache_compartida("pdfs_pagina", _espacio_paciente, ttl=300, ttl_sin_aviso=300, l2=False)
+def pdfs_pagina(pid: int, cursor: tuple | None = None, limit: int = 20):
+    return _pagina_keyset("pdfs", pid, cursor, limit)
+
+@cache_compartida("fotos_pagina", _espacio_paciente, ttl=300, ttl_sin_aviso=300, l2=False)
+def fotos_pagina(pid: int, cursor: tuple | None = None, limit: int = 24):
+    return _pagina_keyset("fotos", pid, cursor, limit)
+
+def paginas_acumuladas(key: str, fetch, pid: int, limit: int = 20) -> tuple[pd.DataFrame, bool]:
+    """
+    Junta las páginas que el usuario ya pidió ("Cargar más") para la UI.
+    En session_state solo se guarda cuántas páginas van; cada página sale de caché
+    (y exec_sql la invalida tras escribir), así que un rerun no recarga todo el historial.
+    Devuelve (df acumulado, hay_mas).
+    """
+    import pandas as pd
+    n = int(st.session_state.setdefault(key, 1))
+    partes, cursor = [], None
+    for _ in range(n):
+        d, cursor = fetch(pid, cursor=cursor, limit=limit)
+        partes.append(d)
+        if cursor is None:
+            break
+    return pd.concat(partes, ignore_index=True), cursor is not None
+
+def boton_cargar_mas(key: str, hay_mas: bool):
+    if hay_mas and st.button("⬇️ Cargar más", key=f"{key}_btn"):
+        st.session_state[key] = int(st.session_state.get(key, 1)) + 1
+        st.rerun()
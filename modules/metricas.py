@@ -0,0 +1,282 @@
+# modules/metricas.py
+"""
+Instrumentación ligera: latencia de consultas, llamadas a Drive y reruns.
+
+Cada llamada medida deja un evento en un buffer circular en memoria (por proceso) y suma
+a un histograma por "huella" (la consulta con los literales y espacios normalizados, o el
+método de Drive). El panel oculto de Carmen (pages/5_Carmen_Rendimiento.py) lee de aquí.
+
+Además hay contadores con etiquetas (`contar`) para lo que no es latencia: llamadas a Drive
+por método y estado, envíos de WhatsApp, intentos de login, aciertos de caché. Todo se
+expone en formato de texto de Prometheus en /metrics del servidor lateral (SIDE_HTTP_PORT):
+    curl -s localhost:$SIDE_HTTP_PORT/metrics
+El servidor lateral escucha en todas las interfaces (sirve los medios), así que sin
+METRICS_TOKEN /metrics solo responde a conexiones locales; para leerlo desde fuera:
+    curl -s -H "Authorization: Bearer $METRICS_TOKEN" https://…/metrics
+
+Desactivar con INSTRUMENTACION=0. Tamaño del buffer: METRICAS_BUFFER (eventos).
+"""
+import hmac
+import ipaddress
+import re
+import sys
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from time import perf_counter, time
+
+from modules.config import get_conf
+
+ACTIVA = str(get_conf("INSTRUMENTACION", "1")).lower() not in ("0", "false", "no")
+BUFFER = int(get_conf("METRICAS_BUFFER", "2000") or 2000)
+METRICS_TOKEN = get_conf("METRICS_TOKEN")  # si está, /metrics pide "Authorization: Bearer <token>"; si no, solo local
+
+# límites (ms) de los buckets del histograma; el último es +inf
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+TIPOS = ("sql", "ping", "drive", "almacen", "rerun", "bcrypt", "espera_pool", "whatsapp")
+
+_eventos: deque = deque(maxlen=BUFFER)
+_hist: dict[tuple[str, str], dict] = {}
+_contadores: dict[tuple[str, tuple], float] = {}
+_lock = threading.Lock()
+
+_MIS_ARCHIVOS = ("modules/metricas.py", "modules/db.py", "modules/drive.py")
+
+
+@lru_cache(maxsize=1024)
+def huella_sql(q: str) -> str:
+    """Forma canónica de la consulta: sin literales ni espacios extra (agrupa llamadas iguales)."""
+    q = re.sub(r"'(?:[^']|'')*'", "?", q)
+    q = re.sub(r"\b\d+(\.\d+)?\b", "?", q)
+    q = re.sub(r"\s+", " ", q).strip()
+    return q[:300]
+
+
+def _origen() -> tuple[str, str]:
+    """(página, función) del primer frame fuera de la capa de datos."""
+    pagina, funcion = "", ""
+    f = sys._getframe(1)
+    for _ in range(40):
+        if f is None:
+            break
+        arch = f.f_code.co_filename.replace("\\", "/")
+        if not funcion and not arch.endswith(_MIS_ARCHIVOS) and "/site-packages/" not in arch and "/contextlib.py" not in arch:
+            funcion = f"{arch.rsplit('/', 1)[-1]}:{f.f_code.co_name}"
+        if "/pages/" in arch or arch.endswith("/app.py"):
+            pagina = arch.rsplit("/", 1)[-1]
+            break
+        f = f.f_back
+    return pagina, funcion
+
+
+def registrar(tipo: str, huella: str, ms: float, filas: int | None = None,
+              pagina: str = "", funcion: str = "", error: bool = False):
+    ev = (time(), tipo, huella, ms, filas, pagina, funcion, error)
+    with _lock:
+        _eventos.append(ev)
+        h = _hist.get((tipo, huella))
+        if h is None:
+            h = _hist[(tipo, huella)] = {"n": 0, "total_ms": 0.0, "max_ms": 0.0, "filas": 0,
+                                         "errores": 0, "buckets": [0] * len(BUCKETS_MS)}
+        h["n"] += 1
+        h["total_ms"] += ms
+        h["max_ms"] = max(h["max_ms"], ms)
+        h["filas"] += filas or 0
+        h["errores"] += int(error)
+        for i, lim in enumerate(BUCKETS_MS):
+            if ms <= lim:
+                h["buckets"][i] += 1
+                break
+
+
+class _Medicion:
+    __slots__ = ("filas",)
+
+    def __init__(self):
+        self.filas = None
+
+
+@contextmanager
+def medir(tipo: str, huella: str):
+    """
+    with medir("sql", huella_sql(q)) as m:
+        ...; m.filas = n
+    """
+    if not ACTIVA:
+        yield _Medicion()
+        return
+    m, error, t0 = _Medicion(), False, perf_counter()
+    try:
+        yield m
+    except Exception:  # st.rerun / st.stop (BaseException) no cuentan como error
+        error = True
+        raise
+    finally:
+        ms = (perf_counter() - t0) * 1000
+        pagina, funcion = _origen()
+        registrar(tipo, huella, ms, m.filas, pagina, funcion, error)
+
+
+def contar(nombre: str, n: float = 1, **etiquetas):
+    """Suma `n` al contador `nombre` con esas etiquetas (p.ej. contar("login_intentos_total", resultado="ok"))."""
+    if not ACTIVA:
+        return
+    clave = (nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items())))
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + n
+
+
+def cache_data_medido(nombre: str, **kwargs):
+    """
+    st.cache_data que además cuenta llamadas y fallos (el cuerpo solo corre en un fallo),
+    para sacar la tasa de aciertos por caché. Se usa igual que @st.cache_data(...).
+    """
+    import streamlit as st
+
+    def deco(fn):
+        @wraps(fn)
+        def _fallo(*a, **k):
+            contar("cache_fallos_total", cache=nombre)
+            return fn(*a, **k)
+
+        cacheada = st.cache_data(**kwargs)(_fallo)
+
+        @wraps(fn)
+        def _llamada(*a, **k):
+            contar("cache_llamadas_total", cache=nombre)
+            return cacheada(*a, **k)
+
+        _llamada.clear = cacheada.clear
+        return _llamada
+    return deco
+
+
+# --------- lecturas para el panel / exportadores ---------
+def eventos(tipo: str | None = None) -> list[tuple]:
+    with _lock:
+        evs = list(_eventos)
+    return [e for e in evs if tipo is None or e[1] == tipo]
+
+
+def histogramas() -> dict[tuple[str, str], dict]:
+    with _lock:
+        return {k: {**v, "buckets": list(v["buckets"])} for k, v in _hist.items()}
+
+
+def percentil(buckets: list[int], p: float) -> float:
+    """Percentil aproximado (límite superior del bucket) desde un histograma."""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    objetivo, acum = total * p, 0
+    for lim, n in zip(BUCKETS_MS, buckets):
+        acum += n
+        if acum >= objetivo:
+            return lim
+    return BUCKETS_MS[-1]
+
+
+def contadores() -> dict[tuple[str, tuple], float]:
+    with _lock:
+        return dict(_contadores)
+
+
+def reiniciar():
+    with _lock:
+        _eventos.clear()
+        _hist.clear()
+        _contadores.clear()
+
+
+# --------- exposición Prometheus ---------
+PREFIJO = "carmen_"
+_HIST_PROM = {  # tipo → (métrica, etiqueta de la huella, ayuda)
+    "sql": ("db_consulta_segundos", "consulta", "Duración de consultas SQL por huella."),
+    "ping": ("db_ping_segundos", "consulta", "Duración del ping de conexión a Postgres."),
+    "drive": ("drive_llamada_segundos", "metodo", "Duración de llamadas a la API de Drive por método."),
+    "almacen": ("almacen_llamada_segundos", "operacion", "Duración de operaciones del almacenamiento S3."),
+    "rerun": ("rerun_segundos", "pagina", "Duración de cada rerun por página."),
+    "bcrypt": ("bcrypt_segundos", "operacion", "Duración de hash/verificación bcrypt en el pool."),
+    "espera_pool": ("bcrypt_espera_pool_segundos", "pool", "Espera por un cupo en el pool de bcrypt."),
+    "whatsapp": ("whatsapp_envio_segundos", "operacion", "Duración de envíos a WhatsApp Cloud API."),
+}
+
+
+def _esc(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etq(pares) -> str:
+    return "{" + ",".join(f'{k}="{_esc(v)}"' for k, v in pares) + "}" if pares else ""
+
+
+def exposicion() -> str:
+    """Todas las métricas del proceso en formato de texto de Prometheus (0.0.4)."""
+    lineas, hist, cont = [], histogramas(), contadores()
+
+    por_tipo: dict[str, list] = {}
+    for (tipo, huella), h in hist.items():
+        por_tipo.setdefault(tipo, []).append((huella, h))
+    for tipo, items in sorted(por_tipo.items()):
+        metrica, etiqueta, ayuda = _HIST_PROM.get(tipo, (f"{tipo}_segundos", "huella", tipo))
+        nombre = PREFIJO + metrica
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+        for huella, h in sorted(items):
+            acum = 0
+            for lim, n in zip(BUCKETS_MS, h["buckets"]):
+                acum += n
+                le = "+Inf" if lim == float("inf") else repr(lim / 1000)
+                lineas.append(f"{nombre}_bucket{_etq([(etiqueta, huella), ('le', le)])} {acum}")
+            lineas.append(f"{nombre}_sum{_etq([(etiqueta, huella)])} {h['total_ms'] / 1000:.6f}")
+            lineas.append(f"{nombre}_count{_etq([(etiqueta, huella)])} {h['n']}")
+
+    por_nombre: dict[str, list] = {}
+    for (n, etiquetas), v in cont.items():
+        por_nombre.setdefault(n, []).append((etiquetas, v))
+    for n, items in sorted(por_nombre.items()):
+        nombre = PREFIJO + n
+        lineas.append(f"# TYPE {nombre} counter")
+        for etiquetas, v in sorted(items):
+            lineas.append(f"{nombre}{_etq(etiquetas)} {v:g}")
+
+    # tasa de aciertos de caché (derivable en PromQL, pero útil al mirar con curl)
+    llamadas = {dict(e)["cache"]: v for (n, e), v in cont.items() if n == "cache_llamadas_total"}
+    fallos = {dict(e)["cache"]: v for (n, e), v in cont.items() if n == "cache_fallos_total"}
+    if llamadas:
+        nombre = PREFIJO + "cache_aciertos_ratio"
+        lineas.append(f"# TYPE {nombre} gauge")
+        for cache, n in sorted(llamadas.items()):
+            lineas.append(f"{nombre}{_etq([('cache', cache)])} {max(n - fallos.get(cache, 0), 0) / n:.4f}")
+    return "\n".join(lineas) + "\n"
+
+
+def _es_local(req) -> bool:
+    try:
+        return ipaddress.ip_address(req.client_address[0]).is_loopback
+    except ValueError:
+        return False
+
+
+def _servir_metrics(req):
+    if METRICS_TOKEN:
+        if not hmac.compare_digest((req.headers.get("Authorization") or "").encode(),
+                                   f"Bearer {METRICS_TOKEN}".encode()):
+            return req.send_error(401)
+    elif not _es_local(req):
+        return req.send_error(403)  # huellas SQL y tiempos por página: no se publican sin token
+    cuerpo = exposicion().encode()
+    req.send_response(200)
+    req.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+    req.send_header("Content-Length", str(len(cuerpo)))
+    req.send_header("Cache-Control", "no-store")
+    req.end_headers()
+    if req.command != "HEAD":
+        req.wfile.write(cuerpo)
+
+
+def publicar():
+    """Registra /metrics en el servidor lateral y lo arranca (no hace nada sin SIDE_HTTP_PORT)."""
+    from modules import servidor
+    servidor.registrar_ruta("/metrics", _servir_metrics)
+    return servidor.iniciar()
@@ -0,0 +1,143 @@
+# modules/notificaciones.py
+"""
+Versiones de caché compartidas entre réplicas, avisadas con LISTEN/NOTIFY.
+
+Cada "espacio" de datos tiene un contador en `cache_versiones` (ver setup_db):
+  citas:<fecha>    lo sube el trigger de `citas` (además de `NOTIFY citas_changed, fecha`)
+  paciente:<id>    lo suben los triggers de `mediciones` y `fotos`
+  pacientes        cualquier cambio en `pacientes` (nombres/teléfonos en la agenda)
+  *                todo (TRUNCATE, o invalidar("*") a mano)
+`cache_invalidar(espacio)` sube el contador y hace `NOTIFY cache_invalidada, 'espacio=version'`.
+
+Un hilo por proceso escucha el canal con SU PROPIA conexión (la de db.conn() es compartida por
+todas las sesiones) y apunta la versión nueva. Las cachés llevan `versiones(espacios)` en la
+clave (modules/cache_compartida.py), así un cambio en cualquier réplica invalida solo lo
+afectado, en todas las sesiones de todos los procesos, sin esperar a un TTL.
+
+Sin escucha activa las versiones se releen de la base cada `ttl_sin_aviso` segundos (si hay
+caché compartida y el primario está despierto) o la versión cae a un bucket de ese tamaño:
+el TTL que tenía cada caché antes de los avisos. La escucha no mantiene despierto al primario:
+se corta cuando deja de estar caliente y el siguiente rerun la vuelve a arrancar.
+"""
+import select
+import threading
+from datetime import date
+from time import monotonic, sleep
+
+from modules.config import NOTIFY_DATABASE_URL, CITAS_TTL_SEG, CACHE_COMPARTIDA
+from modules.db import conn, primario_caliente
+from modules.metricas import contar, medir
+
+CANAL = "cache_invalidada"
+_ESPERA_SEG = 5  # cada cuánto se revisa si el primario sigue caliente
+
+_versiones: dict[str, int] = {}
+_leidas: dict[str, float] = {}  # espacio -> cuándo se leyó de la base (sin escucha)
+_estado = {"escuchando": False, "corriendo": False}
+_lock = threading.Lock()
+
+
+def activa() -> bool:
+    return _estado["escuchando"]
+
+
+def _cargar(espacios: list[str]):
+    with medir("sql", "SELECT espacio, version FROM cache_versiones"), conn().cursor() as cur:
+        cur.execute("SELECT espacio, version FROM cache_versiones WHERE espacio = ANY(%s)", (espacios,))
+        leidas = dict(cur.fetchall())
+    ahora = monotonic()
+    with _lock:
+        for e in espacios:
+            # max: un aviso pudo llegar mientras se leía
+            _versiones[e] = max(_versiones.get(e, 0), int(leidas.get(e, 0)))
+            _leidas[e] = ahora
+
+
+def versiones(espacios: list[str], ttl_sin_aviso: int = CITAS_TTL_SEG, frescas: bool = False) -> tuple:
+    """
+    Parte de la clave de caché de lo que depende de `espacios` (siempre incluye "*").
+    Sin escucha, la respuesta puede tener hasta `ttl_sin_aviso` segundos de atraso.
+    frescas=True relee de la base aunque haya memoria (los avisos llegan asíncronos: quien
+    acaba de escribir no debe ver su propia versión vieja).
+    """
+    esp = ["*", *espacios]
+    if frescas and (_estado["escuchando"] or primario_caliente()):
+        faltan = esp
+    elif _estado["escuchando"]:
+        faltan = [e for e in esp if e not in _versiones]
+    elif CACHE_COMPARTIDA and primario_caliente():
+        ahora = monotonic()
+        faltan = [e for e in esp if ahora - _leidas.get(e, -ttl_sin_aviso) >= ttl_sin_aviso]
+    else:
+        return ("ttl", int(monotonic() // ttl_sin_aviso))
+    if faltan:
+        try:
+            _cargar(faltan)
+        except Exception:
+            return ("ttl", int(monotonic() // ttl_sin_aviso))
+    return tuple(_versiones.get(e, 0) for e in esp)
+
+
+def version_dia(fecha: date) -> tuple:
+    return versiones([f"citas:{fecha.isoformat()}"])
+
+
+def invalidar(*espacios: str):
+    """Sube la versión de cada espacio en todas las réplicas (lo que no cubren los triggers)."""
+    with conn().cursor() as cur:
+        for e in espacios:
+            cur.execute("SELECT cache_invalidar(%s)", (e,))
+            _aplicar(f"{e}={cur.fetchone()[0]}")
+
+
+def _aplicar(payload: str):
+    espacio, _, v = payload.rpartition("=")
+    try:
+        v = int(v)
+    except ValueError:
+        return
+    with _lock:
+        _versiones[espacio] = max(_versiones.get(espacio, 0), v)
+    contar("cache_avisos_total", espacio=espacio.split(":")[0])
+
+
+def _escuchar():
+    import psycopg
+    espera = 1
+    try:
+        while primario_caliente():
+            try:
+                with psycopg.connect(NOTIFY_DATABASE_URL, autocommit=True, connect_timeout=10,
+                                     keepalives=1, keepalives_idle=30, keepalives_interval=10,
+                                     keepalives_count=5) as c:
+                    c.add_notify_handler(lambda n: _aplicar(n.payload))
+                    c.execute(f"LISTEN {CANAL}")
+                    # lo que cambió mientras no se escuchaba no llegó como aviso: se relee al usarlo
+                    with _lock:
+                        _versiones.clear()
+                        _leidas.clear()
+                        _estado["escuchando"] = True
+                    espera = 1
+                    while primario_caliente():
+                        listo, _, _ = select.select([c.fileno()], [], [], _ESPERA_SEG)
+                        if listo:
+                            c.execute("SELECT 1")  # procesa lo pendiente: los avisos van al handler
+            except Exception:
+                contar("cache_escucha_errores_total")
+            finally:
+                _estado["escuchando"] = False
+            sleep(espera)
+            espera = min(espera * 2, 60)
+    finally:
+        _estado["corriendo"] = False
+
+
+def iniciar():
+    """Arranca la escucha en segundo plano si no corre ya y el primario está despierto."""
+    if not NOTIFY_DATABASE_URL or not primario_caliente():
+        return
+    with _lock:
+        if _estado["corriendo"]:
+            return
+        _estado["corriendo"] = True
+    threading.Thread(target=_escuchar, name="cache-listen", daemon=True).start()
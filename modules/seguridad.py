@@ -0,0 +1,183 @@
+# modules/seguridad.py
+"""
+Servicio de contraseñas: bcrypt fuera del hilo del script y con límites.
+
+- Costo calibrado una vez por proceso (primer uso) para que un hash tarde ~BCRYPT_TARGET_MS en esta
+  máquina, nunca por debajo de 12 (el de bcrypt.gensalt()): en un host lento no se debilita.
+- Hash/verificación en un pool de procesos acotado (BCRYPT_WORKERS); si la cola está llena
+  se rechaza en vez de acumular CPU.
+- Re-hash transparente al hacer login si el hash guardado tiene un costo menor al actual.
+- Throttling en memoria con token bucket por teléfono y por IP. La IP solo cuenta si es la
+  del cliente: detrás de un proxy (Railway) st.context.ip_address es la del proxy y todas las
+  personas compartirían cubeta, así que se usa X-Forwarded-For solo si TRUSTED_PROXY lo
+  autoriza; si no, se limita solo por teléfono. Un login correcto devuelve lo que consumió.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as PlazoVencido
+from time import monotonic, perf_counter
+
+import bcrypt
+import streamlit as st
+
+from modules import _bcrypt_worker, metricas
+from modules.config import get_conf, PEPPER
+
+BCRYPT_TARGET_MS = int(get_conf("BCRYPT_TARGET_MS", "250") or 250)
+# piso = el costo de bcrypt.gensalt() que se usaba antes: la calibración solo puede subirlo
+BCRYPT_COSTO_MIN, BCRYPT_COSTO_MAX = 12, 15
+BCRYPT_WORKERS = int(get_conf("BCRYPT_WORKERS", "2") or 2)
+BCRYPT_COLA_MAX = BCRYPT_WORKERS * 4
+BCRYPT_TIMEOUT_SEG = 10
+
+# token bucket: capacidad y segundos para recuperar un intento
+LOGIN_INTENTOS = int(get_conf("LOGIN_INTENTOS", "5") or 5)
+LOGIN_RECARGA_SEG = float(get_conf("LOGIN_RECARGA_SEG", "30") or 30)
+LOGIN_INTENTOS_IP = int(get_conf("LOGIN_INTENTOS_IP", "20") or 20)
+# proxies cuyo X-Forwarded-For se cree: IPs separadas por coma, o "*" si la app solo es
+# alcanzable a través del proxy (Railway); vacío = sin límite por IP
+TRUSTED_PROXY = {p.strip() for p in (get_conf("TRUSTED_PROXY", "") or "").split(",") if p.strip()}
+
+
+class ServicioOcupado(RuntimeError):
+    pass
+
+
+def _peppered(pw: str) -> bytes:
+    return (pw.encode() + PEPPER) if PEPPER else pw.encode()
+
+
+# --------- calibración + pool ---------
+@st.cache_resource(show_spinner=False)
+def costo_bcrypt() -> int:
+    """Mayor costo cuyo tiempo estimado no pase de BCRYPT_TARGET_MS (cada +1 duplica el tiempo)."""
+    t0 = perf_counter()
+    bcrypt.hashpw(b"calibracion", bcrypt.gensalt(rounds=BCRYPT_COSTO_MIN))
+    ms = (perf_counter() - t0) * 1000
+    costo = BCRYPT_COSTO_MIN
+    while costo < BCRYPT_COSTO_MAX and ms * 2 <= BCRYPT_TARGET_MS:
+        costo += 1; ms *= 2
+    return costo
+
+
+@st.cache_resource(show_spinner=False)
+def _pool():
+    # spawn: no heredamos los hilos de Streamlit en los workers
+    ctx = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=BCRYPT_WORKERS, mp_context=ctx), threading.BoundedSemaphore(BCRYPT_COLA_MAX)
+
+
+def _en_pool(fn, *args):
+    pool, cupo = _pool()
+    t0 = perf_counter()
+    ok = cupo.acquire(timeout=2)
+    metricas.registrar("espera_pool", "bcrypt", (perf_counter() - t0) * 1000, error=not ok)
+    if not ok:
+        raise ServicioOcupado("Hay demasiados inicios de sesión en este momento. Intenta en unos segundos.")
+    try:
+        fut = pool.submit(fn, *args)
+    except Exception:
+        cupo.release()
+        raise
+    # el cupo se libera cuando el trabajo termina de verdad, no cuando nos cansamos de esperar:
+    # si no, con el pool saturado la cola dejaría de estar acotada
+    fut.add_done_callback(lambda _: cupo.release())
+    try:
+        with metricas.medir("bcrypt", fn.__name__):
+            return fut.result(timeout=BCRYPT_TIMEOUT_SEG)
+    except PlazoVencido:
+        fut.cancel()  # si aún no arrancaba, ya no corre
+        raise ServicioOcupado("El inicio de sesión está tardando demasiado. Intenta en unos segundos.")
+
+
+def hash_password(pw: str) -> str:
+    return _en_pool(_bcrypt_worker.hashpw, _peppered(pw), costo_bcrypt())
+
+
+def check_password(pw: str, pw_hash: str) -> bool:
+    if not pw_hash:
+        return False
+    return _en_pool(_bcrypt_worker.checkpw, _peppered(pw), pw_hash.encode())
+
+
+def costo_de_hash(pw_hash: str) -> int:
+    """'$2b$12$...' → 12 (0 si no se reconoce)."""
+    try:
+        return int(pw_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def necesita_rehash(pw_hash: str) -> bool:
+    return costo_de_hash(pw_hash) < costo_bcrypt()
+
+
+# --------- throttling (token bucket en memoria) ---------
+class TokenBucket:
+    def __init__(self, capacidad: int, recarga_seg: float):
+        self.capacidad, self.recarga_seg = capacidad, recarga_seg
+        self._cubetas: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def tomar(self, clave: str) -> bool:
+        ahora = monotonic()
+        with self._lock:
+            tokens, t = self._cubetas.get(clave, (float(self.capacidad), ahora))
+            tokens = min(self.capacidad, tokens + (ahora - t) / self.recarga_seg)
+            if tokens < 1:
+                self._cubetas[clave] = (tokens, ahora)
+                return False
+            self._cubetas[clave] = (tokens - 1, ahora)
+            if len(self._cubetas) > 10000:  # poda: las llenas equivalen a no tener entrada
+                self._cubetas = {k: v for k, v in self._cubetas.items()
+                                 if v[0] + (ahora - v[1]) / self.recarga_seg < self.capacidad}
+            return True
+
+    def devolver(self, clave: str) -> None:
+        """Regresa un intento tomado (p.ej. el login salió bien)."""
+        ahora = monotonic()
+        with self._lock:
+            if clave in self._cubetas:
+                tokens, t = self._cubetas[clave]
+                tokens = min(self.capacidad, tokens + (ahora - t) / self.recarga_seg + 1)
+                self._cubetas[clave] = (tokens, ahora)
+
+
+@st.cache_resource(show_spinner=False)
+def _buckets():
+    return {
+        "tel": TokenBucket(LOGIN_INTENTOS, LOGIN_RECARGA_SEG),
+        "ip": TokenBucket(LOGIN_INTENTOS_IP, LOGIN_RECARGA_SEG),
+    }
+
+
+def ip_cliente() -> str | None:
+    """IP de quien hace el intento, o None si no se puede saber con confianza."""
+    if not TRUSTED_PROXY:
+        return None
+    try:
+        ctx = st.context
+        par = getattr(ctx, "ip_address", None)
+        if "*" not in TRUSTED_PROXY and par not in TRUSTED_PROXY:
+            return None  # no vino por el proxy: el encabezado lo pudo poner cualquiera
+        return (ctx.headers.get("X-Forwarded-For") or "").split(",")[0].strip() or None
+    except Exception:
+        return None
+
+
+def permitir_intento(clave: str) -> None:
+    """Consume un intento para `clave` (teléfono / id) y para la IP; lanza ValueError si se agotaron."""
+    b, ip = _buckets(), ip_cliente()
+    if not b["tel"].tomar(clave):
+        raise ValueError("Demasiados intentos. Espera un momento y vuelve a intentar.")
+    if ip is not None and not b["ip"].tomar(ip):
+        b["tel"].devolver(clave)
+        raise ValueError("Demasiados intentos. Espera un momento y vuelve a intentar.")
+
+
+def intento_exitoso(clave: str) -> None:
+    """El intento de `clave` resultó válido: no cuenta contra el teléfono ni contra la IP."""
+    b, ip = _buckets(), ip_cliente()
+    b["tel"].devolver(clave)
+    if ip is not None:
+        b["ip"].devolver(ip)
@@ -0,0 +1,144 @@
+# modules/sentencias.py
+"""
+Catálogo de las consultas calientes: nombre estable → SQL.
+
+Se ejecutan con db.df_sentencia / db.exec_sentencia, que las preparan en el servidor
+(psycopg `prepare=True`; el plan se guarda por conexión y se reutiliza) y las registran en
+modules.metricas con su nombre en vez de la huella del texto, así el panel de rendimiento y
+/metrics no cambian de serie cuando alguien reacomoda espacios en el SQL.
+
+Solo parámetros posicionales (%s) y SQL fijo: lo dinámico (listas de columnas, filtros
+opcionales) se resuelve aquí en entradas separadas, no armando texto en las páginas.
+"""
+
+# columnas de las lecturas paginadas keyset (modules/mediciones.py): nombre → (tabla, columnas)
+PAGINAS = {
+    "mediciones": ("mediciones", """fecha,
+        peso_kg, grasa_pct, musculo_pct,
+        brazo_rest, brazo_flex, pecho_rest, pecho_flex,
+        cintura_cm, cadera_cm, pierna_cm, pantorrilla_cm,
+        notas"""),
+    "pdfs": ("mediciones", "fecha, rutina_pdf, plan_pdf"),
+    "fotos": ("fotos", "id, fecha, drive_file_id, filename"),
+}
+
+
+def _pagina(tabla: str, columnas: str, con_cursor: bool) -> str:
+    where = "paciente_id = %s" + (" AND (fecha, id) < (%s, %s)" if con_cursor else "")
+    return f"""
+        SELECT {columnas}, fecha AS _cur_fecha, id AS _cur_id
+        FROM {tabla}
+        WHERE {where}
+        ORDER BY fecha DESC, id DESC
+        LIMIT %s
+    """
+
+
+SENTENCIAS: dict[str, str] = {
+    # --- pacientes ---
+    # por teléfono: (e164, e164, telefono); el texto tal cual solo si no hay forma E.164
+    "paciente_login": """
+        (SELECT id, nombre, telefono, password_hash FROM pacientes WHERE telefono_e164 = %s ORDER BY id LIMIT 1)
+        UNION ALL
+        (SELECT id, nombre, telefono, password_hash FROM pacientes WHERE %s::text IS NULL AND telefono = %s)
+        LIMIT 1
+    """,
+    "paciente_id_por_telefono": """
+        (SELECT id FROM pacientes WHERE telefono_e164 = %s ORDER BY id LIMIT 1)
+        UNION ALL
+        (SELECT id FROM pacientes WHERE %s::text IS NULL AND telefono = %s)
+        LIMIT 1
+    """,
+    "paciente_por_id": """
+        SELECT id, nombre, fecha_nac, telefono, correo, notas, drive_folder_id, creado_en
+        FROM pacientes WHERE id = %s
+    """,
+    "paciente_carpeta": "SELECT drive_folder_id FROM pacientes WHERE id = %s",
+    "paciente_password": "SELECT password_hash FROM pacientes WHERE id = %s LIMIT 1",
+    "paciente_rehash": "UPDATE pacientes SET password_hash = %s WHERE id = %s AND password_hash = %s",
+    "buscar_pacientes": "SELECT id, nombre FROM pacientes WHERE nombre ILIKE %s ORDER BY nombre",
+
+    # --- agenda ---
+    "slots_ocupados": "SELECT hora FROM citas WHERE fecha = %s ORDER BY hora",
+    "citas_por_dia": """
+        SELECT c.id AS id_cita, c.fecha, c.hora, p.id AS paciente_id, p.nombre, p.telefono, c.nota
+        FROM citas c LEFT JOIN pacientes p ON p.id = c.paciente_id
+        WHERE c.fecha = %s ORDER BY c.hora
+    """,
+    "cita_en_dia": "SELECT 1 FROM citas WHERE paciente_id = %s AND fecha = %s LIMIT 1",
+    "cita_en_ventana_7dias": """
+        SELECT 1 FROM citas
+        WHERE paciente_id = %s
+          AND fecha BETWEEN (%s::date - INTERVAL '6 days') AND (%s::date + INTERVAL '6 days')
+        LIMIT 1
+    """,
+    "agendar_cita": "INSERT INTO citas (fecha, hora, paciente_id, nota) VALUES (%s, %s, %s, %s)",
+    "agenda_rango": """
+        WITH slots AS (
+            SELECT * FROM unnest(%s::date[], %s::time[]) AS s(fecha, hora)
+        ), c AS (
+            SELECT id, fecha, hora, paciente_id, nota
+            FROM citas WHERE fecha BETWEEN %s AND %s
+        )
+        SELECT COALESCE(s.fecha, c.fecha) AS fecha,
+               COALESCE(s.hora, c.hora)   AS hora,
+               c.id AS id_cita, p.id AS paciente_id, p.nombre, p.telefono, c.nota,
+               (c.id IS NOT NULL) AS ocupado
+        FROM slots s
+        FULL JOIN c ON c.fecha = s.fecha AND c.hora = s.hora
+        LEFT JOIN pacientes p ON p.id = c.paciente_id
+        ORDER BY 1, 2
+    """,
+    "proxima_cita": """
+        SELECT fecha, hora, nota
+        FROM citas
+        WHERE paciente_id = %s AND fecha >= CURRENT_DATE
+        ORDER BY fecha, hora
+        LIMIT 1
+    """,
+    "citas_manana": """
+        SELECT c.id AS id_cita, c.fecha, c.hora, c.nota,
+               p.id AS paciente_id, p.nombre, p.telefono, p.telefono_e164
+        FROM citas c
+        JOIN pacientes p ON p.id = c.paciente_id
+        WHERE c.fecha = CURRENT_DATE + INTERVAL '1 day'
+        ORDER BY c.hora
+    """,
+
+    # --- búsqueda en notas (modules/busqueda.py): (texto, límite por fuente × 3, límite total) ---
+    # Cada fuente usa su índice GIN y se corta por rango antes de unir; ts_headline (caro)
+    # solo corre sobre los resultados que se van a mostrar.
+    "buscar_notas": """
+        WITH q AS (SELECT websearch_to_tsquery('public.es_unaccent'::regconfig, %s) AS q),
+        hits AS (
+            (SELECT 'perfil' AS origen, p.id AS paciente_id, NULL::text AS fecha,
+                    -- el mismo texto del que sale pacientes.busqueda (nombre + notas, ver setup_db):
+                    -- si coincidió el nombre, el fragmento lo muestra
+                    coalesce(p.nombre, '') || ' ' || coalesce(p.notas, '') AS texto,
+                    ts_rank_cd(p.busqueda, q.q, 32) AS rango
+             FROM pacientes p, q WHERE p.busqueda @@ q.q
+             ORDER BY rango DESC LIMIT %s)
+            UNION ALL
+            (SELECT 'medicion', m.paciente_id, m.fecha, m.notas, ts_rank_cd(m.busqueda, q.q, 32) AS rango
+             FROM mediciones m, q WHERE m.busqueda @@ q.q
+             ORDER BY rango DESC LIMIT %s)
+            UNION ALL
+            (SELECT 'cita', c.paciente_id, c.fecha::text, c.nota, ts_rank_cd(c.busqueda, q.q, 32) AS rango
+             FROM citas c, q WHERE c.busqueda @@ q.q AND c.paciente_id IS NOT NULL
+             ORDER BY rango DESC LIMIT %s)
+        ), top AS (
+            SELECT * FROM hits ORDER BY rango DESC LIMIT %s
+        )
+        SELECT t.origen, t.paciente_id, p.nombre, t.fecha, round(t.rango::numeric, 4) AS rango,
+               ts_headline('public.es_unaccent'::regconfig, t.texto, q.q,
+                           'StartSel=**, StopSel=**, MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter=" … "')
+                 AS fragmento
+        FROM top t JOIN pacientes p ON p.id = t.paciente_id, q
+        ORDER BY t.rango DESC
+    """,
+
+    # --- mediciones ---
+    "fechas_mediciones": "SELECT fecha FROM mediciones WHERE paciente_id = %s ORDER BY fecha DESC",
+    **{f"{n}_pagina": _pagina(t, c, False) for n, (t, c) in PAGINAS.items()},
+    **{f"{n}_pagina_siguiente": _pagina(t, c, True) for n, (t, c) in PAGINAS.items()},
+}
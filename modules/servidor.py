@@ -0,0 +1,61 @@
+# modules/servidor.py
+"""
+Servidor HTTP lateral (hilo daemon dentro del proceso de Streamlit).
+
+Streamlit no permite registrar rutas propias, así que lo que necesita responder
+con cabeceras HTTP reales (medios con ETag/Range, métricas) se sirve aquí.
+Se activa con SIDE_HTTP_PORT; cada módulo registra su prefijo con `registrar_ruta`.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+
+from modules.config import SIDE_HTTP_PORT
+
+_rutas: dict[str, callable] = {}
+
+
+def registrar_ruta(prefijo: str, handler) -> None:
+    """`handler(req)` recibe el BaseHTTPRequestHandler y escribe la respuesta completa."""
+    _rutas[prefijo] = handler
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "carmen-side/1"
+
+    def _despachar(self):
+        for prefijo in sorted(_rutas, key=len, reverse=True):
+            if self.path.startswith(prefijo):
+                try:
+                    return _rutas[prefijo](self)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                except Exception:
+                    return self.send_error(500)
+        self.send_error(404)
+
+    do_GET = _despachar
+    do_HEAD = _despachar
+
+    def log_message(self, *args):  # sin ruido en los logs de Streamlit
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def iniciar():
+    """Arranca el servidor una vez por proceso. Devuelve el servidor o None si está desactivado."""
+    if not SIDE_HTTP_PORT:
+        return None
+    try:
+        srv = ThreadingHTTPServer(("0.0.0.0", SIDE_HTTP_PORT), _Handler)
+    except OSError:
+        return None  # el puerto ya está tomado (otro proceso de la misma réplica)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, name="servidor-lateral", daemon=True).start()
+    return srv
+
+
+def activo() -> bool:
+    return iniciar() is not None
@@ -0,0 +1,272 @@
+# modules/sincronizacion.py
+"""
+Sincronización incremental con Drive vía el feed de cambios.
+
+Se guarda un cursor (`changes.getStartPageToken`) y en cada pasada se aplican los deltas
+de `changes.list` a `drive_archivos`, copia local del árbol bajo ROOT_FOLDER_ID.
+Con eso:
+- las búsquedas por nombre (carpetas de paciente/cita, índices de fotos, purgas por prefijo)
+  se responden desde la base en vez de con `files.list`;
+- lo que Carmen borra a mano en Drive se nota y se reparan las referencias colgadas
+  (filas de `fotos`, links de PDFs en `mediciones`, ids de carpetas).
+
+Corre en segundo plano cada DRIVE_SYNC_SECONDS mientras el primario está despierto, o por cron:
+    python -m modules.sincronizacion
+"""
+import threading
+from time import monotonic
+
+from modules.config import ROOT_FOLDER_ID, STORAGE_BACKEND, get_conf
+from modules.db import conn, conexion_propia, primario_caliente
+
+SYNC_SEG = int(get_conf("DRIVE_SYNC_SECONDS", "60") or 60)
+CARPETA = "application/vnd.google-apps.folder"
+_LOCK_ID = 38_001  # pg advisory lock: una sola réplica sincroniza a la vez
+_CAMPOS = "id,name,mimeType,parents,trashed,md5Checksum"
+
+_estado = {"ultimo": 0.0, "corriendo": False, "ok": 0.0}
+_lock = threading.Lock()
+
+
+def _q(sql: str, p: tuple = ()):
+    with conn().cursor() as cur:
+        cur.execute(sql, p)
+        return cur.fetchall() if cur.description else None
+
+
+def activa() -> bool:
+    """La copia local es confiable: hay cursor y se sincronizó hace poco en este proceso."""
+    return _estado["ok"] > 0 and monotonic() - _estado["ok"] < SYNC_SEG * 3
+
+
+# --------- escritura local (write-through desde drive.py) ---------
+_SQL_UPSERT = """
+    INSERT INTO drive_archivos (id, nombre, mime, parent_id, md5, actualizado_en)
+    VALUES (%s,%s,%s,%s,%s, now())
+    ON CONFLICT (id) DO UPDATE SET
+      nombre=EXCLUDED.nombre, mime=EXCLUDED.mime, parent_id=EXCLUDED.parent_id,
+      md5=COALESCE(EXCLUDED.md5, drive_archivos.md5), actualizado_en=now()
+"""
+
+
+def _fila(f: dict) -> tuple:
+    return (f["id"], f.get("name"), f.get("mimeType"), (f.get("parents") or [None])[0], f.get("md5Checksum"))
+
+
+def anotar(file_id: str, nombre: str, mime: str, parent_id: str):
+    """Registra al momento un archivo/carpeta que la app acaba de crear en Drive."""
+    try:
+        with conn().cursor() as cur:
+            cur.execute(_SQL_UPSERT, _fila({"id": file_id, "name": nombre, "mimeType": mime, "parents": [parent_id]}))
+    except Exception:
+        pass  # el feed de cambios lo traerá de todos modos
+
+
+def olvidar(ids: list[str]):
+    try:
+        _q("DELETE FROM drive_archivos WHERE id = ANY(%s)", (list(ids),))
+    except Exception:
+        pass
+
+
+# --------- lecturas locales ---------
+def buscar(parent_id: str, nombre: str | None = None, prefijo: str | None = None,
+           contiene: str | None = None, carpetas: bool | None = None) -> list[dict] | None:
+    """
+    Hijos de `parent_id` desde la copia local; None si la copia no está al día
+    (quien llama cae a `files.list`).
+    """
+    if not activa():
+        return None
+    sql, p = "SELECT id, nombre, mime FROM drive_archivos WHERE parent_id=%s", [parent_id]
+    if nombre is not None:
+        sql += " AND nombre=%s"; p.append(nombre)
+    if prefijo is not None:
+        sql += " AND starts_with(nombre, %s)"; p.append(prefijo)
+    if contiene is not None:
+        sql += " AND strpos(nombre, %s) > 0"; p.append(contiene)
+    if carpetas is not None:
+        sql += " AND mime = %s" if carpetas else " AND mime <> %s"; p.append(CARPETA)
+    return [{"id": i, "name": n, "mimeType": m} for i, n, m in _q(sql + " ORDER BY id", tuple(p))]
+
+
+# --------- sincronización ---------
+def _listado_inicial(drv) -> list[dict]:
+    """Recorre el árbol desde ROOT_FOLDER_ID (o todo lo visible si no hay raíz)."""
+    archivos, pendientes = [], [ROOT_FOLDER_ID] if ROOT_FOLDER_ID else [None]
+    while pendientes:
+        padre = pendientes.pop()
+        q = "trashed=false" + (f" and '{padre}' in parents" if padre else "")
+        token = None
+        while True:
+            resp = drv.files().list(
+                q=q, fields=f"nextPageToken, files({_CAMPOS})", pageSize=1000, pageToken=token,
+                supportsAllDrives=True, includeItemsFromAllDrives=True,
+            ).execute()
+            for f in resp.get("files", []):
+                archivos.append(f)
+                if padre and f.get("mimeType") == CARPETA:
+                    pendientes.append(f["id"])
+            token = resp.get("nextPageToken")
+            if not token:
+                break
+    return archivos
+
+
+def _cambios(drv, c, token: str) -> tuple[dict, dict, int, str]:
+    """
+    Recorre `changes.list` desde `token` sin escribir nada: (a guardar, borrados, n, token nuevo).
+    Las consultas a la copia local son lecturas sueltas (autocommit), fuera de transacción.
+    """
+    guardar, borrados, n = {}, {}, 0
+    conocidos: dict[str, bool] = {}
+
+    def _esta(file_id: str) -> bool:
+        if file_id in guardar:
+            return True
+        if file_id not in conocidos:
+            with c.cursor() as cur:
+                cur.execute("SELECT 1 FROM drive_archivos WHERE id=%s", (file_id,))
+                conocidos[file_id] = cur.fetchone() is not None
+        return conocidos[file_id] and file_id not in borrados
+
+    while True:
+        resp = drv.changes().list(
+            pageToken=token, pageSize=1000, spaces="drive",
+            fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({_CAMPOS}))",
+            supportsAllDrives=True, includeItemsFromAllDrives=True,
+        ).execute()
+        for ch in resp.get("changes", []):
+            n += 1
+            f = ch.get("file") or {}
+            if ch.get("removed") or f.get("trashed"):
+                guardar.pop(ch["fileId"], None)
+                borrados[ch["fileId"]] = True
+                continue
+            padre = (f.get("parents") or [None])[0]
+            if ROOT_FOLDER_ID and padre != ROOT_FOLDER_ID and not _esta(padre):
+                # fuera del árbol de la app: si lo teníamos, se movió fuera (= borrado)
+                if _esta(f["id"]):
+                    guardar.pop(f["id"], None)
+                    borrados[f["id"]] = True
+                continue
+            borrados.pop(f["id"], None)
+            guardar[f["id"]] = f
+        if resp.get("newStartPageToken"):
+            return guardar, borrados, n, resp["newStartPageToken"]
+        token = resp["nextPageToken"]
+
+
+def _reparar(cur, borrados: list[str]) -> dict:
+    """Quita de la app las referencias a archivos/carpetas que ya no están en Drive."""
+    if not borrados:
+        return {}
+    res = {}
+    cur.execute("DELETE FROM fotos WHERE drive_file_id = ANY(%s)", (borrados,))
+    res["fotos"] = cur.rowcount
+    for col in ("rutina_pdf", "plan_pdf"):
+        cur.execute(f"""
+            UPDATE mediciones m SET {col} = NULL
+            FROM unnest(%s::text[]) AS b(id)
+            WHERE m.{col} LIKE '%%/d/' || b.id || '%%'
+        """, (borrados,))
+        res[col] = cur.rowcount
+    cur.execute("UPDATE mediciones SET drive_cita_folder_id = NULL WHERE drive_cita_folder_id = ANY(%s)", (borrados,))
+    res["carpetas_cita"] = cur.rowcount
+    cur.execute("UPDATE pacientes SET drive_folder_id = NULL WHERE drive_folder_id = ANY(%s)", (borrados,))
+    res["carpetas_paciente"] = cur.rowcount
+    cur.execute("DELETE FROM archivos WHERE drive_file_id = ANY(%s)", (borrados,))
+    return res
+
+
+def sincronizar() -> dict:
+    """
+    Una pasada: la primera vez lista el árbol completo y guarda el cursor; después solo
+    aplica los cambios. Con conexión propia: el recorrido de Drive va fuera de transacción y
+    al final, en una transacción corta, se aplican los datos, las reparaciones y el cursor.
+    """
+    from modules.drive import _drive_service
+    if STORAGE_BACKEND != "drive":
+        return {}  # el feed de cambios es de Drive; los otros backends no tienen copia local
+    drv = _drive_service()
+    if drv is None:
+        return {}  # sin credenciales de Google no hay nada que sincronizar
+    res = {"cambios": 0, "borrados": 0}
+    with conexion_propia() as c:
+        # candado de sesión: se suelta solo al cerrar la conexión
+        if not c.execute("SELECT pg_try_advisory_lock(%s)", (_LOCK_ID,)).fetchone()[0]:
+            return {"omitido": True}
+        fila = c.execute("SELECT valor FROM drive_estado WHERE clave='page_token'").fetchone()
+        if fila is None:
+            # el cursor se pide ANTES de listar: lo que cambie durante el listado llega en la próxima pasada
+            token = drv.changes().getStartPageToken(supportsAllDrives=True).execute()["startPageToken"]
+            guardar, borrados = _listado_inicial(drv), []
+            res["inicial"] = len(guardar)
+        else:
+            guardar, borrados, res["cambios"], token = _cambios(drv, c, fila[0])
+            guardar, borrados = list(guardar.values()), list(borrados)
+
+        with c.transaction(), c.cursor() as cur:
+            if guardar:
+                cur.executemany(_SQL_UPSERT, [_fila(f) for f in guardar])
+            if borrados:
+                # al borrar una carpeta también desaparece lo que tenía dentro
+                cur.execute("""
+                    WITH RECURSIVE arbol(id) AS (
+                      SELECT unnest(%s::text[])
+                      UNION SELECT d.id FROM drive_archivos d JOIN arbol a ON d.parent_id = a.id
+                    ) SELECT id FROM arbol
+                """, (borrados,))
+                borrados = [r[0] for r in cur.fetchall()]
+                cur.execute("DELETE FROM drive_archivos WHERE id = ANY(%s)", (borrados,))
+                res["borrados"] = len(borrados)
+                res.update(_reparar(cur, borrados))
+                res["_ids"] = borrados
+            cur.execute("""
+                INSERT INTO drive_estado (clave, valor) VALUES ('page_token', %s)
+                ON CONFLICT (clave) DO UPDATE SET valor = EXCLUDED.valor
+            """, (token,))
+
+    _estado["ok"] = monotonic()
+    ids = res.pop("_ids", [])
+    if ids:
+        try:
+            import streamlit as st
+            st.cache_data.clear()
+            from modules import media
+            for i in ids:
+                media.invalidar(i)
+        except Exception:
+            pass
+    return res
+
+
+def sincronizar_async():
+    """Pasada en segundo plano si ya toca y el primario está despierto (no lo mantiene encendido)."""
+    if monotonic() - _estado["ultimo"] < SYNC_SEG or not primario_caliente():
+        return
+    with _lock:
+        if _estado["corriendo"]:
+            return
+        _estado["corriendo"], _estado["ultimo"] = True, monotonic()
+
+    def _run():
+        try:
+            sincronizar()
+        except Exception:
+            pass
+        finally:
+            _estado["corriendo"] = False
+
+    threading.Thread(target=_run, name="drive-sync", daemon=True).start()
+
+
+def main() -> int:
+    res = sincronizar()
+    for k, v in res.items():
+        print(f"{k}: {v}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
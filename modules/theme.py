@@ -1,3 +1,4 @@
+import json
 import streamlit as st
 from pathlib import Path
 
@@ -7,3 +8,29 @@ def apply_theme():
         css = css_path.read_text(encoding="utf-8")
         st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 
+@st.cache_data
+def _manifiesto_static() -> dict:
+    p = Path("static/assets.json")
+    return json.loads(p.read_text(encoding="utf-8")) if p.exists() else {}
+
+@st.cache_data
+def _b64(path: str) -> str:
+    import base64
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+def asset_img(nombre: str, alt: str = "", style: str = "", width: int | None = None) -> str:
+    """
+    <picture> con la variante WebP/PNG de static/ (generada por scripts/optimizar_assets.py).
+    El navegador la descarga una vez y la cachea (?v=hash → caché larga); si no hay
+    variantes generadas, cae al PNG de assets/ en base64 como antes.
+    """
+    m = _manifiesto_static().get(Path(nombre).stem)
+    w = f' width="{width}"' if width else ""
+    if not m:
+        return f'<img src="data:image/png;base64,{_b64(f"assets/{nombre}")}" alt="{alt}"{w} style="{style}">'
+    url = lambda fmt: f'app/static/{m[fmt]["file"]}?v={m[fmt]["hash"]}'
+    return (
+        f'<picture><source type="image/webp" srcset="{url("webp")}">'
+        f'<img src="{url("png")}" alt="{alt}"{w} style="{style}" decoding="async"></picture>'
+    )
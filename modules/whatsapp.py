@@ -0,0 +1,107 @@
+# modules/whatsapp.py
+# Recordatorios de citas por WhatsApp (Meta Cloud API).
+
+from modules.config import WHATSAPP_PHONE_ID, WHATSAPP_TOKEN, WHATSAPP_TEMPLATE, WHATSAPP_LANG
+from modules.db import df_sentencia
+from modules.metricas import medir, contar
+
+def citas_manana():
+    """Citas de mañana (fecha = hoy + 1) con datos de paciente."""
+    return df_sentencia("citas_manana")
+
+def _fmt_fecha_es(v) -> str:
+    import pandas as pd
+    try: return pd.to_datetime(v).strftime("%d/%m/%Y")
+    except Exception: return str(v)
+
+def _fmt_hora_es(v) -> str:
+    import pandas as pd
+    try: return pd.to_datetime(str(v)).strftime("%H:%M")
+    except Exception: return str(v)
+
+def _wa_send_meta(to_e164: str, nombre: str, fecha_txt: str, hora_txt: str):
+    """Envía mensaje por plantilla (WhatsApp Cloud API / Meta) usando variables de Railway."""
+    if not (WHATSAPP_PHONE_ID and WHATSAPP_TOKEN and WHATSAPP_TEMPLATE):
+        raise RuntimeError("Faltan variables de WhatsApp (WHATSAPP_PHONE_ID / WHATSAPP_TOKEN / WHATSAPP_TEMPLATE).")
+
+    url = f"https://graph.facebook.com/v19.0/{WHATSAPP_PHONE_ID}/messages"
+    headers = {
+        "Authorization": f"Bearer {WHATSAPP_TOKEN}",
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "messaging_product": "whatsapp",
+        "to": to_e164,
+        "type": "template",
+        "template": {
+            "name": WHATSAPP_TEMPLATE,
+            "language": {"code": WHATSAPP_LANG or "es_MX"},
+            "components": [
+                {"type": "body", "parameters": [
+                    {"type": "text", "text": nombre or "Paciente"},
+                    {"type": "text", "text": fecha_txt},
+                    {"type": "text", "text": hora_txt},
+                ]}
+            ],
+        },
+    }
+    import requests  # diferido: solo se usa al enviar
+    estado = "error"
+    try:
+        with medir("whatsapp", "messages"):
+            r = requests.post(url, headers=headers, json=payload, timeout=15)
+        estado = str(r.status_code)
+        r.raise_for_status()
+        return r.json()
+    finally:
+        contar("whatsapp_envios_total", estado=estado)
+
+
+def enviar_recordatorios_manana(dry_run: bool = False) -> dict:
+    """
+    Envía (o simula) recordatorios de WhatsApp para TODAS las citas de mañana.
+    Devuelve resumen {"total", "enviados", "fallidos", "detalles":[...]}.
+    """
+    df = citas_manana()
+    res = {"total": int(len(df)), "enviados": 0, "fallidos": 0, "detalles": []}
+    if df.empty:
+        return res
+
+    for _, r in df.iterrows():
+        nombre = (r.get("nombre") or "").strip()
+        tel_raw = (r.get("telefono") or "").strip()
+        # canónico desde la base (columna generada pacientes.telefono_e164): nada que normalizar aquí
+        to = r.get("telefono_e164")
+        to = to if isinstance(to, str) and to else None
+        fecha_txt = _fmt_fecha_es(r["fecha"])
+        hora_txt  = _fmt_hora_es(r["hora"])
+
+        item = {
+            "id_cita": int(r["id_cita"]),
+            "nombre": nombre,
+            "telefono": tel_raw,
+            "to_e164": to or "",
+            "fecha": fecha_txt,
+            "hora": hora_txt,
+            "ok": False,
+            "error": "",
+        }
+
+        if not to:
+            item["error"] = "Teléfono inválido/no E.164"
+            res["fallidos"] += 1
+            res["detalles"].append(item)
+            continue
+
+        try:
+            if not dry_run:
+                _wa_send_meta(to, nombre, fecha_txt, hora_txt)
+            item["ok"] = True
+            res["enviados"] += 1
+        except Exception as e:
+            item["error"] = str(e)
+            res["fallidos"] += 1
+
+        res["detalles"].append(item)
+
+    return res
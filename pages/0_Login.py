@@ -1,20 +1,14 @@
 # pages/0_Login.py
 import streamlit as st
 from modules.core import is_admin_ok, login_paciente, registrar_paciente, normalize_tel
-import base64
+from modules.seguridad import ServicioOcupado
+from modules.theme import asset_img
 from urllib.parse import quote_plus
 
-@st.cache_data
-def load_b64(path: str) -> str:
-    with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode()
-
-logo_base64 = load_b64("assets/Logo.png")
-
 st.markdown(
     f"""
     <div style="text-align: center;">
-        <img src="data:image/png;base64,{logo_base64}" width="300">
+        {asset_img("Logo.png", alt="Carmen Coach", width=300)}
         <p>Bienvenida/o. Elige cómo quieres entrar.</p>
     </div>
     """,
@@ -59,7 +53,13 @@ with tab_pac:
             pw_login  = st.text_input("Contraseña", type="password", key="pac_pw_login")
             enviar_login = st.form_submit_button("Entrar")
         if enviar_login:
-            user = login_paciente(tel_login, pw_login)
+            try:
+                user = login_paciente(tel_login, pw_login)
+            except (ValueError, ServicioOcupado) as e:
+                st.error(str(e)); st.stop()
+            except Exception:
+                # sin detalles del error (conexión, pool) para quien no inició sesión
+                st.error("No se pudo iniciar sesión en este momento. Intenta de nuevo en un momento."); st.stop()
             if user:
                 st.session_state.role = "paciente"
                 st.session_state.paciente = user
@@ -96,13 +96,13 @@ with tab_pac:
                         st.switch_page("pages/1_Paciente_Dashboard.py")
                     except Exception:
                         st.success("Registro ok ✅"); st.rerun()
-                except Exception as e:
+                except (ValueError, ServicioOcupado) as e:
                     st.error(f"No se pudo registrar: {e}")
+                except Exception:
+                    st.error("No se pudo registrar en este momento. Intenta de nuevo en un momento.")
 
-# Base64 de iconos (si ya tienes load_b64 arriba, esto va perfecto)
-ig_b64 = load_b64("assets/ig.png")
-ttk_b64 = load_b64("assets/tiktok.png")
-wa_b64 = load_b64("assets/wa.png")
+# Iconos servidos como estáticos cacheables (ver modules/theme.asset_img)
+ICON_STYLE = "width:120px; border-radius:12px; display:block; margin:0 auto; cursor:pointer;"
 
 # Links
 IG_URL = "https://www.instagram.com/carmen._ochoa?igsh=dnd2aGt5a25xYTg0"
@@ -125,9 +125,7 @@ with tab_social:
             st.markdown(
                 f"""
                     <a href="{IG_URL}" target="_blank" rel="noopener">
-                      <img src="data:image/png;base64,{ig_b64}"
-                           alt="Instagram"
-                           style="width:120px; border-radius:12px; display:block; margin:0 auto; cursor:pointer;">
+                      {asset_img("ig.png", alt="Instagram", style=ICON_STYLE)}
                     </a>
                     """,
                 unsafe_allow_html=True,
@@ -136,9 +134,7 @@ with tab_social:
             st.markdown(
                 f"""
                     <a href="{TTK_PROFILE_URL}" target="_blank" rel="noopener">
-                      <img src="data:image/png;base64,{ttk_b64}"
-                           alt="TikTok"
-                           style="width:120px; border-radius:12px; display:block; margin:0 auto; cursor:pointer;">
+                      {asset_img("tiktok.png", alt="TikTok", style=ICON_STYLE)}
                     </a>
                     """,
                 unsafe_allow_html=True,
@@ -147,9 +143,7 @@ with tab_social:
             st.markdown(
                 f"""
                     <a href="{wa_link}" target="_blank" rel="noopener">
-                      <img src="data:image/png;base64,{wa_b64}"
-                           alt="WhatsApp"
-                           style="width:120px; border-radius:12px; display:block; margin:0 auto; cursor:pointer;">
+                      {asset_img("wa.png", alt="WhatsApp", style=ICON_STYLE)}
                     </a>
                     """,
                 unsafe_allow_html=True,
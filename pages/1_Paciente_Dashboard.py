@@ -2,9 +2,10 @@
 import streamlit as st
 from datetime import date, datetime, timedelta
 from modules.core import (
-    generar_slots, slots_ocupados, agendar_cita_autenticado,
-    df_sql, to_drive_preview,
-    drive_image_view_url, drive_image_download_url)
+    generar_slots, slots_ocupados, agendar_cita_autenticado, AGENDA_REFRESCO_SEG, escucha_avisos_activa,
+    df_sentencia,
+    mostrar_foto, boton_descarga, boton_pdf, vista_previa_pdf,
+    mediciones_pagina, pdfs_pagina, fotos_pagina, paginas_acumuladas, boton_cargar_mas)
 import pandas as pd
 from modules.core import cambiar_password_paciente
 import re
@@ -27,16 +28,7 @@ st.caption("Elige qué quieres hacer")
 # =========================
 # 🗓️ Mi próxima cita (NUEVO)
 # =========================
-prox = df_sql(
-    """
-    SELECT fecha, hora, nota
-    FROM citas
-    WHERE paciente_id=%s AND fecha >= CURRENT_DATE
-    ORDER BY fecha, hora
-    LIMIT 1
-    """,
-    (pid,),
-)
+prox = df_sentencia("proxima_cita", (pid,))
 
 st.subheader("🗓️ Mi próxima cita")
 if prox.empty:
@@ -67,7 +59,10 @@ c1, c2 = st.columns(2)
 
 with c1:
     st.subheader("📅 Agendar cita")
-    with st.expander("Abrir agendador", expanded=False):
+    # Fragmento: con la escucha de avisos activa se re-dibuja solo cada AGENDA_REFRESCO_SEG;
+    # slots_ocupados sale de caché hasta que llega un aviso de ese día, así que no cuesta consultas.
+    @st.fragment(run_every=AGENDA_REFRESCO_SEG if (AGENDA_REFRESCO_SEG and escucha_avisos_activa()) else None)
+    def _agendador():
         min_day = date.today() + timedelta(days=2)
         fecha = st.date_input("Día (a partir del tercer día)", value=min_day, min_value=min_day)
         libres = [t for t in generar_slots(fecha) if t not in slots_ocupados(fecha)]
@@ -83,11 +78,11 @@ with c1:
             except Exception as e:
                 st.error(str(e))
 
+    with st.expander("Abrir agendador", expanded=False):
+        _agendador()
+
     with st.expander("Ver mis fotos", expanded=False):
-        gal = df_sql(
-            "SELECT fecha, drive_file_id, filename FROM fotos WHERE paciente_id=%s ORDER BY fecha DESC",
-            (pid,),
-        )
+        gal, gal_mas = paginas_acumuladas(f"pac_fotos_pag_{pid}", fotos_pagina, pid, limit=24)
         if gal.empty:
             st.info("Aún no tienes fotos.")
         else:
@@ -107,18 +102,14 @@ with c1:
                         fid = (r.get("drive_file_id") or "").strip()
                         if not fid:
                             continue
-                        img_url = drive_image_view_url(fid)
-                        dl_url  = drive_image_download_url(fid)
-                        st.markdown(
-                            f'<div style="background:#111;border-radius:12px;overflow:hidden;display:flex;justify-content:center;"><img src="{img_url}" style="height:220px;object-fit:contain;"></div>',
-                            unsafe_allow_html=True,
-                        )
-                        st.link_button("⬇️ Descargar", dl_url)
+                        mostrar_foto(fid)
+                        boton_descarga(fid, "⬇️ Descargar", key=f"pac_dl_{r['id']}")
+        boton_cargar_mas(f"pac_fotos_pag_{pid}", gal_mas)
 
 with c2:
     st.subheader("🧾 Mis datos y archivos")
     with st.expander("Ver mis datos", expanded=False):
-        d = df_sql("SELECT * FROM pacientes WHERE id=%s", (pid,))
+        d = df_sentencia("paciente_por_id", (pid,))
         if not d.empty:
             r = d.iloc[0]
             st.write("**Nombre**:", r.get("nombre","—"))
@@ -165,44 +156,44 @@ with c2:
                 _dlg_cambiar_pw()
 
     with st.expander("Ver mis PDFs", expanded=False):
-        citas = df_sql("SELECT fecha, rutina_pdf, plan_pdf FROM mediciones WHERE paciente_id=%s ORDER BY fecha DESC", (pid,))
+        citas, pdfs_mas = paginas_acumuladas(f"pac_pdfs_pag_{pid}", pdfs_pagina, pid)
         if citas.empty: st.info("Aún no tienes PDFs.")
         else:
             fecha_sel = st.selectbox("Fecha", citas["fecha"].tolist())
             row = citas[citas["fecha"] == fecha_sel].iloc[0]
             rpdf, ppdf = (row["rutina_pdf"] or "").strip(), (row["plan_pdf"] or "").strip()
             cL, cR = st.columns(2)
-            with cL: st.link_button("Abrir Rutina (PDF)", rpdf, disabled=(not bool(rpdf)))
-            with cR: st.link_button("Abrir Plan (PDF)", ppdf, disabled=(not bool(ppdf)))
-            with st.expander("Vista previa"):
-                if rpdf: st.components.v1.iframe(to_drive_preview(rpdf), height=360)
-                if ppdf: st.components.v1.iframe(to_drive_preview(ppdf), height=360)
+            with cL:
+                boton_pdf(rpdf, "Abrir Rutina (PDF)", key=f"pac_rpdf_{pid}_{fecha_sel}")
+                if rpdf: vista_previa_pdf(rpdf, key=f"pac_rpdf_{pid}_{fecha_sel}")
+            with cR:
+                boton_pdf(ppdf, "Abrir Plan (PDF)", key=f"pac_ppdf_{pid}_{fecha_sel}")
+                if ppdf: vista_previa_pdf(ppdf, key=f"pac_ppdf_{pid}_{fecha_sel}")
+            boton_cargar_mas(f"pac_pdfs_pag_{pid}", pdfs_mas)
 
 st.subheader("📏 Mis mediciones")
 
-meds = df_sql("""
-    SELECT fecha,
-           peso_kg AS "Peso (kg)",
-           grasa_pct AS "Grasa",
-           musculo_pct AS "Músculo",
-           brazo_rest AS "Brazo reposo (cm)",
-           brazo_flex AS "Brazo flex (cm)",
-           pecho_rest AS "Pecho reposo (cm)",
-           pecho_flex AS "Pecho flex (cm)",
-           cintura_cm AS "Cintura (cm)",
-           cadera_cm AS "Cadera (cm)",
-           pierna_cm AS "Pierna (cm)",
-           pantorrilla_cm AS "Pantorrilla (cm)",
-           notas AS "Notas"
-    FROM mediciones
-    WHERE paciente_id=%s
-    ORDER BY fecha DESC
-""", (pid,))
+meds, meds_mas = paginas_acumuladas(f"pac_meds_pag_{pid}", mediciones_pagina, pid)
+meds = meds.rename(columns={
+    "peso_kg": "Peso (kg)",
+    "grasa_pct": "Grasa",
+    "musculo_pct": "Músculo",
+    "brazo_rest": "Brazo reposo (cm)",
+    "brazo_flex": "Brazo flex (cm)",
+    "pecho_rest": "Pecho reposo (cm)",
+    "pecho_flex": "Pecho flex (cm)",
+    "cintura_cm": "Cintura (cm)",
+    "cadera_cm": "Cadera (cm)",
+    "pierna_cm": "Pierna (cm)",
+    "pantorrilla_cm": "Pantorrilla (cm)",
+    "notas": "Notas",
+})
 
 if meds.empty:
     st.info("Aún no tienes mediciones registradas.")
 else:
     st.dataframe(meds, use_container_width=True, hide_index=True)
+    boton_cargar_mas(f"pac_meds_pag_{pid}", meds_mas)
 
 st.divider()
 if st.button("🚪 Cerrar sesión"):
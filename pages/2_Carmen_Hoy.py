@@ -1,6 +1,7 @@
 # pages/2_Carmen_Hoy.py
 import streamlit as st
-from modules.core import df_sql
+from datetime import date
+from modules.core import agenda_rango, grid_ocupacion
 
 
 st.set_page_config(page_title="Carmen — Hoy", page_icon="📅", layout="wide")
@@ -12,32 +13,31 @@ if st.session_state.get("role") != "admin":
 
 st.title("📅 Próximas citas")
 
-# Hoy
-d1 = df_sql("""
-    SELECT c.fecha, c.hora, p.nombre, p.telefono, c.nota
-    FROM citas c LEFT JOIN pacientes p ON p.id=c.paciente_id
-    WHERE c.fecha = CURRENT_DATE
-    ORDER BY c.hora
-""")
+# Una sola consulta (cacheada) para hoy + los siguientes 7 días
+hoy = date.today()
+agenda = agenda_rango(hoy, 8)
+cols = ["fecha", "hora", "nombre", "telefono", "nota"]
+ocupadas = agenda[agenda["ocupado"]]
+
+d1 = ocupadas[ocupadas["fecha"] == hoy][cols].reset_index(drop=True)
 st.subheader("Hoy")
 if not d1.empty:
     st.dataframe(d1, use_container_width=True)
 else:
     st.info("Sin citas hoy.")
 
-# Siguientes 7 días
-d7 = df_sql("""
-    SELECT c.fecha, c.hora, p.nombre, p.telefono, c.nota
-    FROM citas c LEFT JOIN pacientes p ON p.id=c.paciente_id
-    WHERE c.fecha BETWEEN CURRENT_DATE AND CURRENT_DATE + INTERVAL '7 days'
-    ORDER BY c.fecha, c.hora
-""")
+d7 = ocupadas[cols].reset_index(drop=True)
 st.subheader("Próxima semana")
 if not d7.empty:
     st.dataframe(d7, use_container_width=True)
 else:
     st.info("Sin citas en la semana.")
 
+with st.expander("📆 Ocupación de la semana (horas × días)", expanded=False):
+    grid = grid_ocupacion(agenda)
+    if grid.empty: st.info("Sin horarios en la semana.")
+    else: st.dataframe(grid, use_container_width=True)
+
 st.divider()
 
 # Atajos opcionales a otras páginas (si quieres; o confía en el sidebar)
@@ -3,13 +3,17 @@ import streamlit as st
 from datetime import date
 from pathlib import Path                      # <- lo necesitas más abajo para PDFs
 from modules.core import (
-    df_sql, exec_sql, upsert_medicion, asociar_medicion_a_cita,
-    upload_pdf_to_folder, upload_image_to_folder, enforce_patient_pdf_quota, ensure_cita_folder, drive_image_view_url, drive_image_download_url,
-    delete_foto, delete_medicion_dia, _siguiente_indice_foto, _purge_drive_files_with_prefix,             # <- IMPORTANTE
+    df_sql, df_sentencia, exec_sql, upsert_medicion, asociar_medicion_a_cita,
+    upload_pdf_to_folder, enforce_patient_pdf_quota, ensure_cita_folder,
+    mostrar_foto, boton_descarga, boton_pdf, vista_previa_pdf,
+    delete_foto, delete_medicion_dia, subir_fotos, _purge_drive_files_with_prefix,             # <- IMPORTANTE
+    mediciones_pagina, pdfs_pagina, fotos_pagina, paginas_acumuladas, boton_cargar_mas,
+    buscar_notas,
 )
 import pandas as pd
 import re
-from modules.core import registrar_paciente_admin
+from modules.core import registrar_paciente_admin, normalize_tel
+from psycopg import errors as pg_errors
 import random
 from modules.core import delete_paciente
 
@@ -80,14 +84,96 @@ with colL:
 
 
 
+# ===== Importación masiva (Excel/CSV) =====
+with st.expander("📥 Importar pacientes / mediciones (Excel o CSV)", expanded=False):
+    st.caption(
+        "Columnas: nombre, telefono (obligatorias); fecha_nac, correo, notas_paciente; "
+        "y para mediciones: fecha, peso_kg, grasa_pct, musculo_pct, brazo_rest, brazo_flex, "
+        "pecho_rest, pecho_flex, cintura_cm, cadera_cm, pierna_cm, pantorrilla_cm, notas."
+    )
+    up_imp = st.file_uploader("Archivo", type=["xlsx", "csv"], key="imp_archivo")
+    if up_imp and st.button("⬆️ Importar", key="imp_btn"):
+        from modules.importacion import importar_archivo
+        try:
+            with st.spinner("Importando…"):
+                res_imp = importar_archivo(up_imp.name, up_imp)
+            st.success(
+                f"Filas: {res_imp['filas']} • Válidas: {res_imp['validas']} • "
+                f"Pacientes: {res_imp['pacientes']} • Mediciones: {res_imp['mediciones']}"
+            )
+            if res_imp["errores"]:
+                st.warning(f"Filas con error: {len(res_imp['errores'])}")
+                st.dataframe(pd.DataFrame(res_imp["errores"]), use_container_width=True, hide_index=True)
+        except Exception as e:
+            st.error(f"No se pudo importar: {e}")
+
+# ===== Exportación (respaldo / análisis) =====
+with st.expander("📤 Exportar datos (Excel / CSV / Parquet)", expanded=False):
+    from modules.exportacion import (
+        EXPORTABLES, archivo_temporal, borrar_temporal, exportar, formatos_disponibles, nombre_archivo,
+    )
+    from modules.core import conexion_propia
+    tablas_exp = st.multiselect("Tablas", list(EXPORTABLES), default=list(EXPORTABLES), key="exp_tablas")
+    formato_exp = st.radio("Formato", formatos_disponibles(), horizontal=True, key="exp_formato")
+
+    def _exp_descargado():
+        borrar_temporal(st.session_state.pop("_exp_archivo", (None,))[0])
+
+    if tablas_exp and st.button("⚙️ Generar archivo", key="exp_btn"):
+        _exp_descargado()  # el archivo anterior (datos personales) no se queda en disco
+        ruta_exp = archivo_temporal(Path(nombre_archivo(tablas_exp, formato_exp)).suffix)
+        try:
+            with st.spinner("Exportando…"):
+                # se escribe a disco por lotes; solo el archivo final se entrega al navegador.
+                # Conexión propia: la transacción del cursor dura toda la exportación.
+                with conexion_propia() as c_exp:
+                    res_exp = exportar(c_exp, tablas_exp, formato_exp, ruta_exp)
+            st.session_state["_exp_archivo"] = (ruta_exp, nombre_archivo(tablas_exp, formato_exp))
+            st.caption(" • ".join(f"{t}: {n} filas" for t, n in res_exp.items()))
+        except Exception as e:
+            borrar_temporal(ruta_exp)
+            st.error(f"No se pudo exportar: {e}")
+    if st.session_state.get("_exp_archivo"):
+        ruta_exp, nombre_exp = st.session_state["_exp_archivo"]
+        if Path(ruta_exp).exists():
+            with open(ruta_exp, "rb") as fh_exp:
+                st.download_button("⬇️ Descargar", fh_exp, file_name=nombre_exp, key="exp_dl",
+                                   on_click=_exp_descargado)
+        else:
+            st.session_state.pop("_exp_archivo", None)  # ya lo barrió la purga
+
 # Buscar paciente
 with st.form("buscar_paciente"):
     q = st.text_input("Buscar por nombre")
     ok = st.form_submit_button("Buscar")
 if ok:
-    st.session_state["bus_pac_df"] = df_sql(
-        "SELECT id, nombre FROM pacientes WHERE nombre ILIKE %s ORDER BY nombre", (f"%{q.strip()}%",)
-    )
+    st.session_state["bus_pac_df"] = df_sentencia("buscar_pacientes", (f"%{q.strip()}%",))
+
+# Buscar en notas (perfil, mediciones, citas): texto completo, por relevancia
+with st.expander("🔎 Buscar en notas", expanded=False):
+    with st.form("buscar_notas"):
+        q_notas = st.text_input("Palabras, \"frase exacta\", or, -excluir", key="fts_q")
+        ok_notas = st.form_submit_button("Buscar en notas")
+    if ok_notas:
+        try:
+            st.session_state["fts_res"] = buscar_notas(q_notas)
+        except Exception as e:
+            st.error(f"No se pudo buscar: {e}")
+    res_notas = st.session_state.get("fts_res")
+    if isinstance(res_notas, pd.DataFrame):
+        if res_notas.empty:
+            st.caption("Sin resultados.")
+        etiquetas = {"perfil": "🧾 Perfil", "medicion": "📏 Medición", "cita": "🗓️ Cita"}
+        for i, r in res_notas.iterrows():
+            cA, cB = st.columns([6, 1])
+            with cA:
+                fecha_txt = f" · {r['fecha']}" if isinstance(r["fecha"], str) and r["fecha"] else ""
+                st.markdown(f"**{r['nombre']}** — {etiquetas.get(r['origen'], r['origen'])}{fecha_txt}")
+                st.caption(r["fragmento"] or "(coincide el nombre)")
+            with cB:
+                if st.button("Abrir", key=f"fts_abrir_{i}"):
+                    st.session_state["bus_pac_df"] = pd.DataFrame([{"id": int(r["paciente_id"]), "nombre": r["nombre"]}])
+                    st.rerun()
 
 lista = st.session_state.get("bus_pac_df")
 
@@ -107,7 +193,7 @@ tab_info, tab_medidas, tab_pdfs, tab_fotos = st.tabs(["🧾 Perfil", "📏 Medic
 
 # ---- PERFIL ----
 with tab_info:
-    datos = df_sql("SELECT * FROM pacientes WHERE id=%s", (pid,))
+    datos = df_sentencia("paciente_por_id", (pid,))
     if datos.empty:
         st.info("Paciente no encontrado.")
     else:
@@ -120,12 +206,16 @@ with tab_info:
             notas = st.text_area("Notas", row["notas"] or "")
             guardar = st.form_submit_button("Guardar cambios")
         if guardar:
-            exec_sql("""
-                UPDATE pacientes
-                SET nombre=%s, fecha_nac=%s, telefono=%s, correo=%s, notas=%s
-                WHERE id=%s
-            """, (nombre.strip(), fnac.strip() or None, tel.strip() or None, mail.strip() or None, notas.strip() or None, pid))
-            st.success("Perfil actualizado ✅"); st.rerun()
+            try:
+                exec_sql("""
+                    UPDATE pacientes
+                    SET nombre=%s, fecha_nac=%s, telefono=%s, correo=%s, notas=%s
+                    WHERE id=%s
+                """, (nombre.strip(), fnac.strip() or None, normalize_tel(tel) or None, mail.strip() or None, notas.strip() or None, pid))
+            except pg_errors.UniqueViolation:
+                st.error("Ese teléfono ya pertenece a otro paciente (aunque esté escrito distinto, p.ej. con o sin +52).")
+            else:
+                st.success("Perfil actualizado ✅"); st.rerun()
 
 # ---- MEDICIONES ----
 with tab_medidas:
@@ -164,23 +254,22 @@ with tab_medidas:
             except Exception: pass
             st.success("Medición guardada ✅"); st.rerun()
 
-    hist = df_sql("""
-        SELECT fecha,
-               peso_kg AS peso_KG, grasa_pct AS grasa, musculo_pct AS musculo,
-               brazo_rest AS brazo_rest_CM, brazo_flex AS brazo_flex_CM,
-               pecho_rest AS pecho_rest_CM, pecho_flex AS pecho_flex_CM,
-               cintura_cm AS cintura_CM, cadera_cm AS cadera_CM,
-               pierna_cm AS pierna_CM, pantorrilla_cm AS pantorrilla_CM,
-               notas
-        FROM mediciones WHERE paciente_id=%s
-        ORDER BY fecha DESC
-    """, (pid,))
+    hist, hist_mas = paginas_acumuladas(f"adm_meds_pag_{pid}", mediciones_pagina, pid)
+    hist = hist.rename(columns={
+        "peso_kg": "peso_KG", "grasa_pct": "grasa", "musculo_pct": "musculo",
+        "brazo_rest": "brazo_rest_CM", "brazo_flex": "brazo_flex_CM",
+        "pecho_rest": "pecho_rest_CM", "pecho_flex": "pecho_flex_CM",
+        "cintura_cm": "cintura_CM", "cadera_cm": "cadera_CM",
+        "pierna_cm": "pierna_CM", "pantorrilla_cm": "pantorrilla_CM",
+    })
     if hist.empty: st.info("Sin mediciones aún.")
-    else: st.dataframe(hist, use_container_width=True, hide_index=True)
+    else:
+        st.dataframe(hist, use_container_width=True, hide_index=True)
+        boton_cargar_mas(f"adm_meds_pag_{pid}", hist_mas)
 
     st.divider()
     st.markdown("### 🗑️ Eliminar medición de un día")
-    fechas_disp = df_sql("SELECT fecha FROM mediciones WHERE paciente_id=%s ORDER BY fecha DESC", (pid,))
+    fechas_disp = df_sentencia("fechas_mediciones", (pid,))
     if fechas_disp.empty:
         st.caption("No hay días con mediciones.")
     else:
@@ -194,9 +283,16 @@ with tab_medidas:
             opt_del_cita = st.checkbox("Eliminar cita del día", value=False)
         confirm = st.checkbox("Confirmo que deseo eliminar esa medición")
         if st.button("🗑️ Eliminar medición del día", disabled=not confirm):
-            delete_medicion_dia(pid, str(fecha_del), remove_drive_folder=opt_rm_drive,
-                                send_to_trash=opt_trash, delete_cita_row=opt_del_cita)
-            st.success(f"Medición del {fecha_del} eliminada ✅"); st.rerun()
+            fallidos_del = delete_medicion_dia(pid, str(fecha_del), remove_drive_folder=opt_rm_drive,
+                                               send_to_trash=opt_trash, delete_cita_row=opt_del_cita)
+            if fallidos_del:
+                # ya no están en la base: sin esta lista quedarían huérfanos en Drive
+                st.warning(
+                    f"Medición del {fecha_del} eliminada, pero {len(fallidos_del)} archivo(s) no se pudieron "
+                    "borrar de Drive. Bórralos a mano (ids): " + ", ".join(fallidos_del)
+                )
+            else:
+                st.success(f"Medición del {fecha_del} eliminada ✅"); st.rerun()
 
 # ---- PDFs ----
 with tab_pdfs:
@@ -211,17 +307,19 @@ with tab_pdfs:
             try:
                 cita_folder = ensure_cita_folder(pid, fecha_pdf.strip())
 
-                # (opcional) borrar anteriores con ese prefijo
-                _purge_drive_files_with_prefix(cita_folder, f"{fecha_pdf.strip()}_rutina")
-
                 ext = Path(up_rutina.name).suffix or ".pdf"
                 target = f"{fecha_pdf.strip()}_rutina{ext}"
 
-                pdf = upload_pdf_to_folder(up_rutina.read(), target, cita_folder)  # <= sigue usando tu función
+                # si ya se subió este mismo PDF para el paciente, no se vuelve a transferir
+                pdf = upload_pdf_to_folder(up_rutina.getvalue(), target, cita_folder, pid=pid)
+
                 upsert_medicion(pid, fecha_pdf.strip(), rutina_pdf=pdf["webViewLink"], plan_pdf=None)
+                # (opcional) borrar anteriores con ese prefijo (menos el recién subido/reutilizado);
+                # después del upsert: la purga respeta lo que otra columna todavía referencia
+                _purge_drive_files_with_prefix(cita_folder, f"{fecha_pdf.strip()}_rutina", conservar=pdf["id"])
 
                 # (opcional) cuota, como ya lo hacías:
-                pf = df_sql("SELECT drive_folder_id FROM pacientes WHERE id=%s", (pid,))
+                pf = df_sentencia("paciente_carpeta", (pid,))
                 if not pf.empty and (pf.loc[0, "drive_folder_id"] or "").strip():
                     enforce_patient_pdf_quota(pf.loc[0, "drive_folder_id"].strip(), keep=10, send_to_trash=True)
 
@@ -237,16 +335,18 @@ with tab_pdfs:
             try:
                 cita_folder = ensure_cita_folder(pid, fecha_pdf.strip())
 
-                # (opcional) borrar anteriores con ese prefijo
-                _purge_drive_files_with_prefix(cita_folder, f"{fecha_pdf.strip()}_plan")
-
                 ext = Path(up_plan.name).suffix or ".pdf"
                 target = f"{fecha_pdf.strip()}_plan{ext}"
 
-                pdf = upload_pdf_to_folder(up_plan.read(), target, cita_folder)  # <= sigue usando tu función
+                # si ya se subió este mismo PDF para el paciente, no se vuelve a transferir
+                pdf = upload_pdf_to_folder(up_plan.getvalue(), target, cita_folder, pid=pid)
+
                 upsert_medicion(pid, fecha_pdf.strip(), rutina_pdf=None, plan_pdf=pdf["webViewLink"])
+                # (opcional) borrar anteriores con ese prefijo (menos el recién subido/reutilizado);
+                # después del upsert: la purga respeta lo que otra columna todavía referencia
+                _purge_drive_files_with_prefix(cita_folder, f"{fecha_pdf.strip()}_plan", conservar=pdf["id"])
 
-                pf = df_sql("SELECT drive_folder_id FROM pacientes WHERE id=%s", (pid,))
+                pf = df_sentencia("paciente_carpeta", (pid,))
                 if not pf.empty and (pf.loc[0, "drive_folder_id"] or "").strip():
                     enforce_patient_pdf_quota(pf.loc[0, "drive_folder_id"].strip(), keep=10, send_to_trash=True)
 
@@ -257,7 +357,7 @@ with tab_pdfs:
 
 
     st.divider()
-    citas = df_sql("SELECT fecha, rutina_pdf, plan_pdf FROM mediciones WHERE paciente_id=%s ORDER BY fecha DESC", (pid,))
+    citas, pdfs_mas = paginas_acumuladas(f"adm_pdfs_pag_{pid}", pdfs_pagina, pid)
     if citas.empty:
         st.info("Este paciente aún no tiene PDFs.")
     else:
@@ -265,12 +365,13 @@ with tab_pdfs:
         actual = citas.loc[citas["fecha"] == fecha_sel].iloc[0]
         r, p = (actual["rutina_pdf"] or "").strip(), (actual["plan_pdf"] or "").strip()
         cl, cr = st.columns(2)
-        with cl: st.link_button("🔗 Abrir Rutina (PDF)", r, disabled=(not bool(r)))
-        with cr: st.link_button("🔗 Abrir Plan (PDF)", p, disabled=(not bool(p)))
-        with st.expander("👁️ Vista previa (Drive)"):
-            from modules.core import to_drive_preview
-            if r: st.components.v1.iframe(to_drive_preview(r), height=360)
-            if p: st.components.v1.iframe(to_drive_preview(p), height=360)
+        with cl:
+            boton_pdf(r, "🔗 Abrir Rutina (PDF)", key=f"adm_rpdf_{pid}_{fecha_sel}")
+            if r: vista_previa_pdf(r, key=f"adm_rpdf_{pid}_{fecha_sel}")
+        with cr:
+            boton_pdf(p, "🔗 Abrir Plan (PDF)", key=f"adm_ppdf_{pid}_{fecha_sel}")
+            if p: vista_previa_pdf(p, key=f"adm_ppdf_{pid}_{fecha_sel}")
+        boton_cargar_mas(f"adm_pdfs_pag_{pid}", pdfs_mas)
 
 # ---- FOTOS ----
 with tab_fotos:
@@ -284,42 +385,15 @@ with tab_fotos:
             if not up_imgs:
                 st.warning("Selecciona al menos una imagen.")
             else:
-                folder_id = ensure_cita_folder(pid, fecha_f.strip())
-
-                try:
-                    idx = _siguiente_indice_foto(folder_id, fecha_f.strip())
-                except Exception:
-                    idx = 1
-
-                ok, fails = 0, 0
-                for fimg in up_imgs:
-                    try:
-                        ext = Path(fimg.name).suffix.lower() or ".jpg"
-                        if ext not in {".jpg", ".jpeg", ".png", ".webp"}:
-                            ext = ".jpg"
-                        mime = fimg.type or "image/jpeg"
-
-                        target_name = f"{fecha_f.strip()}_foto_{idx:02d}{ext}"
-                        idx += 1
-
-                        # <= SIGUE usando tu función
-                        f = upload_image_to_folder(fimg.read(), target_name, folder_id, mime)
-
-                        exec_sql("""
-                                 INSERT INTO fotos (paciente_id, fecha, drive_file_id, web_view_link, filename)
-                                 VALUES (%s, %s, %s, %s, %s)
-                                 """, (pid, fecha_f.strip(), f["id"], f.get("webViewLink", ""), target_name))
-                        ok += 1
-                    except Exception as e:
-                        fails += 1
-                        st.info(f"Error subiendo {getattr(fimg, 'name', 'foto')}: {e}")
-
-                asociar_medicion_a_cita(pid, fecha_f.strip())
-                if ok: st.success(f"Fotos subidas: {ok} ✅")
-                if fails: st.warning(f"Fallaron: {fails}")
+                res = subir_fotos(pid, fecha_f.strip(), up_imgs)
+                for err in res["errores"]:
+                    st.info(err)
+                if res["subidas"]: st.success(f"Fotos subidas: {res['subidas']} ✅")
+                if res["repetidas"]: st.info(f"Omitidas por repetidas: {res['repetidas']}")
+                if res["fallidas"]: st.warning(f"Fallaron: {res['fallidas']}")
                 st.rerun()
 
-    gal = df_sql("SELECT id, fecha, drive_file_id FROM fotos WHERE paciente_id=%s ORDER BY fecha DESC", (pid,))
+    gal, gal_mas = paginas_acumuladas(f"adm_fotos_pag_{pid}", fotos_pagina, pid, limit=24)
     if gal.empty:
         st.info("Sin fotos aún.")
     else:
@@ -333,11 +407,10 @@ with tab_fotos:
                 cols = st.columns(4, gap="medium")
                 for i, r in enumerate(fila4):
                     with cols[i]:
-                        img_url = drive_image_view_url(r["drive_file_id"]) if r.get("drive_file_id") else ""
-                        dl_url = drive_image_download_url(r["drive_file_id"]) if r.get("drive_file_id") else None
-                        st.markdown(f'<div style="background:#111;border-radius:12px;overflow:hidden;display:flex;justify-content:center;"><img src="{img_url}" style="height:220px;object-fit:contain;"></div>', unsafe_allow_html=True)
-                        if dl_url:
-                            st.link_button("⬇️ Descargar", dl_url)
+                        fid = (r.get("drive_file_id") or "").strip()
+                        if fid:
+                            mostrar_foto(fid)
+                            boton_descarga(fid, "⬇️ Descargar", key=f"adm_dl_{r['id']}")
                         if st.button("🗑️ Eliminar", key=f"del_foto_{pid}_{r['id']}"):
                             st.session_state["_delete_photo_id"] = int(r["id"])
             if "_delete_photo_id" in st.session_state:
@@ -356,6 +429,7 @@ with tab_fotos:
                             st.info("Operación cancelada")
                 _confirm_delete_dialog()
                 break
+        boton_cargar_mas(f"adm_fotos_pag_{pid}", gal_mas)
 
 st.divider()
 st.markdown("### ⚠️ Zona de peligro")
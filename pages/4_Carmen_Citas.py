@@ -1,11 +1,11 @@
 # pages/4_Carmen_Citas.py
 import streamlit as st
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 import pandas as pd
 
 from modules.core import (
-    generar_slots, citas_por_dia, crear_o_encontrar_paciente, exec_sql,
-    actualizar_cita, eliminar_cita
+    generar_slots, crear_o_encontrar_paciente, exec_sql,
+    actualizar_cita, eliminar_cita, agenda_rango, grid_ocupacion
 )
 
 
@@ -50,25 +50,27 @@ with colr:
         except: pass
         st.rerun()
 
-    df = citas_por_dia(fecha_sel)
+    agenda = agenda_rango(fecha_sel, 1)
+    df = agenda[agenda["ocupado"]].reset_index(drop=True)
     slots_list = generar_slots(fecha_sel)
     if not slots_list:
         st.info("Día no laborable (domingo).")
         if df.empty: st.info("Tampoco hay citas registradas en este día.")
         else: st.dataframe(df, use_container_width=True)
     else:
-        todos_slots = pd.DataFrame({"hora": slots_list})
-        todos_slots["hora_txt"] = todos_slots["hora"].map(lambda t: t.strftime("%H:%M")).astype(str)
-        df_m = df.copy()
-        if "hora" not in df_m.columns: df_m["hora"] = pd.NaT
-        df_m["hora_txt"] = df_m["hora"].apply(lambda t: t.strftime("%H:%M") if pd.notna(t) else None).astype(str)
-        df_show = todos_slots.merge(df_m, on="hora_txt", how="left")
+        df_show = agenda.copy()
+        df_show["hora_txt"] = pd.to_datetime(df_show["hora"].astype(str), format="%H:%M:%S").dt.strftime("%H:%M")
+        df_show["estado"] = df_show["ocupado"].map({True: "🟡 ocupado", False: "✅ libre"})
         cols = ["id_cita","paciente_id","nombre","telefono","fecha","nota"]
-        for c in cols:
-            if c not in df_show.columns: df_show[c] = None
-        df_show["estado"] = df_show["id_cita"].apply(lambda x: "✅ libre" if pd.isna(x) else "🟡 ocupado")
         st.dataframe(df_show[["hora_txt","estado"] + cols], use_container_width=True)
 
+    with st.expander("📆 Vista semanal (horas × días)", expanded=False):
+        semanas = st.number_input("Semanas", min_value=1, max_value=6, value=1, step=1, key="citas_grid_semanas")
+        ini_semana = fecha_sel - timedelta(days=fecha_sel.weekday())
+        grid = grid_ocupacion(agenda_rango(ini_semana, int(semanas) * 7))
+        if grid.empty: st.info("Sin horarios en ese rango.")
+        else: st.dataframe(grid, use_container_width=True)
+
     if not df.empty:
         st.divider()
         st.caption("Editar / eliminar cita")
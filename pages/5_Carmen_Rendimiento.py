@@ -0,0 +1,88 @@
+# pages/5_Carmen_Rendimiento.py
+# Panel oculto (solo Carmen, se habilita con ?perf=1): dónde se va el tiempo de cada rerun.
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+
+from modules import metricas
+
+st.set_page_config(page_title="Carmen — Rendimiento", page_icon="⏱️", layout="wide")
+from modules.theme import apply_theme
+
+apply_theme()
+if st.session_state.get("role") != "admin":
+    st.switch_page("app.py")
+
+st.title("⏱️ Rendimiento")
+if not metricas.ACTIVA:
+    st.warning("La instrumentación está desactivada (INSTRUMENTACION=0).")
+
+c1, c2 = st.columns([4, 1])
+with c1:
+    st.caption(f"Datos de este proceso desde su arranque · últimos {metricas.BUFFER} eventos en el buffer.")
+with c2:
+    if st.button("🧹 Reiniciar"):
+        metricas.reiniciar(); st.rerun()
+
+
+def _tabla_hist(tipo: str) -> pd.DataFrame:
+    filas = []
+    for (t, huella), h in metricas.histogramas().items():
+        if t != tipo:
+            continue
+        filas.append({
+            "huella": huella,
+            "llamadas": h["n"],
+            "total_ms": round(h["total_ms"], 1),
+            "media_ms": round(h["total_ms"] / h["n"], 1),
+            "p50_ms": metricas.percentil(h["buckets"], 0.50),
+            "p95_ms": metricas.percentil(h["buckets"], 0.95),
+            "max_ms": round(h["max_ms"], 1),
+            "filas_media": round(h["filas"] / h["n"], 1) if tipo == "sql" else None,
+            "errores": h["errores"],
+        })
+    d = pd.DataFrame(filas)
+    return d.sort_values("total_ms", ascending=False).reset_index(drop=True) if not d.empty else d
+
+
+# ---- reruns por página ----
+st.subheader("Reruns por página")
+reruns = _tabla_hist("rerun").rename(columns={"huella": "página"}).drop(columns=["filas_media"], errors="ignore")
+if reruns.empty:
+    st.info("Aún no hay reruns medidos.")
+else:
+    st.dataframe(reruns, use_container_width=True, hide_index=True)
+
+# tiempo de datos (SQL + ping + Drive) por página, desde el buffer
+evs = pd.DataFrame(metricas.eventos(), columns=["ts", "tipo", "huella", "ms", "filas", "pagina", "funcion", "error"])
+if not evs.empty:
+    with st.expander("Tiempo de datos por página (buffer)", expanded=False):
+        por_pag = (evs[evs["tipo"] != "rerun"]
+                   .pivot_table(index="pagina", columns="tipo", values="ms", aggfunc="sum", fill_value=0)
+                   .round(1))
+        st.dataframe(por_pag, use_container_width=True)
+
+# ---- consultas y Drive ----
+tab_sql, tab_drive, tab_ev = st.tabs(["🐘 Consultas", "📁 Drive", "🔎 Eventos más lentos"])
+with tab_sql:
+    d = _tabla_hist("sql")
+    ping = _tabla_hist("ping")
+    if not ping.empty:
+        st.caption(f"Ping de conexión: {int(ping.loc[0, 'llamadas'])} llamadas · "
+                   f"media {ping.loc[0, 'media_ms']} ms · p95 {ping.loc[0, 'p95_ms']} ms")
+    if d.empty: st.info("Sin consultas medidas.")
+    else: st.dataframe(d, use_container_width=True, hide_index=True)
+with tab_drive:
+    d = _tabla_hist("drive").drop(columns=["filas_media"], errors="ignore")
+    if d.empty: st.info("Sin llamadas a Drive medidas.")
+    else: st.dataframe(d.rename(columns={"huella": "método"}), use_container_width=True, hide_index=True)
+with tab_ev:
+    if evs.empty:
+        st.info("Buffer vacío.")
+    else:
+        tipo = st.selectbox("Tipo", ["todos"] + list(metricas.TIPOS))
+        d = evs if tipo == "todos" else evs[evs["tipo"] == tipo]
+        d = d.nlargest(50, "ms").copy()
+        d["ts"] = d["ts"].map(lambda t: datetime.fromtimestamp(t).strftime("%H:%M:%S"))
+        d["ms"] = d["ms"].round(1)
+        st.dataframe(d, use_container_width=True, hide_index=True)
@@ -0,0 +1,74 @@
+# scripts/optimizar_assets.py
+"""
+Genera las variantes optimizadas de las imágenes del login para servirlas como estáticos.
+
+Por cada imagen en assets/ (ver VARIANTES):
+  - la redimensiona al ancho máximo de pantalla ×2 (sin agrandar),
+  - escribe WebP y PNG optimizado en static/ con el hash del contenido en el nombre,
+  - registra las rutas en static/assets.json (lo lee modules/theme.py).
+
+Streamlit sirve static/ en app/static/ (enableStaticServing en .streamlit/config.toml);
+pedir el archivo con ?v=<hash> hace que el servidor responda con caché de larga duración.
+AVIF no se genera: el servidor estático de Streamlit lo entregaría como text/plain.
+
+Uso (requiere Pillow, solo en build):
+    python scripts/optimizar_assets.py
+"""
+import hashlib
+import io
+import json
+from pathlib import Path
+
+from PIL import Image
+
+RAIZ = Path(__file__).resolve().parents[1]
+ORIGEN = RAIZ / "assets"
+DESTINO = RAIZ / "static"
+MANIFIESTO = DESTINO / "assets.json"
+
+# imagen → ancho máximo en px (ancho mostrado en el login ×2 para pantallas retina)
+VARIANTES = {
+    "Logo.png": 600,
+    "ig.png": 240,
+    "tiktok.png": 240,
+    "wa.png": 240,
+}
+
+
+def _codificar(im: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "webp":
+        im.save(buf, "WEBP", quality=85, method=6)
+    else:
+        im.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+
+def main() -> int:
+    DESTINO.mkdir(exist_ok=True)
+    manifiesto = {}
+    for nombre, ancho_max in VARIANTES.items():
+        im = Image.open(ORIGEN / nombre)
+        im.load()
+        if im.width > ancho_max:
+            alto = round(im.height * ancho_max / im.width)
+            im = im.resize((ancho_max, alto), Image.LANCZOS)
+        stem = Path(nombre).stem
+        for viejo in DESTINO.glob(f"{stem}.*.*"):
+            viejo.unlink()
+        entrada = {"width": im.width, "height": im.height}
+        for fmt in ("webp", "png"):
+            data = _codificar(im, fmt)
+            h = hashlib.sha256(data).hexdigest()[:10]
+            archivo = f"{stem}.{h}.{fmt}"
+            (DESTINO / archivo).write_bytes(data)
+            entrada[fmt] = {"file": archivo, "hash": h, "bytes": len(data)}
+        manifiesto[stem] = entrada
+        print(f"{nombre}: {(ORIGEN / nombre).stat().st_size} B → "
+              f"webp {entrada['webp']['bytes']} B, png {entrada['png']['bytes']} B ({im.width}×{im.height})")
+    MANIFIESTO.write_text(json.dumps(manifiesto, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())